@@ -0,0 +1,275 @@
+import multiprocessing as mp
+import queue
+import numpy as np
+from CustomEnvironment import custom_environment
+from ObservationEncoder import FULL_SCHEMA
+from NumpyPolicy import numpy_policy, flatten_weights, unflatten_weights
+from RunningNormalizer import running_normalizer
+
+
+def actor(index, env_args, env_kwargs, rollout_length, max_steps, weight_shapes, n_policy_weights, shared_weights,
+          version, trajectories, stop):
+    """
+    Run a custom environment in an actor process and stream fixed length trajectories to the learner.
+
+    The actor acts with a NumPy copy of the policy and picks up newly published weights before every
+    trajectory. Episodes are reset inside trajectories, and episodes reaching max_steps are truncated.
+
+    Parameters:
+    - index: Index of the actor, also the seed of its layout sampling.
+    - env_args: Arguments used to build the custom environment.
+    - env_kwargs: Keyword arguments used to build the custom environment.
+    - rollout_length: Number of steps per trajectory.
+    - max_steps: Maximum number of steps per episode.
+    - weight_shapes: Shapes of the policy weights, followed by the observation normalizer statistics if any.
+    - n_policy_weights: Number of policy weight arrays.
+    - shared_weights: Shared memory holding the latest policy weights and normalizer statistics.
+    - version: Shared version of the latest policy weights, -1 until the first weights are published.
+    - trajectories: Bounded queue the trajectories are put in.
+    - stop: Event set by the learner to stop the actor.
+    """
+    env = custom_environment(*env_args, seed=index, **env_kwargs)
+    normalized = len(weight_shapes) > n_policy_weights
+    policy = numpy_policy(normalizer=running_normalizer(weight_shapes[-1], frozen=True) if normalized else None)
+    weights = np.frombuffer(shared_weights, dtype=np.float32)
+
+    env.reset()
+    state = env.get_observation()
+    episode_steps = 0
+    try:
+        while not stop.is_set():
+            # Pick up the latest published weights and normalizer statistics
+            if version.value != policy.version:
+                with version.get_lock():
+                    arrays = unflatten_weights(weights.copy(), weight_shapes)
+                    policy.set_weights(arrays[:n_policy_weights], version.value)
+                if normalized:
+                    policy.normalizer.set_state(arrays[n_policy_weights:])
+            if policy.version < 0:
+                stop.wait(0.1)
+                continue
+
+            trajectory = {
+                "actor": index,
+                "version": policy.version,
+                "states": np.zeros((rollout_length, len(state)), dtype=np.float32),
+                "actions": np.zeros((rollout_length, 8), dtype=np.float32),
+                "probs": np.zeros((rollout_length, len(policy.biases[-1])), dtype=np.float32),
+                "rewards": np.zeros(rollout_length, dtype=np.float32),
+                "dones": np.zeros(rollout_length, dtype=bool),
+                "truncated_steps": [],
+                "truncated_states": [],
+                "episodes": [],
+            }
+            for t in range(rollout_length):
+                action, action_probs = policy.act(state)
+                next_state, reward, done = env.step(action)
+                trajectory["states"][t] = state
+                trajectory["actions"][t] = action
+                trajectory["probs"][t] = action_probs
+                trajectory["rewards"][t] = reward
+                trajectory["dones"][t] = done
+                state = next_state.copy()
+                episode_steps += 1
+
+                if done or episode_steps == max_steps:
+                    if not done:
+                        # The episode hit the time limit, the learner bootstraps from the value of its final state
+                        trajectory["truncated_steps"].append(t)
+                        trajectory["truncated_states"].append(state)
+                    trajectory["episodes"].append({"total_reward": env.total_reward, "steps": episode_steps,
+                                                   "achieved_targets": env.achieved_targets})
+                    env.reset()
+                    state = env.get_observation()
+                    episode_steps = 0
+            trajectory["next_state"] = state
+
+            # Block while the queue is full, so actors never run more than queue_size trajectories ahead
+            while not stop.is_set():
+                try:
+                    trajectories.put(trajectory, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+    except KeyboardInterrupt:
+        pass
+
+
+class actor_learner:
+    def __init__(self, n_actors, scenario, n_targets, n_obstacles, policy_weights, reward_threshold=None,
+                 backend="holoocean", action_repeat=1, rollout_length=256, max_steps=int(1e4), queue_size=None,
+                 max_policy_lag=2, start_method="spawn", layouts=None,
+                 target_order="random", headless=False, normalizer_state=(), observation_schema=FULL_SCHEMA):
+        """
+        Initialize the actor-learner pipeline.
+
+        Actor processes run the custom environment and stream trajectories into a bounded queue, while the
+        learner in the main process trains on them and publishes versioned policy weights back through
+        shared memory. Simulation and learning overlap instead of alternating.
+
+        Parameters:
+        - n_actors: Number of actor processes.
+        - scenario: Configuration for the environments.
+        - n_targets: Number of targets in each environment.
+        - n_obstacles: Number of obstacles in each environment.
+        - policy_weights: Initial policy weights, published as version 0.
+        - reward_threshold: Total reward below which an episode is finished (None to disable).
+        - backend: Simulator backend of the environments.
+        - action_repeat: Number of simulator ticks each action is applied for.
+        - rollout_length: Number of steps per trajectory.
+        - max_steps: Maximum number of steps per episode.
+        - queue_size: Maximum number of queued trajectories (None for 2 per actor).
+        - max_policy_lag: Trajectories collected with weights more than this many versions old are dropped.
+        - start_method: Multiprocessing start method for the actors.
+        - layouts: Optional name of a layout library file. Every actor memory-maps the same file and samples
+          its own layouts.
+        - target_order: Order the targets are visited in, see target_scheduler.
+        - headless: Whether the environments skip all rendering, see custom_environment.
+        - normalizer_state: Initial observation normalizer statistics, see PPO_agent.get_normalizer_state
+          (empty when observations are not normalized).
+        - observation_schema: Fields of the observations, see observation_encoder.
+        """
+        ctx = mp.get_context(start_method)
+        self.n_policy_weights = len(policy_weights)
+        flat, self.weight_shapes = flatten_weights(list(policy_weights) + list(normalizer_state))
+        self.shared_weights = ctx.RawArray("f", len(flat))
+        self.weights = np.frombuffer(self.shared_weights, dtype=np.float32)
+        self.version = ctx.Value("q", -1)
+        self.trajectories = ctx.Queue(maxsize=queue_size or 2 * n_actors)
+        self.stop = ctx.Event()
+        self.max_policy_lag = max_policy_lag
+        self.dropped = 0
+        self.publish(policy_weights, normalizer_state)
+
+        env_args = (scenario, n_targets, n_obstacles, reward_threshold, backend, action_repeat)
+        env_kwargs = {"layouts": layouts, "target_order": target_order, "headless": headless,
+                      "observation_schema": observation_schema}
+        self.processes = []
+        for index in range(n_actors):
+            process = ctx.Process(target=actor, args=(index, env_args, env_kwargs, rollout_length, max_steps,
+                                                      self.weight_shapes, self.n_policy_weights, self.shared_weights,
+                                                      self.version, self.trajectories, self.stop), daemon=True)
+            process.start()
+            self.processes.append(process)
+        self.closed = False
+
+    def publish(self, policy_weights, normalizer_state=()):
+        """
+        Publish new policy weights and observation normalizer statistics to the actors.
+
+        Parameters:
+        - policy_weights: Policy weights, as returned by the policy's get_weights().
+        - normalizer_state: Observation normalizer statistics, see PPO_agent.get_normalizer_state.
+
+        Returns:
+        - version: Version of the published weights.
+        """
+        flat, _ = flatten_weights(list(policy_weights) + list(normalizer_state))
+        with self.version.get_lock():
+            self.weights[:] = flat
+            self.version.value += 1
+            return self.version.value
+
+    def collect(self, n_trajectories):
+        """
+        Wait for trajectories from the actors, dropping the ones collected with too stale weights.
+
+        Parameters:
+        - n_trajectories: Number of trajectories to return.
+
+        Returns:
+        - trajectories: List of trajectory dictionaries.
+        """
+        trajectories = []
+        while len(trajectories) < n_trajectories:
+            trajectory = self.trajectories.get()
+            if self.version.value - trajectory["version"] > self.max_policy_lag:
+                self.dropped += 1
+                continue
+            trajectories.append(trajectory)
+        return trajectories
+
+    def close(self):
+        """Stop the actors and terminate their processes."""
+        if self.closed:
+            return
+        self.stop.set()
+        # Drain the queue so no actor is left blocked on a full queue
+        for process in self.processes:
+            while process.is_alive():
+                try:
+                    self.trajectories.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            process.join()
+        self.closed = True
+
+
+def train_actor_learner(ppo_agent, learner, metrics, plotter, checkpoints, log, first_update, n_updates,
+                        trajectories_per_update, checkpoint_every_n_updates=20):
+    """
+    Train the PPO agent on the trajectories streamed by the actors.
+
+    Parameters:
+    - ppo_agent: PPO agent.
+    - learner: Actor-learner pipeline.
+    - metrics: Metrics store, one record per update.
+    - plotter: Background plotter.
+    - checkpoints: Checkpoint manager.
+    - log: Step logger.
+    - first_update: Number of the first update.
+    - n_updates: Number of the update to stop at.
+    - trajectories_per_update: Number of trajectories per update.
+    - checkpoint_every_n_updates: Number of updates between checkpoints.
+    """
+    for update_num in range(first_update, n_updates):
+        trajectories = learner.collect(trajectories_per_update)
+
+        # Stack the trajectories, one per column, into [rollout_length, trajectories_per_update, ...] arrays
+        def stack(name):
+            return np.stack([trajectory[name] for trajectory in trajectories], axis=1)
+
+        states, actions, probs, rewards, dones = (stack(name) for name in ("states", "actions", "probs", "rewards",
+                                                                           "dones"))
+        raw_rewards = rewards.ravel().copy()
+        rewards = ppo_agent.scale_rewards(rewards)
+        values = ppo_agent.values(states.reshape(-1, states.shape[-1])).reshape(rewards.shape)
+        next_values = ppo_agent.values(np.stack([trajectory["next_state"] for trajectory in trajectories]))
+
+        # Truncated episodes bootstrap from the value of their final state, not the next episode's first state
+        truncated = np.zeros(rewards.shape, dtype=bool)
+        truncated_values = np.zeros(rewards.shape, dtype=np.float32)
+        for n, trajectory in enumerate(trajectories):
+            if trajectory["truncated_steps"]:
+                truncated[trajectory["truncated_steps"], n] = True
+                truncated_values[trajectory["truncated_steps"], n] = ppo_agent.values(
+                    np.array(trajectory["truncated_states"]))
+
+        advantages, returns = ppo_agent.compute_gae(rewards, values, dones, next_values, truncated, truncated_values)
+        advantages = advantages.ravel()
+        advantages = (advantages - np.mean(advantages)) / (np.std(advantages) + 1e-8)
+        episodes = [episode for trajectory in trajectories for episode in trajectory["episodes"]]
+        total_reward = np.mean([episode["total_reward"] for episode in episodes]) if episodes else np.nan
+        achieved_targets = np.mean([episode["achieved_targets"] for episode in episodes]) if episodes else np.nan
+
+        # Update policy and value networks, then publish the new policy to the actors
+        update = ppo_agent.update(states.reshape(-1, states.shape[-1]), actions.reshape(-1, actions.shape[-1]),
+                                  advantages, probs.reshape(-1, probs.shape[-1]), returns.ravel(), update_num,
+                                  achieved_targets)
+        ppo_agent.update_normalizers(states.reshape(-1, states.shape[-1]), raw_rewards)
+        version = learner.publish(ppo_agent.get_policy_weights(), ppo_agent.get_normalizer_state())
+        ppo_agent.log_episode_reward(update_num, total_reward)
+        lag = version - 1 - np.mean([trajectory["version"] for trajectory in trajectories])
+        log.info("Update %d: policy version %d, mean lag %.2f, %d stale trajectories dropped, %d episodes, %s",
+                 update_num, version, lag, learner.dropped, len(episodes), log.format_record(update))
+
+        # Record the update metrics and regenerate the plots periodically
+        metrics.append(episode=update_num, policy_loss=update["policy_loss"], value_loss=update["value_loss"],
+                       total_reward=total_reward, achieved_targets=achieved_targets,
+                       clip_fraction=update["clip_fraction"],
+                       update_samples_per_sec=update["samples_per_sec"])
+        plotter.request(update_num)
+
+        # Checkpoint the training state periodically, written in the background
+        if update_num % checkpoint_every_n_updates == 0:
+            checkpoints.save(ppo_agent, update_num, total_reward)
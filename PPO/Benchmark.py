@@ -0,0 +1,497 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from CustomEnvironment import custom_environment
+from ObservationEncoder import observation_size, COMPACT_SCHEMA
+from PPOAgent import PPO_agent
+from RewardFunction import reward_engine
+from RolloutBuffer import rollout_buffer
+from ScenarioBuilder import build_scenario, LASER_LAYOUT
+from scenario import scenario
+from utils import log_to_csv, graph, metrics_store
+from VectorEnvironment import vector_environment
+
+# Global constants
+SCENARIO = scenario
+BACKEND = "numpy"
+ACTION_SPACE_SIZE = 5
+N_THRUSTERS = 8
+OBSERVATION_SCHEMA = COMPACT_SCHEMA
+OBSERVATION_SPACE_SIZE = observation_size(SCENARIO, OBSERVATION_SCHEMA)
+N_TARGETS = 10
+N_OBSTACLES = 50
+ACTION_REPEAT = 5
+BATCH_SIZES = [1, 4, 16]
+N_CALLS = 1000
+N_WARMUP = 20
+ROLLOUT_LENGTH = 1000
+N_ROLLOUT_ENVS = 4
+UPDATE_BATCH_SIZE = 1024
+N_LOG_EPISODES = 1000
+N_ROLLOUT_STEPS = 500
+N_END_TO_END_ENVS = 4
+N_END_TO_END_STEPS = 250
+N_END_TO_END_ITERATIONS = 3
+RESULTS_FILENAME = "benchmark_results.json"
+BASELINE_FILENAME = "benchmark_baseline.json"
+REGRESSION_TOLERANCE = 0.2
+N_STARTUP_CALLS = 3
+N_RESET_CALLS = 200
+
+# Code run in a fresh interpreter to measure the startup time of each tool.
+STARTUP_COMMANDS = {
+    "startup_import_main": "import Main",
+    "startup_import_utils": "import utils",
+    "startup_import_evaluate": "import Evaluate",
+    "startup_create_environment": "from CustomEnvironment import custom_environment; from scenario import scenario; "
+                                  "custom_environment(scenario, 10, 50, backend='numpy').reset()",
+    "startup_create_ppo_agent": f"from PPOAgent import PPO_agent; "
+                                f"PPO_agent({ACTION_SPACE_SIZE}, {OBSERVATION_SPACE_SIZE})",
+}
+
+
+def measure_latency(function, n_calls=N_CALLS, n_warmup=N_WARMUP):
+    """
+    Measure the per-call latency of a function.
+
+    Parameters:
+    - function: Function called without arguments.
+    - n_calls: Number of timed calls.
+    - n_warmup: Number of untimed calls made first, e.g. to trigger compilation.
+
+    Returns:
+    - stats: Dictionary with the mean, p50 and p99 latency in microseconds.
+    """
+    for _ in range(n_warmup):
+        function()
+    latencies = np.empty(n_calls)
+    for i in range(n_calls):
+        start = time.perf_counter()
+        function()
+        latencies[i] = time.perf_counter() - start
+    latencies *= 1e6
+    return {"mean_us": float(latencies.mean()), "p50_us": float(np.percentile(latencies, 50)),
+            "p99_us": float(np.percentile(latencies, 99))}
+
+
+def measure_throughput(function, n_items):
+    """
+    Measure the throughput of a function processing several items in one call.
+
+    Parameters:
+    - function: Function called once without arguments.
+    - n_items: Number of items processed by the call, e.g. steps.
+
+    Returns:
+    - stats: Dictionary with the items per second and the elapsed time in seconds.
+    """
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    return {"per_sec": n_items / elapsed, "seconds": elapsed}
+
+
+def benchmark_inference(ppo_agent, batch_sizes=BATCH_SIZES):
+    """
+    Benchmark policy inference, comparing PPO_agent.act with two eager calls per state.
+
+    Parameters:
+    - ppo_agent: PPO agent.
+    - batch_sizes: Batch sizes to measure.
+
+    Returns:
+    - results: Dictionary of latency stats per benchmark name.
+    """
+    results = {}
+    results["select_action"] = measure_latency(
+        lambda: ppo_agent.select_action(np.random.rand(ppo_agent.observation_space_size)))
+    for batch_size in batch_sizes:
+        states = np.random.rand(batch_size, ppo_agent.observation_space_size).astype(np.float32)
+
+        def eager():
+            # One eager call for the action probabilities and one inside the action selection, per state.
+            for state in states:
+                ppo_agent.policy(np.array([state]))[0].numpy()
+                ppo_agent.policy(np.array([state]))[0].numpy()
+
+        results[f"inference_eager_batch_{batch_size}"] = measure_latency(eager, 100)
+        results[f"inference_act_batch_{batch_size}"] = measure_latency(lambda: ppo_agent.act(states))
+    return results
+
+
+def benchmark_environment(env):
+    """
+    Benchmark the custom environment on the headless backend.
+
+    Parameters:
+    - env: Custom environment.
+
+    Returns:
+    - results: Dictionary of latency stats per benchmark name.
+    """
+    env.reset()
+    states = env.env.tick()
+    while not all(name in states for name in env.sensors):
+        states = env.env.tick()
+    action = np.zeros(8)
+
+    def step():
+        if env.step(action)[2]:
+            env.reset()
+
+    return {
+        "backend_tick": measure_latency(env.env.tick),
+        "update_state": measure_latency(lambda: env.update_state(states)),
+        "env_step": measure_latency(step),
+    }
+
+
+def benchmark_reset(n_calls=N_RESET_CALLS):
+    """
+    Benchmark hard resets, which rebuild the world, against soft resets, which keep it.
+
+    Each reset is timed with the first tick after it, which pays for the obstacle index the headless
+    backend rebuilds lazily after props are spawned.
+
+    Parameters:
+    - n_calls: Number of timed resets.
+
+    Returns:
+    - results: Dictionary of latency stats per benchmark name.
+    """
+    results = {}
+    for name, soft_reset in (("reset_hard", False), ("reset_soft", True)):
+        env = custom_environment(SCENARIO, N_TARGETS, N_OBSTACLES, backend=BACKEND, action_repeat=ACTION_REPEAT,
+                                 soft_reset=soft_reset, headless=True, observation_schema=OBSERVATION_SCHEMA)
+
+        def reset():
+            env.reset()
+            env.env.tick()
+
+        results[name] = measure_latency(reset, n_calls)
+    return results
+
+
+def benchmark_rewards(env):
+    """
+    Benchmark the reward calculation for the current state of an environment.
+
+    Parameters:
+    - env: Custom environment.
+
+    Returns:
+    - results: Dictionary of latency stats per benchmark name.
+    """
+    target = np.asarray(env.get_current_target(), dtype=float)
+    engine = reward_engine(n_agents=1)
+    return {
+        "calculate_reward": measure_latency(lambda: engine.calculate_reward(
+            env.prev_location, env.location, target, env.rotation, env.lasers)),
+        "calculate_rewards_engine": measure_latency(lambda: engine.calculate_rewards(
+            env.prev_location[None], env.location[None], target[None], env.rotation[None], env.lasers[None])),
+    }
+
+
+def benchmark_returns(ppo_agent, rollout_length=ROLLOUT_LENGTH, n_envs=N_ROLLOUT_ENVS):
+    """
+    Benchmark the discounted rewards, advantages and GAE over a rollout.
+
+    Parameters:
+    - ppo_agent: PPO agent.
+    - rollout_length: Number of steps of the rollout.
+    - n_envs: Number of environments for GAE.
+
+    Returns:
+    - results: Dictionary of latency stats per benchmark name.
+    """
+    rewards = np.random.randn(rollout_length).astype(np.float32)
+    values = np.random.randn(rollout_length).astype(np.float32)
+    dones = np.zeros(rollout_length, dtype=bool)
+    dones[-1] = True
+    rollout_rewards = np.random.randn(rollout_length, n_envs)
+    rollout_values = np.random.randn(rollout_length, n_envs)
+    rollout_dones = np.random.rand(rollout_length, n_envs) < 0.01
+    return {
+        f"discounted_rewards_{rollout_length}": measure_latency(lambda: ppo_agent.discounted_rewards(rewards), 100),
+        f"compute_advantages_{rollout_length}": measure_latency(
+            lambda: ppo_agent.compute_advantages(rewards, values, dones), 100),
+        f"compute_gae_{rollout_length}x{n_envs}": measure_latency(
+            lambda: ppo_agent.compute_gae(rollout_rewards, rollout_values, rollout_dones, np.zeros(n_envs)), 100),
+    }
+
+
+def benchmark_update(ppo_agent, batch_size=UPDATE_BATCH_SIZE):
+    """
+    Benchmark the policy and value network updates.
+
+    Parameters:
+    - ppo_agent: PPO agent.
+    - batch_size: Number of samples per update.
+
+    Returns:
+    - results: Dictionary of latency stats per benchmark name.
+    """
+    states = np.random.rand(batch_size, ppo_agent.observation_space_size).astype(np.float32)
+    actions = np.random.rand(batch_size, N_THRUSTERS).astype(np.float32)
+    advantages = np.random.randn(batch_size).astype(np.float32)
+    old_probs = ppo_agent.act(states)[1]
+    discounted_rewards = np.random.randn(batch_size).astype(np.float32)
+
+    # The updates write to the loss log, keep it out of the working directory
+    log_file, ppo_agent.log_file = ppo_agent.log_file, open(os.devnull, "w")
+    try:
+        return {
+            f"update_policy_{batch_size}": measure_latency(
+                lambda: ppo_agent.update_policy(states, actions, advantages, old_probs, 0), 20, 3),
+            f"update_value_network_{batch_size}": measure_latency(
+                lambda: ppo_agent.update_value_network(states, discounted_rewards, 0, 0), 20, 3),
+            f"update_{batch_size}": measure_latency(
+                lambda: ppo_agent.update(states, actions, advantages, old_probs, discounted_rewards, 0, 0), 5, 1),
+        }
+    finally:
+        ppo_agent.log_file.close()
+        ppo_agent.log_file = log_file
+
+
+def benchmark_logging(n_episodes=N_LOG_EPISODES):
+    """
+    Benchmark the loss log conversion, plotting and the metrics store.
+
+    Parameters:
+    - n_episodes: Number of episodes in the logs.
+
+    Returns:
+    - results: Dictionary of latency stats per benchmark name.
+    """
+    working_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            with open("loss_log.txt", "w") as log_file:
+                for episode in range(n_episodes):
+                    log_file.write(f"Episode {episode}, Policy Loss: {np.random.randn()}\n")
+                    log_file.write(f"Episode {episode}, Value Loss: {np.random.rand()}\n")
+                    log_file.write(f"Episode {episode}, Achieved Targets: {np.random.randint(10)}\n")
+                    log_file.write(f"Episode {episode}, Total Reward: {np.random.randn()}\n")
+            metrics = metrics_store("metrics")
+            results = {
+                f"log_to_csv_{n_episodes}": measure_latency(lambda: log_to_csv("loss_log"), 5, 1),
+                f"graph_{n_episodes}": measure_latency(lambda: graph("loss_log"), 3, 1),
+                "metrics_append": measure_latency(lambda: metrics.append(episode=0, policy_loss=0.0)),
+            }
+            metrics.close()
+        finally:
+            os.chdir(working_directory)
+    return results
+
+
+def benchmark_rollout(env, ppo_agent, n_steps=N_ROLLOUT_STEPS):
+    """
+    Benchmark a rollout in a single environment: policy inference, environment step and reward.
+
+    Parameters:
+    - env: Custom environment.
+    - ppo_agent: PPO agent.
+    - n_steps: Number of steps.
+
+    Returns:
+    - results: Dictionary of throughput stats per benchmark name.
+    """
+    env.reset()
+
+    def rollout():
+        state = env.get_observation()
+        for _ in range(n_steps):
+            action, _ = ppo_agent.act(state)
+            state, _, done = env.step(action)
+            if done:
+                env.reset()
+                state = env.get_observation()
+
+    stats = measure_throughput(rollout, n_steps)
+    return {
+        "rollout_steps": stats,
+        "rollout_ticks": {"per_sec": stats["per_sec"] * env.action_repeat, "seconds": stats["seconds"]},
+    }
+
+
+def benchmark_end_to_end(ppo_agent, n_envs=N_END_TO_END_ENVS, n_steps=N_END_TO_END_STEPS,
+                         n_iterations=N_END_TO_END_ITERATIONS):
+    """
+    Benchmark the training loop of Main.py end to end.
+
+    Every iteration resets the vector environment, collects up to n_steps steps in its worker processes,
+    computes the advantages and updates the networks on the collected samples. Starting the workers is not
+    timed.
+
+    Parameters:
+    - ppo_agent: PPO agent.
+    - n_envs: Number of environments of the vector environment.
+    - n_steps: Maximum number of steps per iteration.
+    - n_iterations: Number of timed iterations.
+
+    Returns:
+    - results: Dictionary of throughput stats per benchmark name, counting the samples collected in every
+      environment.
+    """
+    env = vector_environment(n_envs, SCENARIO, N_TARGETS, N_OBSTACLES, backend=BACKEND, action_repeat=ACTION_REPEAT,
+                             observation_schema=OBSERVATION_SCHEMA)
+    rollout = rollout_buffer(n_steps, n_envs, ppo_agent.observation_space_size, N_THRUSTERS, ACTION_SPACE_SIZE)
+
+    # The updates write to the loss log, keep it out of the working directory
+    log_file, ppo_agent.log_file = ppo_agent.log_file, open(os.devnull, "w")
+    try:
+        n_samples = 0
+        start = time.perf_counter()
+        for iteration in range(n_iterations):
+            rollout.reset()
+            states = env.reset()
+            running = np.ones(n_envs, dtype=bool)
+            for _ in range(n_steps):
+                actions, action_probs = ppo_agent.act(states)
+                next_states, rewards, dones = env.step(actions)
+                rollout.add(states, actions, rewards, dones, action_probs, running)
+                running &= ~dones
+                states = next_states
+                if not running.any():
+                    break
+
+            values = ppo_agent.values(rollout.flat("states")).reshape(len(rollout), n_envs)
+            advantages, returns = ppo_agent.compute_gae(ppo_agent.scale_rewards(rollout.view("rewards")), values,
+                                                        rollout.view("dones"), ppo_agent.values(states))
+            samples = rollout.valid_indices()
+            advantages = advantages.ravel()[samples]
+            advantages = (advantages - np.mean(advantages)) / (np.std(advantages) + 1e-8)
+            ppo_agent.update(rollout.flat("states")[samples], rollout.flat("actions")[samples], advantages,
+                             rollout.flat("probs")[samples], returns.ravel()[samples], iteration, 0)
+            n_samples += len(samples)
+        elapsed = time.perf_counter() - start
+    finally:
+        env.close()
+        ppo_agent.log_file.close()
+        ppo_agent.log_file = log_file
+    return {
+        "end_to_end_samples": {"per_sec": n_samples / elapsed, "seconds": elapsed},
+        "end_to_end_ticks": {"per_sec": n_samples * ACTION_REPEAT / elapsed, "seconds": elapsed},
+    }
+
+
+def benchmark_startup(commands=STARTUP_COMMANDS, n_calls=N_STARTUP_CALLS):
+    """
+    Benchmark the startup time of the tools, each in a fresh interpreter.
+
+    Parameters:
+    - commands: Dictionary of Python code per benchmark name.
+    - n_calls: Number of timed runs per command.
+
+    Returns:
+    - results: Dictionary of latency stats per benchmark name.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for name, code in commands.items():
+        results[name] = measure_latency(
+            lambda: subprocess.run([sys.executable, "-c", code], cwd=directory, check=True, capture_output=True),
+            n_calls, 1)
+    return results
+
+
+def compare(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """
+    Compare benchmark results against a baseline.
+
+    Latencies are compared by their p50 and throughputs by their rate per second.
+
+    Parameters:
+    - results: Dictionary of stats per benchmark name.
+    - baseline: Dictionary of baseline stats per benchmark name.
+    - tolerance: Relative slowdown above which a benchmark is flagged as a regression.
+
+    Returns:
+    - regressions: List of (name, baseline value, value, relative slowdown) for the regressed benchmarks.
+    """
+    regressions = []
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        if "p50_us" in stats:
+            slowdown = stats["p50_us"] / baseline[name]["p50_us"] - 1
+            values = (baseline[name]["p50_us"], stats["p50_us"])
+        else:
+            slowdown = baseline[name]["per_sec"] / stats["per_sec"] - 1
+            values = (baseline[name]["per_sec"], stats["per_sec"])
+        if slowdown > tolerance:
+            regressions.append((name, *values, slowdown))
+    return regressions
+
+
+def format_stats(stats):
+    """
+    Format benchmark stats as a single line of text.
+
+    Parameters:
+    - stats: Latency or throughput stats.
+
+    Returns:
+    - text: Formatted stats.
+    """
+    if "p50_us" in stats:
+        return f"mean {stats['mean_us']:.1f} us, p50 {stats['p50_us']:.1f} us, p99 {stats['p99_us']:.1f} us"
+    return f"{stats['per_sec']:.1f} per sec"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the hot paths of training on the headless backend.")
+    parser.add_argument("--output", default=RESULTS_FILENAME, help="JSON file the results are written to.")
+    parser.add_argument("--baseline", default=BASELINE_FILENAME, help="JSON file of the baseline results.")
+    parser.add_argument("--save-baseline", action="store_true", help="Also save the results as the baseline.")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE,
+                        help="Relative slowdown flagged as a regression.")
+    parser.add_argument("--ticks-per-sec", type=int, default=SCENARIO["ticks_per_sec"],
+                        help="Simulator ticks per second of the benchmarked scenario.")
+    parser.add_argument("--laser-hz", type=int, default=None,
+                        help="Rate of the range finders (default: every tick).")
+    args = parser.parse_args()
+    laser_hz = {name: args.laser_hz for name, _, _ in LASER_LAYOUT} if args.laser_hz else None
+    SCENARIO = build_scenario(ticks_per_sec=args.ticks_per_sec, sensor_hz=laser_hz,
+                              expected_observation_size=OBSERVATION_SPACE_SIZE, observation_schema=OBSERVATION_SCHEMA)
+
+    ppo_agent = PPO_agent(ACTION_SPACE_SIZE, OBSERVATION_SPACE_SIZE)
+    env = custom_environment(SCENARIO, N_TARGETS, N_OBSTACLES, backend=BACKEND, action_repeat=ACTION_REPEAT,
+                             observation_schema=OBSERVATION_SCHEMA)
+
+    results = {}
+    for benchmark in (benchmark_startup, lambda: benchmark_inference(ppo_agent), lambda: benchmark_environment(env),
+                      benchmark_reset, lambda: benchmark_rewards(env), lambda: benchmark_returns(ppo_agent),
+                      lambda: benchmark_update(ppo_agent), benchmark_logging,
+                      lambda: benchmark_rollout(env, ppo_agent), lambda: benchmark_end_to_end(ppo_agent)):
+        for name, stats in benchmark().items():
+            results[name] = stats
+            print(f"{name}: {format_stats(stats)}")
+
+    report = {
+        "metadata": {"date": datetime.datetime.now().isoformat(timespec="seconds"), "backend": BACKEND,
+                     "ticks_per_sec": SCENARIO["ticks_per_sec"], "laser_hz": args.laser_hz,
+                     "python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine()},
+        "results": results,
+    }
+    with open(args.output, "w") as results_file:
+        json.dump(report, results_file, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file)["results"], args.tolerance)
+        for name, baseline_value, value, slowdown in regressions:
+            print(f"REGRESSION {name}: {baseline_value:.1f} -> {value:.1f} ({slowdown:+.0%} slower)")
+        if regressions:
+            raise SystemExit(1)
+        print(f"No regressions against {args.baseline}")
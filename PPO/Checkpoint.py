@@ -0,0 +1,257 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import numpy as np
+
+MANIFEST_FILENAME = "checkpoints.json"
+
+
+def write_atomic(filename, data):
+    """
+    Write a file atomically, so a crash leaves either the old or the new file but never a partial one.
+
+    Parameters:
+    - filename: Name of the file.
+    - data: Bytes to write.
+    """
+    temporary_filename = filename + ".tmp"
+    with open(temporary_filename, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_filename, filename)
+
+
+def pack_state(state):
+    """
+    Serialize a training state to the bytes of an .npz file.
+
+    Parameters:
+    - state: Dictionary of lists of arrays, plus JSON serializable metadata under "metadata".
+
+    Returns:
+    - data: Bytes of the .npz file.
+    """
+    arrays = {"metadata": np.array(json.dumps(state["metadata"]))}
+    for name, values in state.items():
+        if name != "metadata":
+            for i, value in enumerate(values):
+                arrays[f"{name}/{i}"] = value
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def unpack_state(data):
+    """
+    Deserialize a training state written by pack_state.
+
+    Parameters:
+    - data: Bytes of the .npz file.
+
+    Returns:
+    - state: Dictionary of lists of arrays, plus the metadata under "metadata".
+    """
+    state = {}
+    with np.load(io.BytesIO(data)) as arrays:
+        for key in arrays.files:
+            if key == "metadata":
+                state["metadata"] = json.loads(str(arrays[key]))
+                continue
+            name, i = key.rsplit("/", 1)
+            state.setdefault(name, {})[int(i)] = arrays[key]
+    for name, values in state.items():
+        if name != "metadata":
+            state[name] = [values[i] for i in range(len(values))]
+    return state
+
+
+def ranking_reward(checkpoint):
+    """Reward used to rank a checkpoint, with checkpoints without a reward ranked last."""
+    return -np.inf if np.isnan(checkpoint["reward"]) else checkpoint["reward"]
+
+
+def read_checkpoint(directory="model_checkpoints", episode_num="latest", checkpoints=None):
+    """
+    Read a checkpoint listed in the manifest, without TensorFlow.
+
+    Checkpoints failing their checksum are skipped, falling back to the previous one.
+
+    Parameters:
+    - directory: Directory of the checkpoints.
+    - episode_num: Episode number of the checkpoint, "latest" or "best".
+    - checkpoints: List of checkpoint entries (None to read the manifest).
+
+    Returns:
+    - state: Training state with the metadata under "metadata", or None if there is no valid checkpoint.
+    """
+    logger = logging.getLogger("checkpoint")
+    if checkpoints is None:
+        manifest_filename = os.path.join(directory, MANIFEST_FILENAME)
+        if not os.path.exists(manifest_filename):
+            return None
+        with open(manifest_filename) as manifest_file:
+            checkpoints = json.load(manifest_file)
+
+    candidates = list(reversed(checkpoints))
+    if episode_num == "best":
+        candidates.sort(key=ranking_reward, reverse=True)
+    elif episode_num != "latest":
+        candidates = [checkpoint for checkpoint in candidates if checkpoint["episode"] == int(episode_num)]
+
+    for checkpoint in candidates:
+        filename = os.path.join(directory, checkpoint["filename"])
+        try:
+            with open(filename, "rb") as checkpoint_file:
+                data = checkpoint_file.read()
+        except FileNotFoundError:
+            logger.warning("Checkpoint %s is missing", filename)
+            continue
+        if hashlib.sha256(data).hexdigest() != checkpoint["sha256"]:
+            logger.warning("Checkpoint %s failed its checksum", filename)
+            continue
+        return unpack_state(data)
+    return None
+
+
+class checkpoint_manager:
+    def __init__(self, directory="model_checkpoints", keep_last=3, keep_best=3):
+        """
+        Initialize the checkpoint manager.
+
+        Checkpoints hold the network weights, the Adam optimizer state, the episode number and the random
+        generator states. They are snapshotted in the training loop, then written by a background thread
+        with an atomic rename and a SHA-256 checksum recorded in a manifest. Only the last keep_last and the
+        best keep_best checkpoints by reward are kept.
+
+        Parameters:
+        - directory: Directory of the checkpoints.
+        - keep_last: Number of most recent checkpoints kept.
+        - keep_best: Number of highest reward checkpoints kept.
+        """
+        self.directory = directory
+        self.keep_last = keep_last
+        self.keep_best = keep_best
+        self.logger = logging.getLogger("checkpoint")
+        os.makedirs(directory, exist_ok=True)
+        self.manifest_filename = os.path.join(directory, MANIFEST_FILENAME)
+        self.checkpoints = self.read_manifest()
+
+        self.requests = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="checkpoint_writer", daemon=True)
+        self.thread.start()
+
+    def read_manifest(self):
+        """
+        Read the list of checkpoints from the manifest.
+
+        Returns:
+        - checkpoints: List of checkpoint entries, oldest first.
+        """
+        if not os.path.exists(self.manifest_filename):
+            return []
+        with open(self.manifest_filename) as manifest_file:
+            return json.load(manifest_file)
+
+    def save(self, ppo_agent, episode_num, reward):
+        """
+        Snapshot the training state and queue it to be written, without waiting for the write.
+
+        Parameters:
+        - ppo_agent: PPO agent.
+        - episode_num: Episode number.
+        - reward: Reward of the episode, used to rank the best checkpoints.
+        """
+        state = ppo_agent.get_state()
+        state["metadata"] = {
+            "episode": int(episode_num),
+            "reward": float(reward),
+            "rng": state.pop("rng"),
+            "python_random": random.getstate(),
+        }
+        numpy_random = np.random.get_state()
+        state["metadata"]["numpy_random"] = [numpy_random[0], int(numpy_random[2]), int(numpy_random[3]),
+                                             float(numpy_random[4])]
+        state["numpy_random"] = [numpy_random[1]]
+        self.requests.put(state)
+
+    def run(self):
+        """Write the queued checkpoints until a None request is received."""
+        while True:
+            state = self.requests.get()
+            if state is None:
+                break
+            try:
+                self.write(state)
+            except Exception:
+                self.logger.exception("Failed to write checkpoint of episode %d", state["metadata"]["episode"])
+
+    def write(self, state):
+        """
+        Write a checkpoint and its manifest entry, then delete the checkpoints no longer kept.
+
+        Parameters:
+        - state: Snapshotted training state.
+        """
+        data = pack_state(state)
+        metadata = state["metadata"]
+        filename = f"checkpoint_episode_{metadata['episode']}.npz"
+        write_atomic(os.path.join(self.directory, filename), data)
+
+        entry = {"episode": metadata["episode"], "reward": metadata["reward"], "filename": filename,
+                 "sha256": hashlib.sha256(data).hexdigest()}
+        checkpoints = [checkpoint for checkpoint in self.checkpoints if checkpoint["filename"] != filename] + [entry]
+
+        # Keep the last keep_last checkpoints and the best keep_best by reward
+        kept = checkpoints[-self.keep_last:] if self.keep_last > 0 else []
+        best = sorted(checkpoints, key=ranking_reward, reverse=True)[:self.keep_best]
+        kept = [checkpoint for checkpoint in checkpoints if checkpoint in kept or checkpoint in best]
+        write_atomic(self.manifest_filename, json.dumps(kept, indent=2).encode())
+        self.checkpoints = kept
+
+        for checkpoint in checkpoints:
+            if checkpoint not in kept:
+                try:
+                    os.remove(os.path.join(self.directory, checkpoint["filename"]))
+                except FileNotFoundError:
+                    pass
+        self.logger.debug("Saved checkpoint of episode %d to %s", metadata["episode"], filename)
+
+    def load(self, ppo_agent, episode_num="latest"):
+        """
+        Restore a checkpoint into the agent and the global random generators.
+
+        Checkpoints failing their checksum are skipped, falling back to the previous one.
+
+        Parameters:
+        - ppo_agent: PPO agent.
+        - episode_num: Episode number of the checkpoint, "latest" or "best".
+
+        Returns:
+        - metadata: Metadata of the restored checkpoint, including its episode number, or None if there is
+          no valid checkpoint.
+        """
+        state = read_checkpoint(self.directory, episode_num, self.checkpoints)
+        if state is None:
+            return None
+        metadata = state.pop("metadata")
+        numpy_random = state.pop("numpy_random")[0]
+        state["rng"] = metadata["rng"]
+        ppo_agent.set_state(state)
+
+        # Restore the global random generators last, as building the networks may draw from them
+        np.random.set_state((metadata["numpy_random"][0], numpy_random, *metadata["numpy_random"][1:]))
+        version, internal_state, gauss_next = metadata["python_random"]
+        random.setstate((version, tuple(internal_state), gauss_next))
+        self.logger.info("Resumed from checkpoint of episode %d", metadata["episode"])
+        return metadata
+
+    def close(self):
+        """Write the queued checkpoints and stop the background thread."""
+        self.requests.put(None)
+        self.thread.join()
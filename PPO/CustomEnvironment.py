@@ -1,10 +1,17 @@
-import holoocean
 import numpy as np
-from itertools import chain
 import random
+from RewardFunction import reward_engine
+from LayoutLibrary import layout_library
+from ObservationEncoder import observation_encoder, FULL_SCHEMA
+from Profiler import phase_profiler
+from SimulatorBackend import make_backend, SOFT_RESET_BACKENDS
+from TargetScheduler import target_scheduler
+
 
 class custom_environment:
-    def __init__(self, scenario, n_targets, n_obstacles):
+    def __init__(self, scenario, n_targets, n_obstacles, reward_threshold=None, backend="holoocean",
+                 action_repeat=1, observation_buffer=None, profile=False, layouts=None, seed=None,
+                 target_order="random", soft_reset=None, headless=False, observation_schema=FULL_SCHEMA):
         """
         Initialize the custom environment.
 
@@ -12,29 +19,104 @@ class custom_environment:
         - scenario: Configuration for the environment.
         - n_targets: Number of targets in the environment.
         - n_obstacles: Number of obstacles in the environment.
+        - reward_threshold: Total reward below which an episode is finished (None to disable).
+        - backend: Simulator backend, "holoocean" or the headless "numpy" backend.
+        - action_repeat: Number of simulator ticks each action is applied for.
+        - observation_buffer: Optional float32 array the observation is written into, e.g. shared memory.
+        - profile: Whether to time the simulator ticks, state updates and reward calculations.
+        - layouts: Optional layout library, or the name of its file, sampled for the targets, obstacles and
+          start pose of every episode instead of generating them once.
+        - seed: Seed of the generated targets and obstacles and of the layout sampling, e.g. the index of
+          a vector environment's worker so every worker gets its own world (None for the fixed seed 42 and
+          an unseeded layout sampling).
+        - target_order: Order the targets are visited in, "random", "nearest" or "two_opt", see target_scheduler.
+        - soft_reset: Whether resets keep the simulator's world when possible, see reset. None keeps it on the
+          backends in SOFT_RESET_BACKENDS only. The world is only kept when headless, see can_soft_reset.
+        - headless: Whether to render nothing, skipping the debug drawing of the box and targets. Obstacles
+          are still spawned, as they are physical.
+        - observation_schema: Fields of the observation, see observation_encoder.
         """
-        random.seed(42)
+        random.seed(42 if seed is None else seed)
+        self.n_targets = n_targets
+        self.n_obstacles = n_obstacles
+        self.reward_threshold = reward_threshold
+        self.action_repeat = action_repeat
+
+        # The simulator backend is created on first use, see env.
+        self.scenario = scenario
+        self.backend = backend
+        self.headless = headless
+        self.simulator = None
 
-        # Initialize the environment using holoocean.
-        self.env = holoocean.make(scenario_cfg=scenario)
+        # Props spawned in the simulator's world, by location, kept across soft resets.
+        self.soft_reset = backend in SOFT_RESET_BACKENDS if soft_reset is None else soft_reset
+        self.world_built = False
+        self.world_props = {}
+        self.n_spawned_props = 0
 
-        # Initialize state variables.
-        self.pose = np.zeros((4, 4))
-        self.prev_location = self.pose[0:3, 3]
+        # Initialize the sensor readings. The state variables are views of them, updated in place.
+        self.encoder = observation_encoder(scenario, observation_schema)
+        self.layout = self.encoder.layout
+        self.readings = np.zeros(self.encoder.readings_size, dtype=np.float32)
+        self.pose = self.readings[self.layout["pose"]].reshape(4, 4)
         self.location = self.pose[0:3, 3]
-        self.rotation = np.zeros((3,))
-        self.velocity = np.zeros((3,))
-        self.lasers = np.zeros((14,))
-        self.observation_space = [self.pose, self.rotation, self.velocity, self.lasers]
-        self.observation_space = [item for sublist in self.observation_space for item in sublist.flatten()]
-
-        # Generate random targets and obstacles.
-        self.targets = [self.generate_random_target() for _ in range(n_targets)]
-        self.choosen_targets = []
-        self.obstacles = [self.generate_random_obstacle() for _ in range(n_obstacles)]
-        
-        # Choose the initial target.
-        self.current_target = self.choose_next_target()
+        self.prev_location = self.location.copy()
+        self.rotation = self.readings[self.layout["rotation"]]
+        self.velocity = self.readings[self.layout["velocity"]]
+        self.lasers = self.readings[self.layout["lasers"]]
+        self.range_sensors = [name for name in self.layout if name not in ("pose", "rotation", "velocity", "lasers")]
+        self.sensors = ["PoseSensor", "VelocitySensor", "RotationSensor"] + self.range_sensors
+
+        # Every sensor writes its readings into its own view, holding its last reading until the next one.
+        # Sensors may run at different rates, sensor_ages counts the ticks since each sensor's last reading.
+        self.sensor_views = [self.pose, self.velocity, self.rotation] + [self.readings[self.layout[name]]
+                                                                         for name in self.range_sensors]
+        self.sensor_ages = np.zeros(len(self.sensors), dtype=np.int64)
+
+        # Initialize the observation buffer, encoded from the readings after every step.
+        self.observation_size = self.encoder.size
+        if observation_buffer is None:
+            observation_buffer = np.zeros(self.observation_size, dtype=np.float32)
+        self.observation = observation_buffer
+        self.observation[:] = 0
+
+        # Initialize the target scheduler, drawing from the seeded random module.
+        self.target_scheduler = target_scheduler(target_order, np.random.default_rng(random.getrandbits(64)))
+
+        # Generate random targets and obstacles, or sample them from the layout library.
+        self.layouts = layout_library(layouts) if isinstance(layouts, str) else layouts
+        self.layout_rng = np.random.default_rng(seed)
+        self.layout_index = None
+        self.targets_used = False
+        self.start_pose = None
+        if self.layouts is None:
+            self.targets = [self.generate_random_target() for _ in range(n_targets)]
+            self.obstacles = [self.generate_random_obstacle() for _ in range(n_obstacles)]
+
+            # Choose the initial target.
+            self.schedule_targets(scenario["agents"][0].get("location"))
+        else:
+            self.load_layout(*self.layouts.sample(self.layout_rng))
+
+        # Initialize the reward engine and episode statistics.
+        self.reward_engine = reward_engine(n_agents=1)
+        self.reward_components = {}
+        self.achieved_targets = 0
+        self.total_reward = 0
+
+        # Time the phases of a step by wrapping them, so nothing changes when profiling is disabled.
+        self.profiler = phase_profiler(profile)
+        if profile:
+            self.update_state = self.profiler.wrap("update_state", self.update_state)
+            self.reward_engine.calculate_reward = self.profiler.wrap("reward", self.reward_engine.calculate_reward)
+
+    @property
+    def env(self):
+        """Simulator backend, launched on first use so building the environment is cheap."""
+        if self.simulator is None:
+            self.simulator = make_backend(self.backend, self.scenario, self.headless)
+            self.simulator.tick = self.profiler.wrap("tick", self.simulator.tick)
+        return self.simulator
 
     def generate_random_target(self):
         """Generate a random target position."""
@@ -44,21 +126,46 @@ class custom_environment:
         """Generate a random obstacle position."""
         return [random.randint(150, 250), random.randint(-250, -150), random.randint(-290, -200)]
 
+    def schedule_targets(self, start=None):
+        """
+        Compute the visiting order of the targets and choose the initial target.
+
+        Parameters:
+        - start: Location the episode starts from.
+        """
+        self.target_scheduler.reset(self.targets, start)
+        self.current_target = self.choose_next_target()
+
     def choose_next_target(self):
         """
-        Choose the next target randomly, ensuring it has not been chosen before.
+        Choose the next target in the scheduled order.
 
         Returns:
         - target: The chosen target position.
         """
-        while True:
-            target = random.choice(self.targets)
-            if target not in self.choosen_targets:
-                self.choosen_targets.append(target)
-                return target
+        return self.target_scheduler.next()
+
+    def load_layout(self, index, layout):
+        """
+        Take the targets, obstacles and start pose of a layout, and choose the initial target.
+
+        Parameters:
+        - index: Index of the layout in the library.
+        - layout: Layout record, see layout_library.
+        """
+        if len(layout["targets"]) != self.n_targets or len(layout["obstacles"]) != self.n_obstacles:
+            raise ValueError(f"Layout {index} has {len(layout['targets'])} targets and {len(layout['obstacles'])} "
+                             f"obstacles, expected {self.n_targets} and {self.n_obstacles}")
+        self.layout_index = index
+        self.targets = layout["targets"].tolist()
+        self.obstacles = layout["obstacles"].tolist()
+        self.start_pose = (layout["start_location"].tolist(), layout["start_rotation"].tolist())
+        self.schedule_targets(self.start_pose[0])
 
     def draw_targets(self):
         """Draw targets in the environment."""
+        if self.headless:
+            return
         for i in self.targets:
             if i == self.current_target:
                 self.env.draw_point(i, color=[0, 255, 0], thickness=100, lifetime=0)
@@ -66,16 +173,100 @@ class custom_environment:
                 self.env.draw_point(i, color=[255, 255, 0], thickness=100, lifetime=0)
 
     def draw_obstacles(self):
-        """Draw obstacles in the environment."""
-        for i in self.obstacles:
-            self.env.spawn_prop(prop_type="sphere", location=i, scale=5, material="black")
+        """
+        Draw obstacles in the environment.
+
+        Only the obstacles missing from the world are spawned, and the props of obstacles no longer in the
+        layout are removed.
+        """
+        obstacles = set(map(tuple, self.obstacles))
+        for location in [location for location in self.world_props if location not in obstacles]:
+            self.env.remove_prop(self.world_props.pop(location))
+        for obstacle in self.obstacles:
+            location = tuple(obstacle)
+            if location not in self.world_props:
+                tag = f"obstacle_{self.n_spawned_props}"
+                self.n_spawned_props += 1
+                self.env.spawn_prop(prop_type="sphere", location=obstacle, scale=5, material="black", tag=tag)
+                self.world_props[location] = tag
+
+    def can_soft_reset(self):
+        """
+        Check whether the world can be kept on reset.
+
+        Only a simulator reset clears the debug drawings, so the world is only kept when headless. Otherwise
+        the target markers, drawn without a lifetime, would pile up over the episodes.
+
+        Returns:
+        - soft: Whether soft resets are enabled, the environment is headless, the world is built and every prop
+          to remove can be removed by the backend.
+        """
+        if not self.soft_reset or not self.headless or not self.world_built:
+            return False
+        obstacles = set(map(tuple, self.obstacles))
+        return hasattr(self.env, "remove_prop") or all(location in obstacles for location in self.world_props)
+
+    @property
+    def observation_space(self):
+        """Copy of the current observation."""
+        return self.observation.copy()
+
+    def get_observation(self, copy=True):
+        """
+        Get the current observation.
+
+        Parameters:
+        - copy: Whether to return a copy, or a view of the observation buffer that is overwritten on
+          every update.
+
+        Returns:
+        - observation: Observation as a float32 array.
+        """
+        return self.observation.copy() if copy else self.observation
+
+    def encode_observation(self):
+        """Encode the current readings and target into the observation buffer."""
+        self.encoder.encode(self.readings, self.current_target, self.sensor_ages, self.observation)
 
     def reset(self):
-        """Reset the environment."""
-        self.env.reset()
-        self.env.draw_box(center=[200, 200, -250], extent=[50, 50, 50], thickness=50, lifetime=0)
+        """
+        Reset the environment, sampling a new layout when a layout library is used, and restart the targets.
+
+        A soft reset teleports the AUV to its start pose, keeping the world and re-spawning only the obstacles
+        that changed. The simulator is reset and the world rebuilt on the first reset, when the environment
+        draws markers, or when obstacles must be removed and the backend cannot remove props.
+        """
+        # The targets scheduled on initialization are used by the first episode
+        if self.targets_used and self.layouts is not None:
+            self.load_layout(*self.layouts.sample(self.layout_rng))
+        elif self.targets_used:
+            self.schedule_targets(self.scenario["agents"][0].get("location"))
+        self.targets_used = True
+
+        agent = self.scenario["agents"][0]
+        if self.can_soft_reset():
+            # The teleport takes effect on the next tick, taken without thrust
+            start_pose = self.start_pose or (agent.get("location", [0, 0, 0]), agent.get("rotation", [0, 0, 0]))
+            self.env.agents[agent["agent_name"]].teleport(*start_pose)
+            self.env.act(agent["agent_name"], np.zeros(8))
+            states = self.env.tick()
+        else:
+            states = self.env.reset()
+            self.world_props = {}
+            if self.start_pose is not None:
+                self.env.agents[agent["agent_name"]].teleport(*self.start_pose)
+                states = self.env.tick()
+            if not self.headless:
+                self.env.draw_box(center=[200, 200, -250], extent=[50, 50, 50], thickness=50, lifetime=0)
+            self.world_built = True
+        self.update_state(states)
+        self.prev_location[:] = self.location
+        self.reward_engine.reset()
+        self.achieved_targets = 0
+        self.total_reward = 0
         self.draw_targets()
         self.draw_obstacles()
+        self.encode_observation()
 
     def tick(self, action):
         """
@@ -90,30 +281,100 @@ class custom_environment:
         self.env.act("auv0", action)
         return self.env.tick()
 
+    def step(self, action):
+        """
+        Apply an action for action_repeat simulator ticks and score the resulting transition.
+
+        The rewards of the ticks are accumulated, and the repeat stops early once the episode is finished.
+
+        Parameters:
+        - action: Action to be taken in the environment.
+
+        Returns:
+        - observation: View of the observation buffer after the step.
+        - reward: Reward gained during the step.
+        - done: Whether the episode is finished.
+        """
+        reward = 0
+        for _ in range(self.action_repeat):
+            tick_reward, done = self.score_tick(self.tick(action))
+            reward += tick_reward
+            if done:
+                break
+        self.encode_observation()
+        return self.observation, reward, done
+
+    def score_tick(self, states):
+        """
+        Update the state from a tick's sensor readings and calculate its reward.
+
+        Switches to the next target once the current one is reached.
+
+        Parameters:
+        - states: Dictionary containing sensor readings.
+
+        Returns:
+        - reward: Reward gained during the tick.
+        - done: Whether the episode is finished.
+        """
+        self.update_state(states)
+
+        # A pose sensor slower than the simulator leaves the location unchanged between its readings, so motion
+        # is only scored on ticks with a new pose, against the previous new pose
+        target = self.get_current_target()
+        new_pose = self.sensor_ages[0] == 0
+        reward, self.reward_components = self.reward_engine.calculate_reward(
+            self.prev_location, self.location, target, self.rotation, self.lasers, new_pose=new_pose)
+        done = False
+
+        # Update previous location
+        if new_pose:
+            self.prev_location[:] = self.location
+
+        # Check if the target is reached
+        if self.reward_engine.reach_target(self.location, target):
+            self.achieved_targets += 1
+
+            # Finish the game if all targets are reached
+            if self.achieved_targets == self.n_targets:
+                done = True
+                reward += 1000
+            else:
+                self.set_current_target(self.choose_next_target())
+                self.draw_targets()
+
+        self.total_reward += reward
+        if self.reward_threshold is not None and self.total_reward < self.reward_threshold:
+            done = True
+
+        return reward, done
+
     def update_state(self, states):
         """
         Update the internal state based on sensor readings.
 
+        Sensors missing from the readings, e.g. running at a lower rate, keep their last reading and age by
+        one tick.
+
         Parameters:
         - states: Dictionary containing sensor readings.
         """
-        sensors = ["PoseSensor", "VelocitySensor", "RotationSensor", "HorizontalRangeSensor", "UpRangeSensor",
-                   "DownRangeSensor", "UpInclinedRangeSensor", "DownInclinedRangeSensor"]
-
-        if all(element in states for element in sensors):
-            self.pose = states["PoseSensor"]
-            self.rotation = states["RotationSensor"]
-            self.velocity = states['VelocitySensor']
-            self.lasers = list(chain.from_iterable([states[key] for key in ["HorizontalRangeSensor", "UpRangeSensor",
-                                                                           "DownRangeSensor",
-                                                                           "UpInclinedRangeSensor", "DownInclinedRangeSensor"]]))
-            self.pose = np.array(self.pose)
-            self.location = self.pose[0:3, 3]
-            self.rotation = np.array(self.rotation) + 180
-            self.velocity = np.array(self.velocity)
-            self.lasers = np.array(self.lasers)
-            self.observation_space = [self.pose, self.rotation, self.velocity, self.lasers]
-            self.observation_space = [item for sublist in self.observation_space for item in sublist.flatten()]
+        self.sensor_ages += 1
+        for i, (name, view) in enumerate(zip(self.sensors, self.sensor_views)):
+            if name in states:
+                view[:] = states[name]
+                self.sensor_ages[i] = 0
+        if "RotationSensor" in states:
+            self.rotation += 180
+
+    def drain_profile(self):
+        """
+        Take the phase timings recorded since the last call.
+
+        Returns:
+        - samples: Dictionary of sample durations in seconds per phase.
+        """
+        return self.profiler.drain()
 
     def get_current_target(self):
         """Get the current target position."""
@@ -0,0 +1,93 @@
+import argparse
+import json
+import time
+import numpy as np
+from Checkpoint import read_checkpoint
+from CustomEnvironment import custom_environment
+from NumpyPolicy import numpy_policy
+from ObservationEncoder import observation_size, COMPACT_SCHEMA
+from RunningNormalizer import running_normalizer
+from TargetScheduler import TARGET_ORDERS
+from scenario import scenario
+
+# Global constants
+SCENARIO = scenario
+BACKEND = "numpy"
+CHECKPOINT_DIR = "model_checkpoints"
+N_TARGETS = 10
+N_OBSTACLES = 50
+REWARD_THRESHOLD = -1000
+ACTION_REPEAT = 5
+MAX_STEPS = int(1e4)
+N_EPISODES = 10
+TARGET_ORDER = "two_opt"
+OBSERVATION_SCHEMA = COMPACT_SCHEMA
+
+
+def evaluate(policy, env, n_episodes=N_EPISODES, max_steps=MAX_STEPS):
+    """
+    Run a policy for several episodes without training.
+
+    Parameters:
+    - policy: Policy with an act method, e.g. numpy_policy.
+    - env: Custom environment.
+    - n_episodes: Number of episodes.
+    - max_steps: Maximum number of steps per episode.
+
+    Returns:
+    - episodes: List with the total reward, achieved targets and steps of every episode.
+    """
+    episodes = []
+    for _ in range(n_episodes):
+        env.reset()
+        state = env.get_observation(copy=False)
+        for step in range(max_steps):
+            action, _ = policy.act(state)
+            state, _, done = env.step(action)
+            if done:
+                break
+        episodes.append({"total_reward": float(env.total_reward), "achieved_targets": int(env.achieved_targets),
+                         "steps": step + 1})
+    return episodes
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    parser = argparse.ArgumentParser(description="Evaluate a checkpointed policy without TensorFlow.")
+    parser.add_argument("--checkpoint", default="latest", help='Episode number of the checkpoint, "latest" or "best".')
+    parser.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR, help="Directory of the checkpoints.")
+    parser.add_argument("--backend", default=BACKEND, help='Simulator backend, "holoocean" or "numpy".')
+    parser.add_argument("--episodes", type=int, default=N_EPISODES, help="Number of episodes.")
+    parser.add_argument("--target-order", default=TARGET_ORDER, choices=TARGET_ORDERS,
+                        help="Order the targets are visited in.")
+    parser.add_argument("--headless", action="store_true", help="Render nothing.")
+    parser.add_argument("--max-steps", type=int, default=MAX_STEPS, help="Maximum number of steps per episode.")
+    args = parser.parse_args()
+
+    # Only the policy weights are loaded, the backend is launched by the first reset
+    state = read_checkpoint(args.checkpoint_dir, args.checkpoint)
+    if state is None:
+        raise SystemExit(f"No valid checkpoint {args.checkpoint} in {args.checkpoint_dir}")
+    if len(state["policy"][0]) != observation_size(SCENARIO, OBSERVATION_SCHEMA):
+        raise SystemExit(f"Checkpoint expects observations of size {len(state['policy'][0])}, OBSERVATION_SCHEMA "
+                         f"produces {observation_size(SCENARIO, OBSERVATION_SCHEMA)}")
+    normalizer = None
+    if state.get("observation_normalizer"):
+        # Frozen, evaluating must not change how the policy sees observations
+        normalizer = running_normalizer(state["observation_normalizer"][1].shape, frozen=True)
+        normalizer.set_state(state["observation_normalizer"])
+    policy = numpy_policy(state["policy"], state["metadata"]["episode"], normalizer)
+    env = custom_environment(SCENARIO, N_TARGETS, N_OBSTACLES, REWARD_THRESHOLD, args.backend, ACTION_REPEAT,
+                             target_order=args.target_order, headless=args.headless,
+                             observation_schema=OBSERVATION_SCHEMA)
+    load_seconds = time.perf_counter() - start
+
+    episodes = evaluate(policy, env, args.episodes, args.max_steps)
+    print(json.dumps({
+        "checkpoint_episode": policy.version,
+        "load_seconds": load_seconds,
+        "mean_total_reward": float(np.mean([episode["total_reward"] for episode in episodes])) if episodes else None,
+        "mean_achieved_targets": float(np.mean([episode["achieved_targets"] for episode in episodes]))
+        if episodes else None,
+        "episodes": episodes,
+    }, indent=2))
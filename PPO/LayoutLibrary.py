@@ -0,0 +1,169 @@
+import argparse
+import numpy as np
+from ObstacleIndex import obstacle_index
+from scenario import scenario
+
+# Global constants
+LAYOUTS_FILENAME = "layouts.npy"
+N_LAYOUTS = 10000
+N_TARGETS = 10
+N_OBSTACLES = 50
+SEED = 0
+
+# Ranges of the generated positions, matching custom_environment.generate_random_target/obstacle.
+TARGET_RANGE = ((150, 250), (150, 250), (-290, -200))
+OBSTACLE_RANGE = ((150, 250), (-250, -150), (-290, -200))
+OBSTACLE_RADIUS = 2.5
+MIN_CLEARANCE = 5.0
+START_JITTER = (20.0, 20.0, 10.0)
+
+
+def layout_dtype(n_targets, n_obstacles):
+    """
+    Calculate the record type of a layout.
+
+    Parameters:
+    - n_targets: Number of targets per layout.
+    - n_obstacles: Number of obstacles per layout.
+
+    Returns:
+    - dtype: Structured dtype with the seed, targets, obstacles and start pose of a layout.
+    """
+    return np.dtype([("seed", "<i8"), ("targets", "<f4", (n_targets, 3)), ("obstacles", "<f4", (n_obstacles, 3)),
+                     ("start_location", "<f4", (3,)), ("start_rotation", "<f4", (3,))])
+
+
+def random_points(rng, n_points, ranges):
+    """
+    Draw random integer points, inclusive of the range ends.
+
+    Parameters:
+    - rng: NumPy random generator.
+    - n_points: Number of points.
+    - ranges: (low, high) range per axis.
+
+    Returns:
+    - points: Points with shape [n_points, 3].
+    """
+    low, high = np.array(ranges).T
+    return rng.integers(low, high + 1, size=(n_points, 3))
+
+
+def generate_layout(layout, seed, start_location, start_rotation):
+    """
+    Generate one layout in place from its seed.
+
+    Targets and the start location are redrawn until they keep MIN_CLEARANCE from every obstacle surface.
+
+    Parameters:
+    - layout: Layout record to fill.
+    - seed: Seed of the layout.
+    - start_location: Nominal start location, jittered by up to START_JITTER.
+    - start_rotation: Nominal start rotation, the yaw is drawn at random.
+    """
+    rng = np.random.default_rng(seed)
+    n_targets, n_obstacles = len(layout["targets"]), len(layout["obstacles"])
+    obstacles = random_points(rng, n_obstacles, OBSTACLE_RANGE)
+    index = obstacle_index(obstacles, OBSTACLE_RADIUS)
+
+    # Redraw only the targets too close to an obstacle or duplicating another target
+    targets = random_points(rng, n_targets, TARGET_RANGE)
+    rejected = np.ones(n_targets, dtype=bool)
+    while np.any(rejected):
+        targets[rejected] = random_points(rng, int(np.sum(rejected)), TARGET_RANGE)
+        _, first = np.unique(targets, axis=0, return_index=True)
+        rejected = index.clearance(targets) < MIN_CLEARANCE
+        rejected[np.setdiff1d(np.arange(n_targets), first)] = True
+
+    location = start_location + rng.uniform(-1, 1, 3) * START_JITTER
+    while index.clearance(location)[0] < MIN_CLEARANCE:
+        location = start_location + rng.uniform(-1, 1, 3) * START_JITTER
+
+    layout["seed"] = seed
+    layout["targets"] = targets
+    layout["obstacles"] = obstacles
+    layout["start_location"] = location
+    layout["start_rotation"] = [start_rotation[0], start_rotation[1], rng.uniform(0, 360)]
+
+
+def generate_layouts(filename=LAYOUTS_FILENAME, n_layouts=N_LAYOUTS, n_targets=N_TARGETS, n_obstacles=N_OBSTACLES,
+                     seed=SEED, scenario=scenario):
+    """
+    Generate a library of layouts into a memory-mapped .npy file.
+
+    Every layout is generated from its own seed, stored with it, so any layout can be reproduced on its own.
+
+    Parameters:
+    - filename: Name of the .npy file.
+    - n_layouts: Number of layouts.
+    - n_targets: Number of targets per layout.
+    - n_obstacles: Number of obstacles per layout.
+    - seed: Seed of the library.
+    - scenario: Configuration providing the nominal start pose.
+    """
+    agent = scenario["agents"][0]
+    start_location = np.array(agent.get("location", [0, 0, 0]), dtype=float)
+    start_rotation = np.array(agent.get("rotation", [0, 0, 0]), dtype=float)
+    layouts = np.lib.format.open_memmap(filename, mode="w+", dtype=layout_dtype(n_targets, n_obstacles),
+                                        shape=(n_layouts,))
+    seeds = np.random.SeedSequence(seed).generate_state(n_layouts, dtype=np.uint32)
+    for i in range(n_layouts):
+        generate_layout(layouts[i], int(seeds[i]), start_location, start_rotation)
+    layouts.flush()
+    del layouts
+
+
+class layout_library:
+    def __init__(self, filename=LAYOUTS_FILENAME):
+        """
+        Initialize the layout library.
+
+        The layouts are memory-mapped read only, so every worker shares the same pages of the file and
+        reading a layout copies nothing.
+
+        Parameters:
+        - filename: Name of the .npy file written by generate_layouts.
+        """
+        self.filename = filename
+        self.layouts = np.load(filename, mmap_mode="r")
+
+    def __len__(self):
+        return len(self.layouts)
+
+    def __getitem__(self, index):
+        """
+        Get a layout.
+
+        Parameters:
+        - index: Index of the layout.
+
+        Returns:
+        - layout: Read only layout record with seed, targets, obstacles, start_location and start_rotation.
+        """
+        return self.layouts[index]
+
+    def sample(self, rng):
+        """
+        Sample a layout.
+
+        Parameters:
+        - rng: NumPy random generator.
+
+        Returns:
+        - index: Index of the layout.
+        - layout: Layout record.
+        """
+        index = int(rng.integers(len(self.layouts)))
+        return index, self.layouts[index]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a memory-mapped library of scenario layouts.")
+    parser.add_argument("--output", default=LAYOUTS_FILENAME, help="Name of the .npy file.")
+    parser.add_argument("--layouts", type=int, default=N_LAYOUTS, help="Number of layouts.")
+    parser.add_argument("--targets", type=int, default=N_TARGETS, help="Number of targets per layout.")
+    parser.add_argument("--obstacles", type=int, default=N_OBSTACLES, help="Number of obstacles per layout.")
+    parser.add_argument("--seed", type=int, default=SEED, help="Seed of the library.")
+    args = parser.parse_args()
+    generate_layouts(args.output, args.layouts, args.targets, args.obstacles, args.seed)
+    print(f"Wrote {args.layouts} layouts to {args.output}")
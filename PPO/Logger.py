@@ -0,0 +1,132 @@
+import collections
+import contextlib
+import logging
+import time
+import numpy as np
+
+
+def configure_logging(level=logging.INFO):
+    """
+    Configure the format and level of the root logger.
+
+    Parameters:
+    - level: Logging level, e.g. logging.INFO.
+    """
+    logging.basicConfig(level=level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+
+class step_logger:
+    def __init__(self, name="training", every_n_steps=200, every_seconds=None, buffer_size=1000,
+                 dump_filename="recent_steps.log", silent=False):
+        """
+        Initialize the step logger.
+
+        Step records are kept in a ring buffer and only every Nth step, or one step every T seconds, is
+        emitted. The buffer is dumped to a file at the end of an episode or on a crash.
+
+        Parameters:
+        - name: Name of the logger.
+        - every_n_steps: Emit one step record every N steps (None to disable).
+        - every_seconds: Emit one step record every T seconds (None to disable).
+        - buffer_size: Number of recent step records kept.
+        - dump_filename: File the recent step records are dumped to.
+        - silent: Whether to disable all logging and recording, e.g. in benchmark mode.
+        """
+        self.logger = logging.getLogger(name)
+        self.every_n_steps = every_n_steps
+        self.every_seconds = every_seconds
+        self.records = collections.deque(maxlen=buffer_size)
+        self.dump_filename = dump_filename
+        self.silent = silent
+        self.steps = 0
+        self.last_emit_time = time.monotonic()
+
+    def step(self, **record):
+        """
+        Record a step, and emit it if it is due.
+
+        Parameters:
+        - record: Fields of the step record, e.g. episode, action, target, reward.
+        """
+        if self.silent:
+            return
+        self.steps += 1
+        self.records.append(record)
+
+        due = self.every_n_steps is not None and self.steps % self.every_n_steps == 0
+        if self.every_seconds is not None and time.monotonic() - self.last_emit_time >= self.every_seconds:
+            due = True
+        if due and self.logger.isEnabledFor(logging.INFO):
+            self.last_emit_time = time.monotonic()
+            self.logger.info("Step %d: %s", self.steps, self.format_record(record))
+
+    def info(self, message, *args):
+        """Log a message at INFO level."""
+        if not self.silent:
+            self.logger.info(message, *args)
+
+    def debug(self, message, *args):
+        """Log a message at DEBUG level."""
+        if not self.silent:
+            self.logger.debug(message, *args)
+
+    def warning(self, message, *args):
+        """Log a message at WARNING level."""
+        if not self.silent:
+            self.logger.warning(message, *args)
+
+    @staticmethod
+    def format_record(record):
+        """
+        Format a step record as a single line of text.
+
+        Parameters:
+        - record: Fields of the step record.
+
+        Returns:
+        - text: Formatted record.
+        """
+        fields = []
+        for key, value in record.items():
+            if isinstance(value, np.ndarray):
+                value = np.array2string(value, precision=3, separator=", ", max_line_width=np.inf).replace("\n", "")
+            fields.append(f"{key}={value}")
+        return ", ".join(fields)
+
+    def dump(self, reason):
+        """
+        Write the recent step records to the dump file.
+
+        Parameters:
+        - reason: Why the records are dumped, e.g. "episode end" or "crash".
+        """
+        if self.silent or not self.records:
+            return
+        with open(self.dump_filename, "w") as dump_file:
+            dump_file.write(f"# Last {len(self.records)} steps, dumped on {reason}\n")
+            for record in self.records:
+                dump_file.write(self.format_record(record) + "\n")
+        self.logger.debug("Dumped %d steps to %s on %s", len(self.records), self.dump_filename, reason)
+
+    def episode_end(self, **summary):
+        """
+        Log an episode summary, dump the recent step records and start a new episode.
+
+        Parameters:
+        - summary: Fields of the episode summary, e.g. episode, total_reward.
+        """
+        if self.silent:
+            return
+        self.logger.info("Episode finished: %s", self.format_record(summary))
+        self.dump("episode end")
+        self.records.clear()
+        self.steps = 0
+
+    @contextlib.contextmanager
+    def dump_on_crash(self):
+        """Context manager dumping the recent step records if an exception escapes it."""
+        try:
+            yield self
+        except BaseException:
+            self.dump("crash")
+            raise
@@ -1,119 +1,199 @@
+import logging
+import time
 import numpy as np
+from ActorLearner import actor_learner, train_actor_learner
+from Checkpoint import checkpoint_manager
+from Logger import configure_logging, step_logger
+from ObservationEncoder import COMPACT_SCHEMA
 from PPOAgent import PPO_agent
-from RewardFunction import reward_function
-from CustomEnvironment import custom_environment
-from scenario import scenario
-from utils import log_to_csv, graph
+from Profiler import phase_profiler, PROFILE_FIELDS
+from RolloutBuffer import rollout_buffer
+from ScenarioBuilder import build_scenario
+from VectorEnvironment import vector_environment
+from utils import metrics_store, background_plotter
 
 # Global constants
-SCENARIO = scenario
+BACKEND = "holoocean"
 ACTION_SPACE_SIZE = 5
-OBSERVATION_SPACE_SIZE = 36
+N_THRUSTERS = 8
+OBSERVATION_SCHEMA = COMPACT_SCHEMA
+# Size of the networks' input, checked against the size SCENARIO and OBSERVATION_SCHEMA produce
+OBSERVATION_SPACE_SIZE = 29
+SENSOR_HZ = None
+SCENARIO = build_scenario(sensor_hz=SENSOR_HZ, expected_observation_size=OBSERVATION_SPACE_SIZE,
+                          observation_schema=OBSERVATION_SCHEMA)
+NORMALIZE_OBSERVATIONS = True
+NORMALIZE_REWARDS = False
+N_ENVS = 4
 N_TARGETS = 10
 N_OBSTACLES = 50
+LAYOUTS = None
+TARGET_ORDER = "random"
+HEADLESS = False
 LAST_EPISODE = 0
+RESUME = True
 N_EPISODES = 100000
 REWARD_THRESHOLD = -1000
-READING_FACTOR = 5
-MAX_STEPS = int(READING_FACTOR*1e4)
+ACTION_REPEAT = 5
+MAX_STEPS = int(1e4)
+LOG_LEVEL = logging.INFO
+LOG_EVERY_N_STEPS = 200
+LOG_EVERY_SECONDS = None
+BENCHMARK_MODE = False
+PLOT_EVERY_N_EPISODES = 50
+PROFILE = False
+PROFILE_EPISODES = None
+CHECKPOINT_DIR = "model_checkpoints"
+CHECKPOINT_EVERY_N_EPISODES = 20
+KEEP_LAST_CHECKPOINTS = 3
+KEEP_BEST_CHECKPOINTS = 3
+ACTOR_LEARNER = False
+ROLLOUT_LENGTH = 256
+TRAJECTORIES_PER_UPDATE = 4
+MAX_POLICY_LAG = 2
 
 if __name__ == "__main__":
 
-    # Initialize the environment, and PPO agent
-    env = custom_environment(SCENARIO, N_TARGETS, N_OBSTACLES)
-    ppo_agent = PPO_agent(ACTION_SPACE_SIZE, OBSERVATION_SPACE_SIZE)
+    # Initialize logging and PPO agent
+    configure_logging(LOG_LEVEL)
+    log = step_logger(every_n_steps=LOG_EVERY_N_STEPS, every_seconds=LOG_EVERY_SECONDS, silent=BENCHMARK_MODE)
+    ppo_agent = PPO_agent(ACTION_SPACE_SIZE, OBSERVATION_SPACE_SIZE, NORMALIZE_OBSERVATIONS, NORMALIZE_REWARDS)
     ppo_agent.load_model(LAST_EPISODE)
 
-    for episode in range(LAST_EPISODE, N_EPISODES):
-        
-        # Initialize variables
-        achieved_targets = 0
-        state = np.array(env.observation_space)
-        total_reward = 0
-        episode_states, episode_actions, episode_rewards, episode_dones, episode_probs = [], [], [], [], []
-
-        # Reset the environment
-        env.reset()
-
-        for i in range(MAX_STEPS):
-            #Select action based on the ppo agent weights
-            action_probs = ppo_agent.policy(np.array([state]))[0].numpy()
-            action = ppo_agent.select_action(state)
-            print("Episode: ", episode)
-            print("Selected action:", action)
-
-            # Perform a simulation step
-            states = env.tick(action)
-            env.update_state(states)
-
-            # Update state and calculate rewards
-            next_state = env.observation_space
-            done = False
-            print("Target:", env.get_current_target())
-            print("Reward:", total_reward)
-            
-            reward_f = reward_function(env.prev_location, env.location, env.get_current_target(), 
-                                       env.rotation, env.lasers)
-            reward = reward_f.calculate_reward()
-
-            # Update previous location
-            env.prev_location = env.location
-
-            # Check if the target is reached
-            if reward_f.reach_target():                
-                achieved_targets += 1
-
-                # Finish the game if all targets are reached
-                if achieved_targets == N_TARGETS:
-                    print("Game Completed")
-                    done = True
-                    reward += 1000
-                    episode_states.append(state)
-                    episode_actions.append(action)
-                    episode_rewards.append(reward)
-                    episode_dones.append(done)
-                    episode_probs.append(action_probs)
-
-                    total_reward += reward
-                    state = next_state
-                    break
-                
-                env.set_current_target(env.choose_next_target())
-                env.draw_targets()
-            
-            if i % READING_FACTOR == 0:
-                #Append state, selected action, gained reward, done, and action probabilities
-                episode_states.append(state)
-                episode_actions.append(action)
-                episode_rewards.append(reward)
-                episode_dones.append(done)
-                episode_probs.append(action_probs)
-
-            total_reward += reward
-            state = next_state
-            if done or total_reward < REWARD_THRESHOLD:
-                break
-        
-        # Convert episode data to arrays for processing
-        episode_states = np.array(episode_states)
-        episode_actions = np.array(episode_actions)
-        episode_rewards = np.array(episode_rewards)
-        episode_dones = np.array(episode_dones)
-        episode_probs = np.array(episode_probs)
-
-        # Calculate advantages and normalize them
-        values = ppo_agent.value_network(episode_states).numpy().flatten()
-        advantages = ppo_agent.compute_advantages(episode_rewards, values, episode_dones)
-        advantages = (advantages - np.mean(advantages)) / (np.std(advantages) + 1e-8)
-        
-        # Update policy and value networks
-        ppo_agent.update_policy(episode_states, episode_actions, advantages, episode_probs, episode)
-        discounted_rewards = ppo_agent.discounted_rewards(episode_rewards)
-        ppo_agent.update_value_network(episode_states, discounted_rewards, episode, achieved_targets)
-        ppo_agent.log_episode_reward(episode, total_reward)
-        log_to_csv(ppo_agent.log_filename)
-        graph(ppo_agent.log_filename)
-
-        # Save the model periodically
-        if episode % 20 == 0:
-            ppo_agent.save_model(episode)
\ No newline at end of file
+    # Resume from the latest checkpoint, restoring the optimizer, episode number and random generators
+    checkpoints = checkpoint_manager(CHECKPOINT_DIR, KEEP_LAST_CHECKPOINTS, KEEP_BEST_CHECKPOINTS)
+    first_episode = LAST_EPISODE
+    try:
+        checkpoint = checkpoints.load(ppo_agent) if RESUME else None
+    except ValueError as error:
+        raise SystemExit(f"Cannot resume from {CHECKPOINT_DIR}: {error}. Set RESUME to False or use another "
+                         f"CHECKPOINT_DIR to train from scratch.")
+    if checkpoint is not None:
+        first_episode = checkpoint["episode"] + 1
+
+    # Initialize the metrics store and the background plotter
+    ppo_agent.create_log_file()
+    metrics = metrics_store(ppo_agent.log_filename)
+    plotter = background_plotter(metrics, every_n_episodes=PLOT_EVERY_N_EPISODES)
+
+    # Initialize the phase profiler, a no-op unless PROFILE is set
+    profiler = phase_profiler(PROFILE, PROFILE_EPISODES, ppo_agent.log_filename)
+    if PROFILE:
+        profile_metrics = metrics_store(ppo_agent.log_filename + "_profile", PROFILE_FIELDS)
+
+    if ACTOR_LEARNER:
+        # Actor processes stream trajectories while this process learns, one update per TRAJECTORIES_PER_UPDATE
+        learner = actor_learner(N_ENVS, SCENARIO, N_TARGETS, N_OBSTACLES, ppo_agent.get_policy_weights(),
+                                REWARD_THRESHOLD, BACKEND, ACTION_REPEAT, ROLLOUT_LENGTH, MAX_STEPS,
+                                max_policy_lag=MAX_POLICY_LAG, layouts=LAYOUTS, target_order=TARGET_ORDER,
+                                headless=HEADLESS, normalizer_state=ppo_agent.get_normalizer_state(),
+                                observation_schema=OBSERVATION_SCHEMA)
+        with log.dump_on_crash():
+            train_actor_learner(ppo_agent, learner, metrics, plotter, checkpoints, log, first_episode, N_EPISODES,
+                                TRAJECTORIES_PER_UPDATE, CHECKPOINT_EVERY_N_EPISODES)
+        learner.close()
+    else:
+        # Initialize the environments, simulation and learning alternate every episode
+        env = vector_environment(N_ENVS, SCENARIO, N_TARGETS, N_OBSTACLES, REWARD_THRESHOLD, BACKEND,
+                                 ACTION_REPEAT, profile=PROFILE, layouts=LAYOUTS, target_order=TARGET_ORDER,
+                                 headless=HEADLESS, observation_schema=OBSERVATION_SCHEMA)
+        rollout = rollout_buffer(MAX_STEPS, N_ENVS, OBSERVATION_SPACE_SIZE, N_THRUSTERS, ACTION_SPACE_SIZE)
+
+        # Time the phases of the loop by wrapping them, the functions themselves are used when disabled
+        act = profiler.wrap("inference", ppo_agent.act)
+        env_step = profiler.wrap("env_step", env.step)
+        compute_gae = profiler.wrap("advantages", ppo_agent.compute_gae)
+        update_networks = profiler.wrap("update", ppo_agent.update)
+
+        with log.dump_on_crash():
+            for episode in range(first_episode, N_EPISODES):
+
+                # Initialize variables, the rollout buffer is reused across episodes
+                total_rewards = np.zeros(N_ENVS)
+                rollout.reset()
+                profiler.begin_episode(episode)
+                rollout_start = time.perf_counter()
+
+                # Reset the environments
+                states = env.reset()
+                running = np.ones(N_ENVS, dtype=bool)
+
+                for i in range(MAX_STEPS):
+                    # Select actions for all environments with a single compiled policy call
+                    actions, action_probs = act(states)
+
+                    # Apply the actions for ACTION_REPEAT simulation ticks in every running environment
+                    next_states, rewards, dones = env_step(actions)
+
+                    #Append state, selected action, gained reward, done, and action probabilities
+                    rollout.add(states, actions, rewards, dones, action_probs, running)
+
+                    total_rewards += rewards
+                    log.step(episode=episode, step=i, actions=actions, rewards=rewards,
+                             total_rewards=total_rewards.copy())
+                    running &= ~dones
+                    states = next_states
+                    if not running.any():
+                        break
+
+                rollout_seconds = time.perf_counter() - rollout_start
+                achieved_targets = env.get_attr("achieved_targets")
+                log.episode_end(episode=episode, steps=i + 1, total_rewards=total_rewards,
+                                achieved_targets=achieved_targets)
+
+                # Calculate GAE advantages and value targets for all environments at once. Environments still
+                # running after the last step are truncated and bootstrap from the value of their final state.
+                # States and rewards are normalized with the statistics of the previous rollouts.
+                values = ppo_agent.values(rollout.flat("states")).reshape(len(rollout), N_ENVS)
+                next_values = ppo_agent.values(states)
+                all_advantages, all_returns = compute_gae(ppo_agent.scale_rewards(rollout.view("rewards")), values,
+                                                          rollout.view("dones"), next_values)
+
+                # Gather the valid steps of all environments for processing
+                samples = rollout.valid_indices()
+                episode_states = rollout.flat("states")[samples]
+                episode_actions = rollout.flat("actions")[samples]
+                episode_probs = rollout.flat("probs")[samples]
+                discounted_rewards = all_returns.ravel()[samples]
+
+                # Normalize advantages
+                advantages = all_advantages.ravel()[samples]
+                advantages = (advantages - np.mean(advantages)) / (np.std(advantages) + 1e-8)
+
+                # Update policy and value networks over several epochs of shuffled minibatches
+                update = update_networks(episode_states, episode_actions, advantages, episode_probs,
+                                         discounted_rewards, episode, np.mean(achieved_targets))
+                ppo_agent.update_normalizers(episode_states, rollout.flat("rewards")[samples])
+                ppo_agent.log_episode_reward(episode, np.mean(total_rewards))
+                log.info("Update: %s", log.format_record(update))
+
+                # Record the episode metrics and regenerate the plots periodically
+                with profiler.span("metrics"):
+                    metrics.append(episode=episode, policy_loss=update["policy_loss"],
+                                   value_loss=update["value_loss"], total_reward=np.mean(total_rewards),
+                                   achieved_targets=np.mean(achieved_targets), clip_fraction=update["clip_fraction"],
+                                   update_samples_per_sec=update["samples_per_sec"])
+                    plotter.request(episode)
+
+                # Aggregate the phase timings of the episode, including the ones of the environment workers
+                if PROFILE:
+                    for worker_samples in env.env_method("drain_profile"):
+                        profiler.merge(worker_samples)
+                    record = profiler.summary(episode, rollout_seconds, len(episode_states))
+                    profile_metrics.append(**record)
+                    log.info("Profile: %s", log.format_record({name: round(value, 1)
+                                                               for name, value in record.items()}))
+                profile_filename = profiler.end_episode(episode)
+                if profile_filename is not None:
+                    log.info("Wrote cProfile capture to %s", profile_filename)
+
+                # Checkpoint the training state periodically, written in the background
+                if episode % CHECKPOINT_EVERY_N_EPISODES == 0:
+                    checkpoints.save(ppo_agent, episode, np.mean(total_rewards))
+        env.close()
+
+    checkpoints.close()
+    plotter.close()
+    metrics.close()
+    if PROFILE:
+        profile_metrics.close()
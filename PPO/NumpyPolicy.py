@@ -0,0 +1,91 @@
+import numpy as np
+
+
+def flatten_weights(weights):
+    """
+    Pack a list of weight arrays into one flat float32 array.
+
+    Parameters:
+    - weights: List of weight arrays, e.g. from model.get_weights().
+
+    Returns:
+    - flat: Flat float32 array.
+    - shapes: Shapes of the weight arrays.
+    """
+    flat = np.concatenate([np.asarray(weight, dtype=np.float32).ravel() for weight in weights])
+    return flat, [np.shape(weight) for weight in weights]
+
+
+def unflatten_weights(flat, shapes):
+    """
+    Split a flat array into weight arrays.
+
+    Parameters:
+    - flat: Flat array.
+    - shapes: Shapes of the weight arrays.
+
+    Returns:
+    - weights: List of views of flat with the given shapes.
+    """
+    weights, start = [], 0
+    for shape in shapes:
+        size = int(np.prod(shape))
+        weights.append(flat[start:start + size].reshape(shape))
+        start += size
+    return weights
+
+
+class numpy_policy:
+    def __init__(self, weights=None, version=-1, normalizer=None):
+        """
+        Initialize the NumPy policy.
+
+        A NumPy copy of the policy network's forward pass, for processes that only act and should not
+        load TensorFlow, like actors and evaluation.
+
+        Parameters:
+        - weights: Kernels and biases of the dense layers, as returned by the policy's get_weights().
+        - version: Version of the weights.
+        - normalizer: Optional frozen running_normalizer the states are normalized with, as in PPO_agent.
+        """
+        self.normalizer = normalizer
+        self.kernels = []
+        self.biases = []
+        self.version = version
+        if weights is not None:
+            self.set_weights(weights, version)
+
+    def set_weights(self, weights, version=-1):
+        """
+        Set the weights of the dense layers.
+
+        Parameters:
+        - weights: Kernels and biases of the dense layers, alternating.
+        - version: Version of the weights.
+        """
+        self.kernels = [np.array(weight, dtype=np.float32) for weight in weights[0::2]]
+        self.biases = [np.array(weight, dtype=np.float32) for weight in weights[1::2]]
+        self.version = version
+
+    def act(self, states):
+        """
+        Select actions with a forward pass of the policy network, matching PPO_agent.act.
+
+        Parameters:
+        - states: A state, or a batch of states with shape [n_envs, observation_space_size].
+
+        Returns:
+        - actions: Thruster commands, with shape [8] or [n_envs, 8].
+        - action_probs: Policy outputs, with shape [num_actions] or [n_envs, num_actions].
+        """
+        action_probs = np.asarray(states, dtype=np.float32)
+        if self.normalizer is not None:
+            action_probs = self.normalizer.normalize(action_probs)
+        for kernel, bias in zip(self.kernels[:-1], self.biases[:-1]):
+            action_probs = np.maximum(action_probs @ kernel + bias, 0)
+        action_probs = action_probs @ self.kernels[-1] + self.biases[-1]
+
+        # Same heave on the 4 vertical thrusters, then the 4 vectored thrusters
+        heave = action_probs[..., 4:5]
+        actions = np.concatenate([heave, heave, heave, heave, action_probs[..., :4]], axis=-1)
+        return 50 * actions, action_probs
@@ -0,0 +1,133 @@
+import numpy as np
+
+# Fields an observation schema can select, see observation_encoder.
+OBSERVATION_FIELDS = ["pose", "position", "target", "rotation", "rotation_matrix", "rotation_sincos", "velocity",
+                      "lasers", "sensor_ages"]
+
+# Schema of the full observation: the flattened 4x4 pose, the rotation, the velocity and the lasers.
+FULL_SCHEMA = ["pose", "rotation", "velocity", "lasers"]
+
+# Schema without redundant entries: no constant pose row and a single rotation representation.
+COMPACT_SCHEMA = ["position", "target", "rotation_sincos", "velocity", "lasers"]
+
+# Indices of the position and the rotation block in the flattened 4x4 pose.
+POSITION_INDICES = [3, 7, 11]
+ROTATION_MATRIX_INDICES = [0, 1, 2, 4, 5, 6, 8, 9, 10]
+
+
+def sensor_layout(scenario):
+    """
+    Calculate the layout of the sensor readings of a scenario.
+
+    The readings hold the flattened 4x4 pose, the rotation, the velocity and the lasers of every
+    range finder, in the order the range finders are declared in the scenario.
+
+    Parameters:
+    - scenario: Configuration for the environment.
+
+    Returns:
+    - layout: Dictionary mapping "pose", "rotation", "velocity", "lasers" and each range finder's name
+      to its slice of the readings.
+    - size: Size of the readings.
+    """
+    layout = {"pose": slice(0, 16), "rotation": slice(16, 19), "velocity": slice(19, 22)}
+    size = 22
+    for sensor in scenario["agents"][0]["sensors"]:
+        if sensor["sensor_type"] == "RangeFinderSensor":
+            laser_count = sensor.get("configuration", {}).get("LaserCount", 1)
+            layout[sensor["sensor_name"]] = slice(size, size + laser_count)
+            size += laser_count
+    layout["lasers"] = slice(22, size)
+    return layout, size
+
+
+class observation_encoder:
+    def __init__(self, scenario, schema=FULL_SCHEMA):
+        """
+        Initialize the observation encoder.
+
+        The schema selects the fields of the observation, in order:
+        - pose: Flattened 4x4 pose matrix (16).
+        - position: Location of the AUV (3).
+        - target: Vector from the AUV to the current target (3).
+        - rotation: Roll, pitch and yaw in degrees (3).
+        - rotation_matrix: Rotation block of the pose matrix (9).
+        - rotation_sincos: Sines and cosines of the roll, pitch and yaw (6).
+        - velocity: Velocity of the AUV (3).
+        - lasers: Distances of every range finder's lasers.
+        - sensor_ages: Ticks since each sensor's last reading, see custom_environment.
+
+        Parameters:
+        - scenario: Configuration for the environment.
+        - schema: List of fields, e.g. FULL_SCHEMA or COMPACT_SCHEMA.
+        """
+        unknown = [field for field in schema if field not in OBSERVATION_FIELDS]
+        if unknown or len(set(schema)) != len(schema):
+            raise ValueError(f"Invalid observation schema {schema!r}, expected distinct fields of {OBSERVATION_FIELDS}")
+        self.schema = list(schema)
+        self.layout, self.readings_size = sensor_layout(scenario)
+        n_sensors = 3 + len(self.layout) - 4
+
+        # Fields copied from the readings, by the index of every entry in the readings
+        pose = np.arange(16)
+        copied = {
+            "pose": pose,
+            "position": pose[POSITION_INDICES],
+            "rotation": np.arange(self.layout["rotation"].start, self.layout["rotation"].stop),
+            "rotation_matrix": pose[ROTATION_MATRIX_INDICES],
+            "velocity": np.arange(self.layout["velocity"].start, self.layout["velocity"].stop),
+            "lasers": np.arange(self.layout["lasers"].start, self.layout["lasers"].stop),
+        }
+        sizes = {name: len(indices) for name, indices in copied.items()}
+        sizes.update({"target": 3, "rotation_sincos": 6, "sensor_ages": n_sensors})
+
+        self.fields = {}
+        self.size = 0
+        for field in self.schema:
+            self.fields[field] = slice(self.size, self.size + sizes[field])
+            self.size += sizes[field]
+
+        # The copied fields are gathered with a single indexing operation
+        self.source = np.concatenate([copied[field] for field in self.schema if field in copied] + [[]]).astype(int)
+        self.destination = np.concatenate([np.arange(self.fields[field].start, self.fields[field].stop)
+                                           for field in self.schema if field in copied] + [[]]).astype(int)
+        self.rotation = self.layout["rotation"]
+
+    def encode(self, readings, target, sensor_ages, out=None):
+        """
+        Encode sensor readings into an observation.
+
+        Parameters:
+        - readings: Sensor readings laid out as described by sensor_layout.
+        - target: Current target position.
+        - sensor_ages: Ticks since each sensor's last reading.
+        - out: Optional float32 array the observation is written into.
+
+        Returns:
+        - observation: Observation as a float32 array of size self.size.
+        """
+        if out is None:
+            out = np.empty(self.size, dtype=np.float32)
+        out[self.destination] = readings[self.source]
+        if "target" in self.fields:
+            out[self.fields["target"]] = np.asarray(target) - readings[POSITION_INDICES]
+        if "rotation_sincos" in self.fields:
+            radians = np.radians(readings[self.rotation])
+            out[self.fields["rotation_sincos"]] = np.concatenate([np.sin(radians), np.cos(radians)])
+        if "sensor_ages" in self.fields:
+            out[self.fields["sensor_ages"]] = sensor_ages
+        return out
+
+
+def observation_size(scenario, schema=FULL_SCHEMA):
+    """
+    Calculate the size of the observation a scenario produces.
+
+    Parameters:
+    - scenario: Configuration for the environment.
+    - schema: Fields of the observation, see observation_encoder.
+
+    Returns:
+    - size: Size of the observation.
+    """
+    return observation_encoder(scenario, schema).size
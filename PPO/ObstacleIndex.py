@@ -0,0 +1,237 @@
+import numpy as np
+
+# Cell coordinates are packed into a single int64 key, 20 bits per axis.
+KEY_BITS = 20
+KEY_OFFSET = 1 << (KEY_BITS - 1)
+
+
+def raycast_spheres(origin, directions, centers, radii, max_distance):
+    """
+    Calculate the distance along each ray to the nearest sphere surface.
+
+    Parameters:
+    - origin: Origin of the rays.
+    - directions: Unit directions with shape [n_rays, 3].
+    - centers: Sphere centers with shape [n_spheres, 3].
+    - radii: Sphere radii with shape [n_spheres].
+    - max_distance: Distance returned for rays that hit nothing, a scalar or one per ray.
+
+    Returns:
+    - distances: Hit distances with shape [n_rays]. Rays starting inside a sphere return 0.
+    """
+    distances = np.full(len(directions), max_distance, dtype=float)
+    if len(centers) == 0:
+        return distances
+    offsets = centers - origin
+    b = directions @ offsets.T
+    c = np.einsum("ij,ij->i", offsets, offsets) - radii ** 2
+    discriminant = b ** 2 - c
+    hit = discriminant >= 0
+    t = b - np.sqrt(np.where(hit, discriminant, 0))
+    t = np.where(c < 0, 0, t)
+    t = np.where(hit & (t >= 0), t, np.inf)
+    return np.minimum(distances, t.min(axis=1))
+
+
+class obstacle_index:
+    def __init__(self, centers, radii, cell_size=10.0):
+        """
+        Initialize the obstacle index.
+
+        A uniform grid over sphere obstacles, built once per layout. Queries only visit the grid cells
+        around the query points, so their cost does not grow with the total number of obstacles.
+
+        Parameters:
+        - centers: Sphere centers with shape [n_obstacles, 3].
+        - radii: Sphere radius, a scalar or one per obstacle.
+        - cell_size: Edge length of the grid cells.
+        """
+        self.centers = np.asarray(centers, dtype=float).reshape(-1, 3)
+        self.radii = np.broadcast_to(np.asarray(radii, dtype=float), (len(self.centers),)).copy()
+        self.max_radius = self.radii.max() if len(self.radii) else 0.0
+        self.cell_size = float(cell_size)
+        self.origin = self.centers.min(axis=0) if len(self.centers) else np.zeros(3)
+
+        cells = self.cell_of(self.centers)
+        keys = self.cell_keys(cells)
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+        self.cell_min = cells.min(axis=0) if len(cells) else np.zeros(3, dtype=np.int64)
+        self.cell_max = cells.max(axis=0) if len(cells) else np.zeros(3, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.centers)
+
+    def cell_of(self, points):
+        """
+        Calculate the grid cells containing the points.
+
+        Parameters:
+        - points: Points with shape [n_points, 3].
+
+        Returns:
+        - cells: Integer cell coordinates with shape [n_points, 3].
+        """
+        return np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+
+    @staticmethod
+    def cell_keys(cells):
+        """
+        Pack integer cell coordinates into int64 keys.
+
+        Parameters:
+        - cells: Integer cell coordinates with shape [..., 3].
+
+        Returns:
+        - keys: Keys with shape [...].
+        """
+        cells = cells + KEY_OFFSET
+        return (cells[..., 0] << (2 * KEY_BITS)) | (cells[..., 1] << KEY_BITS) | cells[..., 2]
+
+    def candidate_pairs(self, points, reach):
+        """
+        Find the obstacles in the grid cells within reach of each point.
+
+        Parameters:
+        - points: Points with shape [n_points, 3].
+        - reach: Distance around the points that must be covered.
+
+        Returns:
+        - point_indices: Index of the point of each candidate pair.
+        - obstacle_indices: Index of the obstacle of each candidate pair.
+        """
+        rings = int(np.ceil(reach / self.cell_size))
+        steps = np.arange(-rings, rings + 1)
+        offsets = np.stack(np.meshgrid(steps, steps, steps, indexing="ij"), axis=-1).reshape(-1, 3)
+        keys = self.cell_keys(self.cell_of(points)[:, None, :] + offsets).ravel()
+
+        lower = np.searchsorted(self.sorted_keys, keys, side="left")
+        upper = np.searchsorted(self.sorted_keys, keys, side="right")
+        counts = upper - lower
+        total = counts.sum()
+        if total == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        # Concatenate the ranges [lower, upper) of every cell without a Python loop.
+        starts = np.repeat(lower - np.cumsum(counts) + counts, counts)
+        positions = starts + np.arange(total)
+        point_indices = np.repeat(np.arange(len(keys)) // len(offsets), counts)
+        return point_indices, self.order[positions]
+
+    def query_radius(self, points, radius):
+        """
+        Find the obstacles whose surface is within a radius of each point.
+
+        Parameters:
+        - points: Points with shape [n_points, 3].
+        - radius: Search radius.
+
+        Returns:
+        - neighbours: List with an array of obstacle indices per point.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        if len(self) == 0:
+            return [np.zeros(0, dtype=np.int64) for _ in points]
+        point_indices, obstacle_indices = self.candidate_pairs(points, radius + self.max_radius)
+        difference = self.centers[obstacle_indices] - points[point_indices]
+        inside = np.sqrt(np.sum(difference * difference, axis=1)) - self.radii[obstacle_indices] <= radius
+        point_indices, obstacle_indices = point_indices[inside], obstacle_indices[inside]
+        splits = np.searchsorted(point_indices, np.arange(1, len(points)))
+        return np.split(obstacle_indices, splits)
+
+    def nearest(self, points):
+        """
+        Find the nearest obstacle surface to each point.
+
+        Parameters:
+        - points: Points with shape [n_points, 3].
+
+        Returns:
+        - indices: Index of the nearest obstacle per point, -1 if there are no obstacles.
+        - clearances: Distance to the nearest obstacle surface per point, negative inside an obstacle.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        indices = np.full(len(points), -1, dtype=np.int64)
+        clearances = np.full(len(points), np.inf)
+        if len(self) == 0:
+            return indices, clearances
+
+        # Grow the searched cube of cells until the best hit is closer than anything outside the cube, or the
+        # cube covers every occupied cell. Once the cube has more cells than there are obstacles, scanning all
+        # obstacles is cheaper, so the remaining points fall back to it.
+        cells = self.cell_of(points)
+        covering_ring = np.maximum(np.abs(cells - self.cell_min), np.abs(cells - self.cell_max)).max(axis=1)
+        pending = np.arange(len(points))
+        ring = 1
+        while len(pending) and (ring == 1 or (2 * ring + 1) ** 3 <= len(self)):
+            point_indices, obstacle_indices = self.candidate_pairs(points[pending], ring * self.cell_size)
+            difference = self.centers[obstacle_indices] - points[pending][point_indices]
+            surface = np.sqrt(np.sum(difference * difference, axis=1)) - self.radii[obstacle_indices]
+            if len(surface):
+                # Keep the closest candidate of every point.
+                order = np.lexsort((surface, point_indices))
+                sorted_points = point_indices[order]
+                first = order[np.r_[True, sorted_points[1:] != sorted_points[:-1]]]
+                found = pending[point_indices[first]]
+                indices[found] = obstacle_indices[first]
+                clearances[found] = surface[first]
+            pending = pending[~((clearances[pending] <= ring * self.cell_size - self.max_radius)
+                                | (covering_ring[pending] <= ring))]
+            ring += 1
+
+        # Points far from their nearest obstacle fall back to a scan of all obstacles.
+        if len(pending):
+            difference = self.centers[None, :, :] - points[pending][:, None, :]
+            surface = np.sqrt(np.sum(difference * difference, axis=2)) - self.radii
+            indices[pending] = surface.argmin(axis=1)
+            clearances[pending] = surface.min(axis=1)
+        return indices, clearances
+
+    def clearance(self, points):
+        """
+        Calculate the distance from each point to the nearest obstacle surface.
+
+        Parameters:
+        - points: Points with shape [n_points, 3].
+
+        Returns:
+        - clearances: Distances, negative inside an obstacle and inf without obstacles.
+        """
+        return self.nearest(points)[1]
+
+    def raycast(self, origins, directions, max_distance):
+        """
+        Calculate the distance along each ray to the nearest obstacle surface.
+
+        Parameters:
+        - origins: Origin of the rays, a single point or one per ray.
+        - directions: Unit directions with shape [n_rays, 3].
+        - max_distance: Distance returned for rays that hit nothing, a scalar or one per ray.
+
+        Returns:
+        - distances: Hit distances with shape [n_rays]. Rays starting inside an obstacle return 0.
+        """
+        origins = np.asarray(origins, dtype=float)
+        directions = np.asarray(directions, dtype=float).reshape(-1, 3)
+        reach = np.max(max_distance) + self.max_radius
+        if len(self) == 0:
+            return np.full(len(directions), max_distance, dtype=float)
+
+        # Rays sharing an origin, like the lasers of a range finder, share one cell lookup.
+        if origins.ndim == 1:
+            candidates = self.query_radius(origins, reach - self.max_radius)[0]
+            return raycast_spheres(origins, directions, self.centers[candidates], self.radii[candidates],
+                                   max_distance)
+
+        ray_indices, obstacle_indices = self.candidate_pairs(origins, reach)
+        offsets = self.centers[obstacle_indices] - origins[ray_indices]
+        b = np.sum(directions[ray_indices] * offsets, axis=1)
+        c = np.sum(offsets * offsets, axis=1) - self.radii[obstacle_indices] ** 2
+        discriminant = b ** 2 - c
+        hit = discriminant >= 0
+        t = b - np.sqrt(np.where(hit, discriminant, 0))
+        t = np.where(c < 0, 0, t)
+        t = np.where(hit & (t >= 0), t, np.inf)
+        distances = np.full(len(directions), max_distance, dtype=float)
+        np.minimum.at(distances, ray_indices, t)
+        return distances
@@ -1,31 +1,146 @@
 import numpy as np
-import tensorflow as tf
-from collections import deque
 import datetime
 import os
+import time
+from RunningNormalizer import running_normalizer
+
+# TensorFlow is imported by the first PPO_agent, so importing this module stays fast.
+tf = None
+
+
+def import_tensorflow():
+    """
+    Import TensorFlow on first use.
+
+    Returns:
+    - tf: TensorFlow module.
+    """
+    global tf
+    if tf is None:
+        import tensorflow
+        tf = tensorflow
+    return tf
+
+# Number of steps solved together by the blocked reverse scan.
+SCAN_BLOCK_SIZE = 64
+
+
+def discounted_scan(deltas, discount, breaks, carry=0.0, block_size=SCAN_BLOCK_SIZE):
+    """
+    Calculate out[t] = deltas[t] + discount * (1 - breaks[t]) * out[t + 1] backwards over time, for every
+    environment at once.
+
+    Instead of a Python loop over steps, each block of block_size steps is solved as one batched matrix
+    product, and only the value entering each block is carried from block to block.
+
+    Parameters:
+    - deltas: Values to accumulate with shape [T, n_envs].
+    - discount: Discount per step.
+    - breaks: Whether the recursion is cut after each step, with shape [T, n_envs].
+    - carry: Value following the last step, a scalar or one per environment.
+    - block_size: Number of steps per block.
+
+    Returns:
+    - out: Discounted sums with shape [T, n_envs].
+    """
+    deltas = np.asarray(deltas, dtype=np.float64)
+    breaks = np.asarray(breaks, dtype=bool)
+    n_steps, n_envs = deltas.shape
+    out = np.empty_like(deltas)
+    carry = np.broadcast_to(np.asarray(carry, dtype=np.float64), (n_envs,)).copy()
+
+    offsets = np.arange(block_size + 1)
+    lags = offsets[None, :] - offsets[:, None]
+    powers = np.where(lags >= 0, float(discount) ** np.maximum(lags, 0), 0.0)
+    for end in range(n_steps, 0, -block_size):
+        start = max(end - block_size, 0)
+        length = end - start
+        # Steps t and k are linked if no break happens in [t, k), i.e. they have the same count of earlier breaks
+        counts = np.zeros((n_envs, length + 1), dtype=np.int64)
+        np.cumsum(breaks[start:end].T, axis=1, out=counts[:, 1:])
+        linked = counts[:, :, None] == counts[:, None, :]
+        weights = powers[None, :length + 1, :length + 1] * linked
+        out[start:end] = (np.einsum("ntk,kn->tn", weights[:, :length, :length], deltas[start:end])
+                          + weights[:, :length, length].T * carry)
+        carry = out[start]
+    return out
+
+
+def generalized_advantage_estimation(rewards, values, dones, next_values, gamma, gae_lambda, truncated=None,
+                                      truncated_values=None):
+    """
+    Compute Generalized Advantage Estimation advantages for rollouts of several environments.
+
+    A done step ends its episode, so no value is bootstrapped after it. A truncated step, e.g. one hitting
+    the time limit, cuts the advantage recursion but still bootstraps, from the value of the final state of
+    its episode. The state stored after it belongs to the next episode once the environment is reset, so
+    that value is passed in truncated_values. The steps after the last one are treated as truncated,
+    bootstrapping from next_values.
+
+    Parameters:
+    - rewards: Rewards with shape [T, n_envs].
+    - values: Predicted values of the states with shape [T, n_envs].
+    - dones: Whether each episode is finished after each step, with shape [T, n_envs].
+    - next_values: Predicted values of the states following the last step, with shape [n_envs].
+    - gamma: Discount factor.
+    - gae_lambda: GAE smoothing factor.
+    - truncated: Whether each episode is cut by a time limit after each step, with shape [T, n_envs]
+      (None if no episode is truncated).
+    - truncated_values: Predicted values of the final states of the truncated episodes, with shape
+      [T, n_envs]. Only the entries of truncated steps are read.
+
+    Returns:
+    - advantages: Computed advantages with shape [T, n_envs].
+    - returns: Value targets, advantages plus values, with shape [T, n_envs].
+    """
+    rewards = np.asarray(rewards, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    dones = np.asarray(dones, dtype=bool)
+    if (truncated is None) != (truncated_values is None):
+        raise ValueError("truncated and truncated_values must be given together")
+
+    following_values = np.concatenate([values[1:], np.asarray(next_values, dtype=np.float64)[None]])
+    breaks = dones
+    if truncated is not None:
+        truncated = np.asarray(truncated, dtype=bool)
+        breaks = dones | truncated
+        following_values = np.where(truncated, np.asarray(truncated_values, dtype=np.float64), following_values)
+    deltas = rewards + gamma * following_values * ~dones - values
+    advantages = discounted_scan(deltas, gamma * gae_lambda, breaks)
+    return advantages.astype(np.float32), (advantages + values).astype(np.float32)
+
 
 class PPO_agent:
-    def __init__(self, num_actions, observation_space_size):
+    def __init__(self, num_actions, observation_space_size, normalize_observations=False, normalize_rewards=False):
         """
         Initialize the PPOAgent.
 
-        Initializes the agent with neural networks, optimizers, memory buffer, and hyperparameters.
+        Initializes the agent with neural networks, optimizers, and hyperparameters.
 
         Parameters:
         - num_actions: Number of possible actions in the environment.
         - observation_space_size: Size of the observation space.
+        - normalize_observations: Whether the networks see observations normalized with running statistics.
+        - normalize_rewards: Whether rewards are scaled by their running standard deviation.
         """
+        import_tensorflow()
         self.num_actions = num_actions
         self.observation_space_size = observation_space_size
         self.policy = self.build_policy_network()
         self.old_policy = self.build_policy_network()
         self.policy_optimizer = tf.keras.optimizers.Adam(learning_rate=1e-3)
+        self.inference = self.build_inference()
         self.value_network = self.build_value_network()
         self.value_optimizer = tf.keras.optimizers.Adam(learning_rate=1e-3)
-        self.memory = deque(maxlen=10000)
         self.gamma = 0.95
+        self.gae_lambda = 0.95
         self.epsilon = 0.2
-        self.batch_size = 16
+        self.batch_size = 256
+        self.n_epochs = 4
+        self.rng = np.random.default_rng()
+        self.observation_normalizer = running_normalizer((observation_space_size,)) if normalize_observations else None
+        self.reward_normalizer = running_normalizer(center=False) if normalize_rewards else None
+        self.policy_train_step, self.value_train_step = self.build_train_steps()
         self.log_filename = ""
         self.log_file = None
 
@@ -86,6 +201,123 @@ class PPO_agent:
         ])
         return model
 
+    def build_inference(self):
+        """
+        Build the compiled inference function of the policy network.
+
+        The forward pass and the mapping of its outputs to the thruster command are fused in one XLA
+        compiled function. It must be rebuilt when the policy network is replaced.
+
+        Returns:
+        - inference: Function mapping a batch of states to thruster commands and policy outputs.
+        """
+        policy = self.policy
+
+        @tf.function(input_signature=[tf.TensorSpec([None, self.observation_space_size], tf.float32)],
+                     jit_compile=True)
+        def inference(states):
+            action_probs = policy(states)
+            actions = tf.concat([tf.repeat(action_probs[:, 4:5], 4, axis=1), action_probs[:, :4]], axis=1)
+            return 50 * actions, action_probs
+
+        return inference
+
+    def act(self, states):
+        """
+        Select actions with a single compiled forward pass of the policy network.
+
+        Parameters:
+        - states: A state, or a batch of states with shape [n_envs, observation_space_size].
+
+        Returns:
+        - actions: Thruster commands, with shape [8] or [n_envs, 8].
+        - action_probs: Policy outputs used by the policy update, with shape [num_actions] or
+          [n_envs, num_actions].
+        """
+        states = self.normalize_observations(states)
+        single = states.ndim == 1
+        actions, action_probs = self.inference(states[None] if single else states)
+        actions, action_probs = actions.numpy(), action_probs.numpy()
+        if single:
+            return actions[0], action_probs[0]
+        return actions, action_probs
+
+    def normalize_observations(self, states):
+        """
+        Normalize states with the running observation statistics, which stay unchanged.
+
+        Parameters:
+        - states: Raw states with shape [..., observation_space_size].
+
+        Returns:
+        - states: Normalized float32 states, or the raw ones when normalization is disabled.
+        """
+        if self.observation_normalizer is None:
+            return np.asarray(states, dtype=np.float32)
+        return self.observation_normalizer.normalize(states)
+
+    def update_normalizers(self, states, rewards=None):
+        """
+        Merge a rollout into the running statistics in one batched update.
+
+        Called after the networks are updated on the rollout, so the policy outputs recorded while acting
+        and the ones computed in the update use the same statistics.
+
+        Parameters:
+        - states: Raw states of the rollout with shape [n_samples, observation_space_size].
+        - rewards: Optional raw rewards of the rollout with shape [n_samples].
+        """
+        if self.observation_normalizer is not None:
+            self.observation_normalizer.update(states)
+        if self.reward_normalizer is not None and rewards is not None:
+            self.reward_normalizer.update(rewards)
+
+    def scale_rewards(self, rewards):
+        """
+        Scale rewards by their running standard deviation.
+
+        Parameters:
+        - rewards: Raw rewards.
+
+        Returns:
+        - rewards: Scaled float32 rewards, or the raw ones when reward normalization is disabled.
+        """
+        if self.reward_normalizer is None:
+            return np.asarray(rewards, dtype=np.float32)
+        return self.reward_normalizer.normalize(rewards)
+
+    def values(self, states):
+        """
+        Estimate the values of raw states.
+
+        Parameters:
+        - states: Raw states with shape [n_states, observation_space_size].
+
+        Returns:
+        - values: Values with shape [n_states].
+        """
+        return self.value_network(self.normalize_observations(states)).numpy().reshape(-1)
+
+    def get_normalizer_state(self):
+        """
+        Get the observation statistics processes that only act need, like actors and evaluation.
+
+        Returns:
+        - state: Count, mean and variance arrays, or an empty list when normalization is disabled.
+        """
+        return [] if self.observation_normalizer is None else self.observation_normalizer.get_state()
+
+    def get_policy_weights(self):
+        """
+        Get the weights of the policy network, building it first if it has not been called yet.
+
+        Returns:
+        - weights: Kernels and biases of the dense layers.
+        """
+        if not self.policy.built:
+            self.policy.build((None, self.observation_space_size))
+        return self.policy.get_weights()
+
     def select_action(self, state):
         """
         Select an action based on the current state.
@@ -96,24 +328,20 @@ class PPO_agent:
         Returns:
         - action: Selected action.
         """
-        state = np.array([state])
-        action = self.policy(state)[0].numpy()
-        action = np.concatenate([np.repeat(action[4], 4, axis=0), action[:4]])
-        action = 50 * action
-        return action
+        return self.act(state)[0]
 
-    def remember(self, state, action, reward, next_state, done):
+    def select_actions(self, states):
         """
-        Store an experience tuple in the memory buffer.
+        Select actions for a batch of states with a single policy call.
 
         Parameters:
-        - state: Current state.
-        - action: Taken action.
-        - reward: Received reward.
-        - next_state: Next state.
-        - done: Whether the episode is done or not.
+        - states: Batch of states with shape [n_envs, observation_space_size].
+
+        Returns:
+        - actions: Selected actions with shape [n_envs, 8].
+        - action_probs: Policy outputs with shape [n_envs, num_actions].
         """
-        self.memory.append((state, action, reward, next_state, done))
+        return self.act(states)
 
     def discounted_rewards(self, rewards):
         """
@@ -125,16 +353,13 @@ class PPO_agent:
         Returns:
         - discounted: Discounted rewards.
         """
-        discounted = np.zeros_like(rewards, dtype=np.float32)
-        running_add = 0
-        for t in reversed(range(len(rewards))):
-            running_add = running_add * self.gamma + rewards[t]
-            discounted[t] = running_add
-        return discounted
+        rewards = np.asarray(rewards, dtype=np.float32)
+        discounted = discounted_scan(rewards.reshape(len(rewards), -1), self.gamma, np.zeros((len(rewards), 1)))
+        return discounted.reshape(rewards.shape).astype(np.float32)
 
     def compute_advantages(self, rewards, values, dones):
         """
-        Compute advantages based on rewards and predicted values.
+        Compute advantages based on rewards and predicted values, without discounting across done steps.
 
         Parameters:
         - rewards: Sequence of rewards.
@@ -144,68 +369,246 @@ class PPO_agent:
         Returns:
         - advantages: Computed advantages.
         """
-        discounted_rewards = self.discounted_rewards(rewards)
-        advantages = discounted_rewards - values
-        return advantages
+        rewards = np.asarray(rewards, dtype=np.float32)
+        discounted_rewards = discounted_scan(rewards.reshape(len(rewards), -1), self.gamma,
+                                             np.asarray(dones, dtype=bool).reshape(len(rewards), -1))
+        advantages = discounted_rewards.reshape(rewards.shape) - values
+        return advantages.astype(np.float32)
 
-    def update_policy(self, states, actions, advantages, old_probs, episode_num):
+    def compute_gae(self, rewards, values, dones, next_values, truncated=None, truncated_values=None):
         """
-        Update the policy neural network based on PPO loss.
+        Compute Generalized Advantage Estimation advantages for rollouts of several environments, see
+        generalized_advantage_estimation.
 
         Parameters:
-        - states: States from the memory buffer.
-        - actions: Actions from the memory buffer.
+        - rewards: Rewards with shape [T, n_envs].
+        - values: Predicted values of the states with shape [T, n_envs].
+        - dones: Whether each episode is finished after each step, with shape [T, n_envs].
+        - next_values: Predicted values of the states following the last step, with shape [n_envs].
+        - truncated: Whether each episode is cut by a time limit after each step, with shape [T, n_envs]
+          (None if no episode is truncated).
+        - truncated_values: Predicted values of the final states of the truncated episodes, with shape
+          [T, n_envs].
+
+        Returns:
+        - advantages: Computed advantages with shape [T, n_envs].
+        - returns: Value targets, advantages plus values, with shape [T, n_envs].
+        """
+        return generalized_advantage_estimation(rewards, values, dones, next_values, self.gamma, self.gae_lambda,
+                                                truncated, truncated_values)
+
+    def build_train_steps(self):
+        """
+        Build the compiled train steps of the policy and value networks.
+
+        They must be rebuilt when the networks are replaced.
+
+        Returns:
+        - policy_train_step: Function taking states, old probabilities and advantages, applying one PPO
+          gradient step and returning the policy loss and the fraction of clipped ratios.
+        - value_train_step: Function taking states and discounted rewards, applying one mean squared error
+          gradient step and returning the value loss.
+        """
+        policy, policy_optimizer = self.policy, self.policy_optimizer
+        value_network, value_optimizer = self.value_network, self.value_optimizer
+        epsilon = self.epsilon
+
+        @tf.function
+        def policy_train_step(states, old_probs, advantages):
+            with tf.GradientTape() as tape:
+                new_probs = policy(states)
+                ratios = new_probs / (old_probs + 1e-8)
+                clipped_ratios = tf.clip_by_value(ratios, 1 - epsilon, 1 + epsilon)
+
+                # Ensure that advantages have shape [batch_size, 1]
+                advantages = tf.expand_dims(advantages, axis=-1)
+
+                surrogate1 = ratios * advantages
+                surrogate2 = clipped_ratios * advantages
+                policy_loss = -tf.reduce_mean(tf.minimum(surrogate1, surrogate2))
+
+            gradients = tape.gradient(policy_loss, policy.trainable_variables)
+            policy_optimizer.apply_gradients(zip(gradients, policy.trainable_variables))
+
+            # The policy outputs are not probabilities of an action distribution, so no KL divergence is
+            # defined between the old and new policy. The fraction of clipped ratios shows how far it moved.
+            clip_fraction = tf.reduce_mean(tf.cast(tf.abs(ratios - 1) > epsilon, tf.float32))
+            return policy_loss, clip_fraction
+
+        @tf.function
+        def value_train_step(states, discounted_rewards):
+            with tf.GradientTape() as tape:
+                values = tf.squeeze(value_network(states), axis=-1)
+                value_loss = tf.reduce_mean(tf.square(discounted_rewards - values))
+
+            gradients = tape.gradient(value_loss, value_network.trainable_variables)
+            value_optimizer.apply_gradients(zip(gradients, value_network.trainable_variables))
+            return value_loss
+
+        return policy_train_step, value_train_step
+
+    def update(self, states, actions, advantages, old_probs, discounted_rewards, episode_num, achieved_targets):
+        """
+        Update the policy and value networks over several epochs of shuffled minibatches.
+
+        Parameters:
+        - states: Raw states of the rollout.
+        - actions: Actions of the rollout.
         - advantages: Computed advantages.
-        - old_probs: Old probabilities from the memory buffer.
+        - old_probs: Policy outputs recorded during the rollout.
+        - discounted_rewards: Discounted rewards.
         - episode_num: Episode number.
+        - achieved_targets: Number of targets achieved in the episode.
+
+        Returns:
+        - stats: Dictionary with the mean policy loss, value loss and fraction of clipped ratios of the last
+          epoch, and the samples per second of the update.
         """
-        with tf.GradientTape() as tape:
-            new_probs = self.policy(states)
-            action_masks = tf.one_hot(actions, self.num_actions)
+        if len(states) == 0:
+            raise ValueError(f"Cannot update on an empty rollout (episode {episode_num})")
+        states = tf.convert_to_tensor(self.normalize_observations(states))
+        old_probs = tf.convert_to_tensor(old_probs, dtype=tf.float32)
+        advantages = tf.convert_to_tensor(advantages, dtype=tf.float32)
+        discounted_rewards = tf.convert_to_tensor(discounted_rewards, dtype=tf.float32)
+        n_samples = int(states.shape[0])
+
+        start_time = time.perf_counter()
+        processed_samples = 0
+        for _ in range(self.n_epochs):
+            policy_losses, value_losses, clip_fractions = [], [], []
+            permutation = self.rng.permutation(n_samples)
+            for start in range(0, n_samples, self.batch_size):
+                indices = tf.constant(permutation[start:start + self.batch_size])
+                policy_loss, clip_fraction = self.policy_train_step(
+                    tf.gather(states, indices), tf.gather(old_probs, indices), tf.gather(advantages, indices))
+                value_loss = self.value_train_step(tf.gather(states, indices), tf.gather(discounted_rewards, indices))
+                policy_losses.append(policy_loss)
+                value_losses.append(value_loss)
+                clip_fractions.append(clip_fraction)
+                processed_samples += int(indices.shape[0])
+        elapsed = time.perf_counter() - start_time
+
+        stats = {
+            "policy_loss": float(np.mean(policy_losses)),
+            "value_loss": float(np.mean(value_losses)),
+            "clip_fraction": float(np.mean(clip_fractions)),
+            "samples_per_sec": processed_samples / elapsed,
+        }
 
-            ratios = new_probs / (old_probs + 1e-8)
-            clipped_ratios = tf.clip_by_value(ratios, 1 - self.epsilon, 1 + self.epsilon)
+        if self.log_file is None:
+            self.create_log_file()
+        self.log_file.write(f"Episode {episode_num}, Policy Loss: {stats['policy_loss']}\n")
+        self.log_file.write(f"Episode {episode_num}, Value Loss: {stats['value_loss']}\n")
+        self.log_file.write(f"Episode {episode_num}, Achieved Targets: {achieved_targets}\n")
+        self.log_file.flush()
+        return stats
 
-            # Ensure that advantages have shape [batch_size, 1]
-            advantages = tf.expand_dims(advantages, axis=-1)
+    def update_policy(self, states, actions, advantages, old_probs, episode_num):
+        """
+        Update the policy neural network based on PPO loss, with one step over the whole rollout.
 
-            surrogate1 = ratios * advantages
-            surrogate2 = clipped_ratios * advantages
-            policy_loss = -tf.reduce_mean(tf.minimum(surrogate1, surrogate2))
+        Parameters:
+        - states: States from the rollout buffer.
+        - actions: Actions from the rollout buffer.
+        - advantages: Computed advantages.
+        - old_probs: Old probabilities from the rollout buffer.
+        - episode_num: Episode number.
 
-        gradients = tape.gradient(policy_loss, self.policy.trainable_variables)
-        self.policy_optimizer.apply_gradients(zip(gradients, self.policy.trainable_variables))
+        Returns:
+        - policy_loss: Policy loss of the update.
+        """
+        policy_loss, _ = self.policy_train_step(tf.convert_to_tensor(self.normalize_observations(states)),
+                                                tf.convert_to_tensor(old_probs, dtype=tf.float32),
+                                                tf.convert_to_tensor(advantages, dtype=tf.float32))
 
         if self.log_file is None:
             self.create_log_file()
         self.log_file.write(f"Episode {episode_num}, Policy Loss: {policy_loss.numpy()}\n")
         self.log_file.flush()
+        return float(policy_loss)
 
     def update_value_network(self, states, discounted_rewards, episode_num, achieved_targets):
         """
-        Update the value network based on mean squared error loss.
+        Update the value network based on mean squared error loss, with one step over the whole rollout.
 
         Parameters:
-        - states: States from the memory buffer.
+        - states: States from the rollout buffer.
         - discounted_rewards: Discounted rewards.
         - episode_num: Episode number.
-        """
-        with tf.GradientTape() as tape:
-            values = self.value_network(states)
-            value_loss = tf.reduce_mean(tf.square(discounted_rewards - values))
+        - achieved_targets: Number of targets achieved in the episode.
 
-        gradients = tape.gradient(value_loss, self.value_network.trainable_variables)
-        self.value_optimizer.apply_gradients(zip(gradients, self.value_network.trainable_variables))
+        Returns:
+        - value_loss: Value loss of the update.
+        """
+        value_loss = self.value_train_step(tf.convert_to_tensor(self.normalize_observations(states)),
+                                           tf.convert_to_tensor(discounted_rewards, dtype=tf.float32))
 
         if self.log_file is None:
             self.create_log_file()
         self.log_file.write(f"Episode {episode_num}, Value Loss: {value_loss.numpy()}\n")
         self.log_file.write(f"Episode {episode_num}, Achieved Targets: {achieved_targets}\n")
         self.log_file.flush()
+        return float(value_loss)
+
+    def get_state(self):
+        """
+        Snapshot the training state of the agent: network weights, Adam optimizer state, normalizer statistics
+        and random generator.
+
+        Returns:
+        - state: Dictionary of lists of weight arrays, plus the random generator state.
+        """
+        for network, optimizer in ((self.policy, self.policy_optimizer), (self.value_network, self.value_optimizer)):
+            if not network.built:
+                network.build((None, self.observation_space_size))
+            # Create the Adam moments before the first update, so they can be saved and restored
+            optimizer.build(network.trainable_variables)
+        return {
+            "policy": self.policy.get_weights(),
+            "value_network": self.value_network.get_weights(),
+            "policy_optimizer": [variable.numpy() for variable in self.policy_optimizer.variables],
+            "value_optimizer": [variable.numpy() for variable in self.value_optimizer.variables],
+            "observation_normalizer": self.get_normalizer_state(),
+            "reward_normalizer": [] if self.reward_normalizer is None else self.reward_normalizer.get_state(),
+            "rng": self.rng.bit_generator.state,
+        }
+
+    def set_state(self, state):
+        """
+        Restore a training state returned by get_state.
+
+        Parameters:
+        - state: Training state of the agent.
+        """
+        self.check_observation_size(len(state["policy"][0]))
+        self.get_state()
+        self.policy.set_weights(state["policy"])
+        self.value_network.set_weights(state["value_network"])
+        for optimizer, values in ((self.policy_optimizer, state["policy_optimizer"]),
+                                  (self.value_optimizer, state["value_optimizer"])):
+            for variable, value in zip(optimizer.variables, values):
+                variable.assign(value)
+        # States saved without normalization keep the initial statistics
+        for normalizer, name in ((self.observation_normalizer, "observation_normalizer"),
+                                 (self.reward_normalizer, "reward_normalizer")):
+            if normalizer is not None and state.get(name):
+                normalizer.set_state(state[name])
+        self.rng.bit_generator.state = state["rng"]
+
+    def check_observation_size(self, size):
+        """
+        Check that saved networks take observations of the agent's observation space size.
+
+        Parameters:
+        - size: Observation size of the saved networks.
+        """
+        if size != self.observation_space_size:
+            raise ValueError(f"Saved networks expect observations of size {size}, the agent's observation space "
+                             f"has size {self.observation_space_size} (see OBSERVATION_SCHEMA)")
 
     def save_model(self, episode_num):
         """
-        Save the policy and value network models.
+        Save the policy and value network models, and the normalizer statistics.
 
         Parameters:
         - episode_num: Episode number.
@@ -219,10 +622,14 @@ class PPO_agent:
 
         self.policy.save(policy_model_filename)
         self.value_network.save(value_model_filename)
+        state = self.get_state()
+        np.savez(f"{model_dir}/normalizers_episode_{episode_num}.npz",
+                 **{f"{name}/{i}": value for name in ("observation_normalizer", "reward_normalizer")
+                    for i, value in enumerate(state[name])})
 
     def load_model(self, episode_num):
         """
-        Load saved policy and value network models.
+        Load saved policy and value network models, and the normalizer statistics if they were saved.
 
         Parameters:
         - episode_num: Episode number.
@@ -235,8 +642,19 @@ class PPO_agent:
         value_model_filename = f"{model_dir}/value_model_episode_{episode_num}.h5"
 
         if os.path.exists(policy_model_filename) and os.path.exists(value_model_filename):
-            self.policy = tf.keras.models.load_model(policy_model_filename)
+            policy = tf.keras.models.load_model(policy_model_filename)
+            self.check_observation_size(policy.input_shape[-1])
+            self.policy = policy
             self.value_network = tf.keras.models.load_model(value_model_filename)
+            self.inference = self.build_inference()
+            self.policy_train_step, self.value_train_step = self.build_train_steps()
+            normalizers_filename = f"{model_dir}/normalizers_episode_{episode_num}.npz"
+            if os.path.exists(normalizers_filename):
+                with np.load(normalizers_filename) as arrays:
+                    for normalizer, name in ((self.observation_normalizer, "observation_normalizer"),
+                                             (self.reward_normalizer, "reward_normalizer")):
+                        if normalizer is not None and f"{name}/0" in arrays.files:
+                            normalizer.set_state([arrays[f"{name}/{i}"] for i in range(3)])
             print(f"Models loaded from episode {episode_num}")
         else:
             print("No saved models found.")
\ No newline at end of file
@@ -0,0 +1,159 @@
+import collections
+import contextlib
+import cProfile
+import time
+import numpy as np
+
+# Phases of the training loop, in the order they happen.
+PHASES = ["tick", "update_state", "reward", "inference", "env_step", "advantages", "update", "metrics"]
+PHASE_STATS = ["mean_us", "p50_us", "p99_us"]
+
+# Fields of the per-episode profile records.
+PROFILE_FIELDS = ([("episode", "<i8"), ("ticks_per_sec", "<f8"), ("decisions_per_sec", "<f8")]
+                  + [(f"{phase}_{stat}", "<f8") for phase in PHASES for stat in PHASE_STATS])
+
+# Span returned when profiling is disabled.
+NULL_SPAN = contextlib.nullcontext()
+
+
+class phase_profiler:
+    def __init__(self, enabled=False, profile_episodes=None, profile_filename="profile"):
+        """
+        Initialize the phase profiler.
+
+        Times named phases of the training loop and aggregates them per episode. When disabled, wrap
+        returns the function itself and span returns a shared no-op context, so profiling costs nothing.
+
+        Parameters:
+        - enabled: Whether to time the phases.
+        - profile_episodes: Optional (first, last) episodes captured with cProfile, in this process only.
+        - profile_filename: Prefix of the cProfile output file.
+        """
+        self.enabled = enabled
+        self.samples = collections.defaultdict(list)
+        self.profile_episodes = profile_episodes
+        self.profile_filename = profile_filename
+        self.cprofile = None
+
+    def wrap(self, name, function):
+        """
+        Time every call of a function as a phase.
+
+        Parameters:
+        - name: Name of the phase.
+        - function: Function to time.
+
+        Returns:
+        - function: Timed function, or the function itself when disabled.
+        """
+        if not self.enabled:
+            return function
+        samples = self.samples[name]
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                samples.append(time.perf_counter() - start)
+
+        return timed
+
+    def span(self, name):
+        """
+        Time a block of code as a phase.
+
+        Parameters:
+        - name: Name of the phase.
+
+        Returns:
+        - span: Context manager timing its block, or a no-op context when disabled.
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return self.timed_span(self.samples[name])
+
+    @staticmethod
+    @contextlib.contextmanager
+    def timed_span(samples):
+        """Context manager appending the duration of its block to samples."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            samples.append(time.perf_counter() - start)
+
+    def drain(self):
+        """
+        Take the samples recorded since the last drain.
+
+        Returns:
+        - samples: Dictionary of sample durations in seconds per phase.
+        """
+        samples = {name: np.array(durations) for name, durations in self.samples.items() if durations}
+        # Clear in place, wrapped functions keep references to the lists
+        for durations in self.samples.values():
+            durations.clear()
+        return samples
+
+    def merge(self, samples):
+        """
+        Add samples drained from another profiler, e.g. one in an environment worker.
+
+        Parameters:
+        - samples: Dictionary of sample durations in seconds per phase.
+        """
+        for name, durations in samples.items():
+            self.samples[name].extend(durations)
+
+    def summary(self, episode_num, wall_seconds, n_decisions):
+        """
+        Aggregate and drain the samples of an episode.
+
+        Parameters:
+        - episode_num: Episode number.
+        - wall_seconds: Wall time of the episode's rollout.
+        - n_decisions: Number of actions taken by all environments in the rollout.
+
+        Returns:
+        - record: Profile record with the mean, p50 and p99 latency in microseconds of every phase, ticks per
+          second and decisions per second. Phases without samples are NaN.
+        """
+        samples = self.drain()
+        record = {"episode": episode_num, "ticks_per_sec": len(samples.get("tick", ())) / wall_seconds,
+                  "decisions_per_sec": n_decisions / wall_seconds}
+        for phase in PHASES:
+            durations = samples.get(phase, np.full(1, np.nan)) * 1e6
+            record[f"{phase}_mean_us"] = float(np.mean(durations))
+            record[f"{phase}_p50_us"] = float(np.percentile(durations, 50))
+            record[f"{phase}_p99_us"] = float(np.percentile(durations, 99))
+        return record
+
+    def begin_episode(self, episode_num):
+        """
+        Start the cProfile capture if the episode opens the capture window.
+
+        Parameters:
+        - episode_num: Episode number.
+        """
+        if self.profile_episodes is not None and episode_num == self.profile_episodes[0]:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def end_episode(self, episode_num):
+        """
+        Stop the cProfile capture and write it if the episode closes the capture window.
+
+        Parameters:
+        - episode_num: Episode number.
+
+        Returns:
+        - filename: Name of the written profile, or None.
+        """
+        if self.cprofile is None or episode_num != self.profile_episodes[1]:
+            return None
+        self.cprofile.disable()
+        filename = f"{self.profile_filename}_episodes_{self.profile_episodes[0]}-{self.profile_episodes[1]}.prof"
+        self.cprofile.dump_stats(filename)
+        self.cprofile = None
+        return filename
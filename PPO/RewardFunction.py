@@ -1,136 +1,239 @@
 import math
 import numpy as np
 
-# Global variable to keep track of static count
-static_counter = 0
 
-class reward_function:
-    def __init__(self, prev_location, location, target, rotation, lasers):
+def euclidean_distance(a, b):
+    """Calculate the euclidean distance between points along the last axis."""
+    difference = a - b
+    return np.sqrt(np.sum(difference * difference, axis=-1))
+
+
+class reward_engine:
+    # Weight of each reward component. The total reward is the sum of the weighted components.
+    DEFAULT_WEIGHTS = {
+        "outside_box": -100,
+        "collision": -30,
+        "near_miss": -5,
+        "incline": -1,
+        "static": -1,
+        "distance_to_target": 1,
+        "reach_target": 100,
+    }
+
+    def __init__(self, n_agents=1, box_center=(200, 200, -250), box_dimensions=(120, 120, 120), weights=None,
+                 static_steps=50):
         """
-        Initialize the reward function.
+        Initialize the batched reward engine.
+
+        Each agent keeps its own static counter. calculate_reward scores a single agent with scalar math, and
+        is what the environments call every tick, as each environment steps one agent. calculate_rewards
+        scores many agents, and optionally many timesteps, in one call, for re-scoring recorded trajectories
+        offline, e.g. with other weights. Both follow the same rules, which tests/test_reward.py checks.
 
         Parameters:
-        - prev_location: Previous location of the agent.
-        - location: Current location of the agent.
-        - target: Target location.
-        - rotation: Rotation of the agent.
-        - lasers: Laser readings.
+        - n_agents: Number of agents scored together.
+        - box_center: Center of the box the agents must stay in.
+        - box_dimensions: Dimensions of the box.
+        - weights: Weights overriding DEFAULT_WEIGHTS.
+        - static_steps: Number of static steps after which the agent is considered static.
         """
-        self.prev_location = prev_location
-        self.location = location
-        self.target = target
-        self.rotation = rotation
-        self.lasers = lasers
+        self.n_agents = n_agents
+        self.box_min = np.asarray(box_center, dtype=float) - np.asarray(box_dimensions, dtype=float) / 2
+        self.box_max = np.asarray(box_center, dtype=float) + np.asarray(box_dimensions, dtype=float) / 2
+        self.weights = dict(self.DEFAULT_WEIGHTS, **(weights or {}))
+        self.static_steps = static_steps
+        self.static_counter = np.zeros(n_agents, dtype=np.int64)
+        self.box_bounds = list(zip(self.box_min.tolist(), self.box_max.tolist()))
 
-    def outside_box(self):
+    def reset(self, agents=None):
         """
-        Check if the agent is outside the predefined box.
+        Reset the static counters.
 
-        Returns:
-        - 1 if outside the box, 0 otherwise.
+        Parameters:
+        - agents: Indices or mask of the agents to reset, all agents if None.
         """
-        box_center = (200, 200, -250)
-        box_dimensions = (120, 120, 120)
-        box_x_min = box_center[0] - box_dimensions[0] / 2
-        box_x_max = box_center[0] + box_dimensions[0] / 2
-        box_y_min = box_center[1] - box_dimensions[1] / 2
-        box_y_max = box_center[1] + box_dimensions[1] / 2
-        box_z_min = box_center[2] - box_dimensions[2] / 2
-        box_z_max = box_center[2] + box_dimensions[2] / 2
+        if agents is None:
+            self.static_counter[:] = 0
+        else:
+            self.static_counter[agents] = 0
 
-        is_outside_box = (
-            self.location[0] < box_x_min or self.location[0] > box_x_max or
-            self.location[1] < box_y_min or self.location[1] > box_y_max or
-            self.location[2] < box_z_min or self.location[2] > box_z_max
-        )
+    def outside_box(self, location):
+        """
+        Check if the agents are outside the box.
 
-        return 1 if is_outside_box else 0
+        Returns:
+        - 1 where outside the box, 0 otherwise.
+        """
+        return np.any((location < self.box_min) | (location > self.box_max), axis=-1).astype(float)
 
-    def distance_to_target(self):
+    @staticmethod
+    def distance_to_target(prev_location, location, target):
         """
-        Check if the agent has moved closer to the target.
+        Check if the agents have moved closer to the target.
 
         Returns:
-        - 1 if moved closer, 0 otherwise.
+        - 1 where moved closer, 0 otherwise.
         """
-        prev_distance = math.dist(self.prev_location, self.target)
-        distance = math.dist(self.location, self.target)
-        return 1 if prev_distance - distance > 0.02 else 0
+        prev_distance = euclidean_distance(prev_location, target)
+        distance = euclidean_distance(location, target)
+        return (prev_distance - distance > 0.02).astype(float)
 
-    def collision(self):
+    @staticmethod
+    def collision(lasers):
         """
         Check for collisions using laser readings.
 
         Returns:
-        - 1 if a collision is detected, 0 otherwise.
+        - 1 where a collision is detected, 0 otherwise.
         """
-        return 1 if any(self.lasers <= 0) else 0
-    
-    def incline(self, roll, pitch):
+        return np.any(lasers <= 0, axis=-1).astype(float)
+
+    @staticmethod
+    def near_miss(lasers):
         """
-        Calculate penalty based on roll and pitch angles.
+        Check for near misses using laser readings.
 
         Returns:
-        - Penalty value.
+        - 1 where a near miss is detected, 0 otherwise.
         """
-        penalty = 0
-        if 15 < roll < 180:
-            penalty += roll - 15
-        elif 180 < roll < 345:
-            penalty += 345 - roll
-        if 0 < pitch < 170:
-            penalty += 170 - pitch
-        elif 190 < pitch < 360:
-            penalty += pitch - 190
-        return penalty * 0.001
-    
-    def static(self):
+        return np.any(lasers < 1, axis=-1).astype(float)
+
+    @staticmethod
+    def incline(rotation):
         """
-        Check if the agent is static for a certain duration.
+        Calculate penalty based on roll and pitch angles.
 
         Returns:
-        - 1 if static for a specified duration, 0 otherwise.
+        - Penalty values.
         """
-        global static_counter
-        displacement = math.dist(self.prev_location, self.location)
-        if displacement < 0.01:
-            static_counter += 1
-        else:
-            static_counter = 0
-        return 1 if static_counter >= 50 else 0
-    
-    def near_miss(self):
+        roll, pitch = rotation[..., 0], rotation[..., 1]
+        penalty = ((15 < roll) & (roll < 180)) * (roll - 15) + ((180 < roll) & (roll < 345)) * (345 - roll)
+        penalty += ((0 < pitch) & (pitch < 170)) * (170 - pitch) + ((190 < pitch) & (pitch < 360)) * (pitch - 190)
+        return penalty * 0.001
+
+    def static(self, prev_location, location):
         """
-        Check for a near miss using laser readings.
+        Check if the agents are static for a certain duration, updating the static counters.
+
+        Parameters:
+        - prev_location: Previous locations with shape [T, n_agents, 3].
+        - location: Locations with shape [T, n_agents, 3].
 
         Returns:
-        - 1 if a near miss is detected, 0 otherwise.
+        - 1 where static for the specified duration, 0 otherwise, with shape [T, n_agents].
         """
-        return 1 if np.any(self.lasers < 1) else 0
-    
-    def reach_target(self):
+        is_static = euclidean_distance(prev_location, location) < 0.01
+
+        # Length of the run of static steps ending at each timestep, continuing the stored counters.
+        steps = np.arange(len(is_static))[:, None]
+        last_moved = np.maximum.accumulate(np.where(is_static, -1, steps), axis=0)
+        counter = np.where(last_moved < 0, steps + 1 + self.static_counter, steps - last_moved)
+        self.static_counter = counter[-1]
+        return (counter >= self.static_steps).astype(float)
+
+    @staticmethod
+    def reach_target(location, target):
         """
-        Check if the agent has reached the target.
+        Check if the agents have reached the target.
 
         Returns:
-        - 1 if the target is reached, 0 otherwise.
+        - 1 where the target is reached, 0 otherwise.
         """
-        distance = math.dist(self.location, self.target)
-        return 1 if distance < 2 else 0
+        return (euclidean_distance(location, target) < 2).astype(float)
 
-    def calculate_reward(self):
+    def calculate_rewards(self, prev_location, location, target, rotation, lasers):
         """
-        Calculate the total reward based on different criteria.
+        Calculate the rewards of all agents, e.g. to re-score recorded trajectories offline.
+
+        Inputs have shape [n_agents, k] for a single timestep or [T, n_agents, k] for T consecutive
+        timesteps.
+
+        Parameters:
+        - prev_location: Previous locations of the agents.
+        - location: Current locations of the agents.
+        - target: Target locations.
+        - rotation: Rotations of the agents.
+        - lasers: Laser readings.
 
         Returns:
-        - Total reward value.
-        """
-        self.reward = 0
-        self.reward -= 100*self.outside_box()
-        self.reward -= 30*self.collision()
-        self.reward -= 5*self.near_miss()
-        self.reward -= 1*self.incline(self.rotation[0], self.rotation[1])
-        self.reward -= 1*self.static()
-        self.reward += 1*self.distance_to_target()
-        self.reward += 100*self.reach_target()
-        return self.reward
+        - total: Total rewards with shape [n_agents] or [T, n_agents].
+        - components: Dictionary of weighted reward components, each shaped like total.
+        """
+        prev_location, location, target, rotation, lasers = (
+            np.asarray(x, dtype=float) for x in (prev_location, location, target, rotation, lasers))
+        sequence = location.ndim == 3
+        if not sequence:
+            prev_location, location, target, rotation, lasers = (
+                x[None] for x in (prev_location, location, target, rotation, lasers))
+
+        components = {
+            "outside_box": self.outside_box(location),
+            "collision": self.collision(lasers),
+            "near_miss": self.near_miss(lasers),
+            "incline": self.incline(rotation),
+            "static": self.static(prev_location, location),
+            "distance_to_target": self.distance_to_target(prev_location, location, target),
+            "reach_target": self.reach_target(location, target),
+        }
+        for name in components:
+            components[name] *= self.weights[name]
+            if not sequence:
+                components[name] = components[name][0]
+        total = sum(components.values())
+        return total, components
+
+    def calculate_reward(self, prev_location, location, target, rotation, lasers, agent=0, new_pose=True):
+        """
+        Calculate the reward of a single agent at a single timestep.
+
+        Gives the same result as calculate_rewards with a batch of 1, with scalar math instead of building
+        arrays for every component.
+
+        Parameters:
+        - prev_location: Previous location of the agent.
+        - location: Current location of the agent.
+        - target: Target location.
+        - rotation: Rotation of the agent.
+        - lasers: Laser readings.
+        - agent: Index of the agent whose static counter is updated.
+        - new_pose: Whether location is a new reading since prev_location. Without one, the motion is unknown,
+          so the static counter is left unchanged and no progress towards the target is scored.
+
+        Returns:
+        - total: Total reward.
+        - components: Dictionary of weighted reward components.
+        """
+        prev_location, location, target, rotation, lasers = (
+            x.tolist() if isinstance(x, np.ndarray) else list(x)
+            for x in (prev_location, location, target, rotation, lasers))
+        roll, pitch = rotation[0], rotation[1]
+        min_laser = min(lasers)
+
+        incline = 0.0
+        if 15 < roll < 180:
+            incline += roll - 15
+        elif 180 < roll < 345:
+            incline += 345 - roll
+        if 0 < pitch < 170:
+            incline += 170 - pitch
+        elif 190 < pitch < 360:
+            incline += pitch - 190
+
+        if new_pose:
+            if math.dist(prev_location, location) < 0.01:
+                self.static_counter[agent] += 1
+            else:
+                self.static_counter[agent] = 0
+
+        distance = math.dist(location, target)
+        values = {
+            "outside_box": any(x < low or x > high for x, (low, high) in zip(location, self.box_bounds)),
+            "collision": min_laser <= 0,
+            "near_miss": min_laser < 1,
+            "incline": incline * 0.001,
+            "static": self.static_counter[agent] >= self.static_steps,
+            "distance_to_target": new_pose and math.dist(prev_location, target) - distance > 0.02,
+            "reach_target": distance < 2,
+        }
+        components = {name: self.weights[name] * float(value) for name, value in values.items()}
+        return sum(components.values()), components
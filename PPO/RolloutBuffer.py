@@ -0,0 +1,104 @@
+import numpy as np
+
+
+class rollout_buffer:
+    def __init__(self, horizon, n_envs, observation_size, action_size, probs_size):
+        """
+        Initialize the rollout buffer.
+
+        Preallocated contiguous float32 arrays with shape [horizon, n_envs, ...]. Adding a step writes one
+        row in place, and reset only rewinds the write position, so collecting a rollout allocates nothing.
+
+        Parameters:
+        - horizon: Maximum number of steps per rollout.
+        - n_envs: Number of environments.
+        - observation_size: Size of the observations.
+        - action_size: Size of the actions sent to the environments.
+        - probs_size: Size of the policy outputs.
+        """
+        self.horizon = horizon
+        self.n_envs = n_envs
+        self.states = np.zeros((horizon, n_envs, observation_size), dtype=np.float32)
+        self.actions = np.zeros((horizon, n_envs, action_size), dtype=np.float32)
+        self.rewards = np.zeros((horizon, n_envs), dtype=np.float32)
+        self.dones = np.zeros((horizon, n_envs), dtype=bool)
+        self.probs = np.zeros((horizon, n_envs, probs_size), dtype=np.float32)
+        # Whether the environment was still running at each step, finished environments idle until reset
+        self.valid = np.zeros((horizon, n_envs), dtype=bool)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def reset(self):
+        """Start a new rollout, reusing the allocated arrays."""
+        self.size = 0
+
+    def add(self, states, actions, rewards, dones, probs, running):
+        """
+        Add a step of all environments.
+
+        Parameters:
+        - states: States the actions were selected in, with shape [n_envs, observation_size].
+        - actions: Selected actions with shape [n_envs, action_size].
+        - rewards: Received rewards with shape [n_envs].
+        - dones: Whether each episode is finished, with shape [n_envs].
+        - probs: Policy outputs with shape [n_envs, probs_size].
+        - running: Whether each environment was still running, with shape [n_envs].
+        """
+        if self.size == self.horizon:
+            raise IndexError(f"Rollout buffer is full ({self.horizon} steps)")
+        t = self.size
+        self.states[t] = states
+        self.actions[t] = actions
+        self.rewards[t] = rewards
+        self.dones[t] = dones
+        self.probs[t] = probs
+        self.valid[t] = running
+        self.size += 1
+
+    def episode_lengths(self):
+        """
+        Calculate the number of steps each environment ran for.
+
+        Returns:
+        - lengths: Number of valid steps per environment, with shape [n_envs].
+        """
+        return self.valid[:self.size].sum(axis=0)
+
+    def view(self, name, start=0, end=None):
+        """
+        Get a view of the steps [start, end) of an array, without copying.
+
+        Parameters:
+        - name: Array name, e.g. "states" or "rewards".
+        - start: First step.
+        - end: Step after the last one (None for the current size).
+
+        Returns:
+        - view: View with shape [end - start, n_envs, ...].
+        """
+        end = self.size if end is None else min(end, self.size)
+        return getattr(self, name)[start:end]
+
+    def flat(self, name):
+        """
+        Get a view of an array with the step and environment axes merged, without copying.
+
+        Parameters:
+        - name: Array name, e.g. "states" or "rewards".
+
+        Returns:
+        - view: View with shape [size * n_envs, ...].
+        """
+        array = self.view(name)
+        return array.reshape(-1, *array.shape[2:])
+
+    def valid_indices(self):
+        """
+        Get the indices of the valid steps in the flat views.
+
+        Returns:
+        - indices: Indices into the flat views of the steps taken by running environments.
+        """
+        return np.flatnonzero(self.valid[:self.size].ravel())
@@ -0,0 +1,107 @@
+import numpy as np
+
+
+class running_normalizer:
+    def __init__(self, shape=(), center=True, clip=10.0, epsilon=1e-8, frozen=False):
+        """
+        Initialize the running normalizer.
+
+        Keeps the running mean and variance of everything it is updated with, merging each batch in one step
+        with the parallel form of Welford's algorithm, so a batch of observations from all environments
+        costs a single update.
+
+        Parameters:
+        - shape: Shape of one sample, e.g. (observation_space_size,) or () for rewards.
+        - center: Whether normalize subtracts the mean. Rewards are only scaled, keeping their sign.
+        - clip: Normalized values are clipped to [-clip, clip] (None to disable).
+        - epsilon: Added to the variance before dividing by the standard deviation.
+        - frozen: Whether the statistics are fixed, e.g. for evaluation.
+        """
+        self.shape = tuple(shape)
+        self.center = center
+        self.clip = clip
+        self.epsilon = epsilon
+        self.frozen = frozen
+        self.count = 0.0
+        self.mean = np.zeros(self.shape)
+        self.var = np.ones(self.shape)
+
+    @property
+    def std(self):
+        """Standard deviation used to normalize."""
+        return np.sqrt(self.var + self.epsilon)
+
+    def update(self, samples):
+        """
+        Update the statistics with a batch of samples, unless frozen.
+
+        Parameters:
+        - samples: Samples with shape [n_samples, *shape].
+        """
+        samples = np.asarray(samples, dtype=float).reshape((-1,) + self.shape)
+        if self.frozen or len(samples) == 0:
+            return
+        self.merge(len(samples), samples.mean(axis=0), samples.var(axis=0))
+
+    def merge(self, count, mean, var):
+        """
+        Merge the statistics of another set of samples, unless frozen.
+
+        Parameters:
+        - count: Number of samples.
+        - mean: Mean of the samples.
+        - var: Variance of the samples.
+        """
+        if self.frozen or count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        # The first merge replaces the initial unit variance
+        m2 = (self.var * self.count if self.count else 0.0) + var * count + delta ** 2 * self.count * count / total
+        self.mean = self.mean + delta * count / total
+        self.var = m2 / total
+        self.count = total
+
+    def normalize(self, samples, update=False):
+        """
+        Normalize samples with the current statistics.
+
+        Until the first update there are no statistics, and the samples pass through unchanged. Scaling raw
+        positions around 200 with the initial unit variance and clipping them would saturate them.
+
+        Parameters:
+        - samples: Samples with shape [..., *shape].
+        - update: Whether to update the statistics with the samples first.
+
+        Returns:
+        - normalized: Normalized samples as float32.
+        """
+        if update:
+            self.update(samples)
+        if self.count == 0:
+            return np.asarray(samples, dtype=np.float32)
+        normalized = (samples - self.mean) / self.std if self.center else samples / self.std
+        if self.clip is not None:
+            normalized = np.clip(normalized, -self.clip, self.clip)
+        return normalized.astype(np.float32)
+
+    def get_state(self):
+        """
+        Get the statistics.
+
+        Returns:
+        - state: Count, mean and variance arrays.
+        """
+        return [np.array(self.count), self.mean.copy(), self.var.copy()]
+
+    def set_state(self, state):
+        """
+        Restore statistics returned by get_state.
+
+        Parameters:
+        - state: Count, mean and variance arrays.
+        """
+        count, mean, var = state
+        self.count = float(count)
+        self.mean = np.array(mean, dtype=float).reshape(self.shape)
+        self.var = np.array(var, dtype=float).reshape(self.shape)
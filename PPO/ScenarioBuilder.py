@@ -0,0 +1,116 @@
+import hashlib
+import json
+from ObservationEncoder import observation_size, FULL_SCHEMA
+
+# Range finders of the HoveringAUV: sensor name, laser count and laser angle in degrees.
+LASER_LAYOUT = [
+    ("HorizontalRangeSensor", 8, 0),
+    ("UpRangeSensor", 1, 90),
+    ("DownRangeSensor", 1, -90),
+    ("UpInclinedRangeSensor", 2, 45),
+    ("DownInclinedRangeSensor", 2, -45),
+]
+
+# Built scenarios by the hash of their parameters.
+SCENARIO_CACHE = {}
+
+
+def parameter_hash(parameters):
+    """
+    Hash scenario parameters.
+
+    Parameters:
+    - parameters: JSON serializable dictionary of parameters.
+
+    Returns:
+    - hash: SHA-256 hex digest of the parameters.
+    """
+    return hashlib.sha256(json.dumps(parameters, sort_keys=True).encode()).hexdigest()
+
+
+def build_scenario(ticks_per_sec=200, sensor_hz=None, laser_layout=LASER_LAYOUT, laser_max_distance=None,
+                   octree_min=None, octree_max=None, render=True, window_size=(1280, 720),
+                   location=(200, 200, -250), rotation=(0.0, 0.0, 130.0), world="OpenWater",
+                   expected_observation_size=None, observation_schema=FULL_SCHEMA):
+    """
+    Build the HoloOcean configuration of the HoveringAUV scenario.
+
+    Built configurations are cached by a hash of their parameters, so building the same scenario again
+    returns the same dictionary. It is shared and must not be modified.
+
+    Parameters:
+    - ticks_per_sec: Simulator ticks per second.
+    - sensor_hz: Optional rate per sensor name, e.g. {"HorizontalRangeSensor": 50}. Sensors default to
+      ticks_per_sec.
+    - laser_layout: Range finders as (sensor name, laser count, laser angle) tuples.
+    - laser_max_distance: Range of the lasers in meters (None for the simulator's default).
+    - octree_min: Smallest octree cell size in meters (None for the simulator's default).
+    - octree_max: Largest octree cell size in meters (None for the simulator's default).
+    - render: Whether to configure a rendered window. Set the headless flag of custom_environment to also
+      hide the viewport.
+    - window_size: Width and height of the window.
+    - location: Start location of the AUV.
+    - rotation: Start roll, pitch and yaw of the AUV in degrees.
+    - world: HoloOcean world of the Ocean package.
+    - expected_observation_size: Expected observation size, e.g. OBSERVATION_SPACE_SIZE (None to skip the check).
+    - observation_schema: Fields of the observation the expected size is checked against, see observation_encoder.
+
+    Returns:
+    - scenario: Configuration for the environment.
+    """
+    parameters = {
+        "ticks_per_sec": ticks_per_sec, "sensor_hz": sensor_hz or {}, "laser_layout": laser_layout,
+        "laser_max_distance": laser_max_distance, "octree_min": octree_min, "octree_max": octree_max,
+        "render": render, "window_size": window_size, "location": location, "rotation": rotation, "world": world,
+    }
+    key = parameter_hash(parameters)
+    if key not in SCENARIO_CACHE:
+        SCENARIO_CACHE[key] = make_scenario(**parameters)
+    scenario = SCENARIO_CACHE[key]
+
+    # Validate the configuration against the size the networks expect
+    if expected_observation_size is not None:
+        size = observation_size(scenario, observation_schema)
+        if size != expected_observation_size:
+            raise ValueError(f"Scenario produces observations of size {size} with schema {observation_schema}, "
+                             f"expected {expected_observation_size}")
+    return scenario
+
+
+def make_scenario(ticks_per_sec, sensor_hz, laser_layout, laser_max_distance, octree_min, octree_max, render,
+                  window_size, location, rotation, world):
+    """Make the configuration described by build_scenario's parameters, without caching."""
+    sensors = [{"sensor_type": sensor_type, "socket": "IMUSocket", "Hz": sensor_hz.get(sensor_type, ticks_per_sec)}
+               for sensor_type in ["PoseSensor", "VelocitySensor", "RotationSensor"]]
+    for name, laser_count, laser_angle in laser_layout:
+        configuration = {"LaserCount": laser_count, "LaserDebug": False}
+        if laser_angle:
+            configuration["LaserAngle"] = laser_angle
+        if laser_max_distance is not None:
+            configuration["LaserMaxDistance"] = laser_max_distance
+        sensors.append({"sensor_type": "RangeFinderSensor", "sensor_name": name, "socket": "COM",
+                        "Hz": sensor_hz.get(name, ticks_per_sec), "configuration": configuration})
+
+    scenario = {
+        "name": "Hovering",
+        "world": world,
+        "package_name": "Ocean",
+        "main_agent": "auv0",
+        "ticks_per_sec": ticks_per_sec,
+        "frames_per_sec": False,
+    }
+    if octree_min is not None:
+        scenario["octree_min"] = octree_min
+    if octree_max is not None:
+        scenario["octree_max"] = octree_max
+    scenario["agents"] = [{
+        "agent_name": "auv0",
+        "agent_type": "HoveringAUV",
+        "sensors": sensors,
+        "control_scheme": 0,
+        "location": list(location),
+        "rotation": list(rotation),
+    }]
+    if render:
+        scenario["window_width"], scenario["window_height"] = window_size
+    return scenario
@@ -0,0 +1,401 @@
+import copy
+import numpy as np
+from ObstacleIndex import obstacle_index
+
+# Sensors that render frames, dropped from headless scenarios.
+CAMERA_SENSORS = ["RGBCamera", "ViewportCapture", "ImagingSonar", "SidescanSonar", "ProfilingSonar"]
+
+
+def headless_scenario(scenario):
+    """
+    Make a copy of a scenario that renders nothing.
+
+    Camera and sonar image sensors are dropped, frame output is disabled and laser debug lines are hidden.
+    The sensors in the observation are kept.
+
+    Parameters:
+    - scenario: Configuration for the environment.
+
+    Returns:
+    - scenario: Headless configuration.
+    """
+    scenario = copy.deepcopy(scenario)
+    scenario["frames_per_sec"] = False
+    for agent in scenario["agents"]:
+        agent["sensors"] = [sensor for sensor in agent["sensors"] if sensor["sensor_type"] not in CAMERA_SENSORS]
+        for sensor in agent["sensors"]:
+            if sensor["sensor_type"] == "RangeFinderSensor":
+                sensor.setdefault("configuration", {})["LaserDebug"] = False
+    return scenario
+
+
+def make_holoocean_backend(scenario, headless=False):
+    """
+    Make the HoloOcean simulator backend.
+
+    Parameters:
+    - scenario: Configuration for the environment.
+    - headless: Whether to render nothing, without a viewport or frame output.
+
+    Returns:
+    - env: HoloOcean environment.
+    """
+    import holoocean
+    if headless:
+        return holoocean.make(scenario_cfg=headless_scenario(scenario), show_viewport=False)
+    return holoocean.make(scenario_cfg=scenario)
+
+
+def make_numpy_backend(scenario, headless=False):
+    """
+    Make the headless NumPy simulator backend.
+
+    Parameters:
+    - scenario: Configuration for the environment.
+    - headless: Unused, the NumPy backend never renders.
+
+    Returns:
+    - env: NumPy HoveringAUV environment.
+    """
+    return numpy_backend(scenario)
+
+
+# Backends whose reset reloads the world, so keeping it across episodes saves the reload. The NumPy
+# backend resets as fast as it teleports, so a soft reset gains nothing there.
+SOFT_RESET_BACKENDS = {"holoocean"}
+
+# Available simulator backends. A backend is any object with act, tick, reset, draw_box, draw_point
+# and spawn_prop methods that behave like the HoloOcean environment. Backends that can also remove a
+# prop by tag with remove_prop allow custom_environment to keep its obstacles across soft resets.
+BACKENDS = {
+    "holoocean": make_holoocean_backend,
+    "numpy": make_numpy_backend,
+}
+
+
+def make_backend(name, scenario, headless=False):
+    """
+    Make a simulator backend by name.
+
+    Parameters:
+    - name: Name of the backend, one of BACKENDS.
+    - scenario: Configuration for the environment.
+    - headless: Whether to render nothing.
+
+    Returns:
+    - env: Simulator backend.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name](scenario, headless)
+
+
+def rotation_matrix(roll, pitch, yaw):
+    """
+    Build a rotation matrix from roll, pitch and yaw angles.
+
+    Parameters:
+    - roll: Rotation about the x axis in degrees.
+    - pitch: Rotation about the y axis in degrees.
+    - yaw: Rotation about the z axis in degrees.
+
+    Returns:
+    - rotation: 3x3 rotation matrix from the body frame to the world frame.
+    """
+    roll, pitch, yaw = np.radians([roll, pitch, yaw])
+    cr, sr = np.cos(roll), np.sin(roll)
+    cp, sp = np.cos(pitch), np.sin(pitch)
+    cy, sy = np.cos(yaw), np.sin(yaw)
+    return np.array([
+        [cy * cp, cy * sp * sr - sy * cr, cy * sp * cr + sy * sr],
+        [sy * cp, sy * sp * sr + cy * cr, sy * sp * cr - cy * sr],
+        [-sp, cp * sr, cp * cr]
+    ])
+
+
+def laser_directions(laser_count, laser_angle):
+    """
+    Calculate the body frame directions of a range finder's lasers.
+
+    The lasers are spread evenly around the vertical axis and inclined by the laser angle.
+
+    Parameters:
+    - laser_count: Number of lasers.
+    - laser_angle: Inclination of the lasers in degrees, positive upwards.
+
+    Returns:
+    - directions: Unit directions with shape [laser_count, 3].
+    """
+    azimuth = np.radians(360 * np.arange(laser_count) / laser_count)
+    elevation = np.radians(laser_angle)
+    return np.stack([np.cos(elevation) * np.cos(azimuth),
+                     np.cos(elevation) * np.sin(azimuth),
+                     np.full(laser_count, np.sin(elevation))], axis=1)
+
+
+class numpy_backend:
+    # HoveringAUV thrusters: four vertical thrusters followed by four horizontal vectored thrusters,
+    # ordered front starboard, front port, back port, back starboard. Positions are in meters.
+    THRUSTER_POSITIONS = np.array([
+        [0.25, -0.22, -0.04], [0.25, 0.22, -0.04], [-0.25, 0.22, -0.04], [-0.25, -0.22, -0.04],
+        [0.15, -0.18, 0.0], [0.15, 0.18, 0.0], [-0.15, 0.18, 0.0], [-0.15, -0.18, 0.0]
+    ])
+    THRUSTER_DIRECTIONS = np.array([
+        [0, 0, 1], [0, 0, 1], [0, 0, 1], [0, 0, 1],
+        [np.sqrt(0.5), np.sqrt(0.5), 0], [np.sqrt(0.5), -np.sqrt(0.5), 0],
+        [np.sqrt(0.5), np.sqrt(0.5), 0], [np.sqrt(0.5), -np.sqrt(0.5), 0]
+    ])
+
+    def __init__(self, scenario, mass=31.02, inertia=(1.0, 1.5, 1.5), linear_drag=20.0, quadratic_drag=40.0,
+                 angular_drag=10.0, righting_torque=30.0, laser_max_distance=10.0):
+        """
+        Initialize the NumPy HoveringAUV backend.
+
+        A neutrally buoyant rigid body driven by the 8 thruster command of the HoveringAUV, with drag and a
+        righting torque that keeps it level. It produces the same sensor readings as the scenario's
+        sensors, with range finders casting rays against the spawned sphere props through an obstacle index.
+
+        Parameters:
+        - scenario: Configuration for the environment.
+        - mass: Mass of the AUV in kg.
+        - inertia: Diagonal moments of inertia in kg m^2.
+        - linear_drag: Linear drag coefficient.
+        - quadratic_drag: Quadratic drag coefficient.
+        - angular_drag: Angular drag coefficient.
+        - righting_torque: Torque that rolls and pitches the AUV back to level.
+        - laser_max_distance: Default range of the range finders in meters.
+        """
+        agent = scenario["agents"][0]
+        self.agent_name = agent["agent_name"]
+        self.ticks_per_sec = scenario["ticks_per_sec"]
+        self.dt = 1 / self.ticks_per_sec
+        self.mass = mass
+        self.inertia = np.array(inertia, dtype=float)
+        self.linear_drag = linear_drag
+        self.quadratic_drag = quadratic_drag
+        self.angular_drag = angular_drag
+        self.righting_torque = righting_torque
+
+        # Thrust to body force and torque mapping.
+        self.force_matrix = self.THRUSTER_DIRECTIONS.T
+        self.torque_matrix = np.cross(self.THRUSTER_POSITIONS, self.THRUSTER_DIRECTIONS).T
+
+        # Sensors, each read every `period` ticks. The range finders' lasers are cast together.
+        self.sensors = []
+        self.range_sensors = []
+        for sensor in agent["sensors"]:
+            configuration = sensor.get("configuration", {})
+            period = max(1, round(self.ticks_per_sec / sensor.get("Hz", self.ticks_per_sec)))
+            entry = {"name": sensor.get("sensor_name", sensor["sensor_type"]), "type": sensor["sensor_type"],
+                     "period": period}
+            if sensor["sensor_type"] == "RangeFinderSensor":
+                entry["directions"] = laser_directions(configuration.get("LaserCount", 1),
+                                                       configuration.get("LaserAngle", 0))
+                entry["max_distance"] = configuration.get("LaserMaxDistance", laser_max_distance)
+                self.range_sensors.append(entry)
+            else:
+                self.sensors.append(entry)
+        self.laser_groups = {}
+
+        self.start_location = np.array(agent.get("location", [0, 0, 0]), dtype=float)
+        self.start_rotation = rotation_matrix(*agent.get("rotation", [0, 0, 0]))
+        # Agents by name, like the HoloOcean environment. The backend simulates a single agent.
+        self.agents = {self.agent_name: self}
+        self.reset()
+
+    def act(self, agent_name, action):
+        """
+        Set the thruster command applied on the following ticks.
+
+        Parameters:
+        - agent_name: Name of the agent.
+        - action: Thrust of the 8 thrusters in Newtons.
+        """
+        self.command = np.asarray(action, dtype=float)
+
+    def tick(self):
+        """
+        Advance the simulation by one tick.
+
+        Returns:
+        - states: Dictionary containing sensor readings.
+        """
+        force = self.rotation @ (self.force_matrix @ self.command)
+        speed = np.sqrt(self.velocity @ self.velocity)
+        force -= (self.linear_drag + self.quadratic_drag * speed) * self.velocity
+
+        # Body frame torque, with a righting term pulling the body z axis towards the world z axis.
+        torque = self.torque_matrix @ self.command - self.angular_drag * self.angular_velocity
+        up = self.rotation[2]
+        torque[0] -= self.righting_torque * up[1]
+        torque[1] += self.righting_torque * up[0]
+
+        self.velocity += force / self.mass * self.dt
+        self.location += self.velocity * self.dt
+        self.angular_velocity += torque / self.inertia * self.dt
+        self.rotation = self.rotation @ self.rotation_step(self.angular_velocity * self.dt)
+        self.ticks += 1
+        return self.get_states()
+
+    @staticmethod
+    def rotation_step(angle):
+        """
+        Calculate the rotation for a small rotation vector using the Rodrigues formula.
+
+        Parameters:
+        - angle: Rotation vector in radians.
+
+        Returns:
+        - rotation: 3x3 rotation matrix.
+        """
+        theta = np.sqrt(angle @ angle)
+        if theta < 1e-12:
+            return np.eye(3)
+        x, y, z = angle / theta
+        k = np.array([[0, -z, y], [z, 0, -x], [-y, x, 0]])
+        return np.eye(3) + np.sin(theta) * k + (1 - np.cos(theta)) * (k @ k)
+
+    def get_states(self):
+        """
+        Read the sensors that are due on the current tick.
+
+        Returns:
+        - states: Dictionary containing sensor readings.
+        """
+        states = {}
+        for sensor in self.sensors:
+            if self.ticks % sensor["period"]:
+                continue
+            if sensor["type"] == "PoseSensor":
+                pose = np.eye(4, dtype=np.float32)
+                pose[0:3, 0:3] = self.rotation
+                pose[0:3, 3] = self.location
+                states[sensor["name"]] = pose
+            elif sensor["type"] == "VelocitySensor":
+                states[sensor["name"]] = self.velocity.astype(np.float32)
+            elif sensor["type"] == "RotationSensor":
+                states[sensor["name"]] = self.get_rotation_angles()
+
+        due = tuple(self.ticks % sensor["period"] == 0 for sensor in self.range_sensors)
+        if any(due):
+            names, directions, max_distances, splits = self.get_laser_group(due)
+            distances = self.get_obstacle_index().raycast(self.location, directions @ self.rotation.T,
+                                                          max_distances).astype(np.float32)
+            states.update(zip(names, np.split(distances, splits)))
+        return states
+
+    def get_obstacle_index(self):
+        """
+        Get the obstacle index of the spawned spheres, rebuilt after props are spawned.
+
+        Returns:
+        - index: Obstacle index.
+        """
+        if self.obstacles is None:
+            centers, radii = zip(*self.props.values()) if self.props else ((), ())
+            self.obstacles = obstacle_index(np.array(centers).reshape(-1, 3), np.array(radii))
+        return self.obstacles
+
+    def get_laser_group(self, due):
+        """
+        Get the stacked lasers of the range finders that are due, cached per combination.
+
+        Parameters:
+        - due: Whether each range finder is due on the current tick.
+
+        Returns:
+        - names: Names of the due range finders.
+        - directions: Body frame directions of their lasers.
+        - max_distances: Range of each laser.
+        - splits: Indices splitting the lasers back into range finders.
+        """
+        if due not in self.laser_groups:
+            sensors = [sensor for sensor, is_due in zip(self.range_sensors, due) if is_due]
+            counts = [len(sensor["directions"]) for sensor in sensors]
+            self.laser_groups[due] = (
+                [sensor["name"] for sensor in sensors],
+                np.concatenate([sensor["directions"] for sensor in sensors]),
+                np.repeat([float(sensor["max_distance"]) for sensor in sensors], counts),
+                np.cumsum(counts)[:-1]
+            )
+        return self.laser_groups[due]
+
+    def get_rotation_angles(self):
+        """
+        Calculate the roll, pitch and yaw angles of the AUV.
+
+        Returns:
+        - angles: Roll, pitch and yaw in degrees.
+        """
+        r = self.rotation
+        roll = np.arctan2(r[2, 1], r[2, 2])
+        pitch = np.arcsin(np.clip(-r[2, 0], -1, 1))
+        yaw = np.arctan2(r[1, 0], r[0, 0])
+        return np.degrees([roll, pitch, yaw]).astype(np.float32)
+
+    def reset(self):
+        """
+        Reset the AUV to its start pose and remove all spawned props.
+
+        Returns:
+        - states: Dictionary containing sensor readings.
+        """
+        self.location = self.start_location.copy()
+        self.rotation = self.start_rotation.copy()
+        self.velocity = np.zeros(3)
+        self.angular_velocity = np.zeros(3)
+        self.command = np.zeros(8)
+        self.props = {}
+        self.obstacles = None
+        self.ticks = 0
+        return self.get_states()
+
+    def teleport(self, location=None, rotation=None):
+        """
+        Move the AUV to a pose and stop it, like HoloOcean's agent teleport.
+
+        Parameters:
+        - location: New location (None to keep the current one).
+        - rotation: New roll, pitch and yaw in degrees (None to keep the current one).
+        """
+        if location is not None:
+            self.location = np.array(location, dtype=float)
+        if rotation is not None:
+            self.rotation = rotation_matrix(*rotation)
+        self.velocity = np.zeros(3)
+        self.angular_velocity = np.zeros(3)
+
+    def spawn_prop(self, prop_type, location=None, rotation=None, scale=1, sim_physics=False, material="",
+                   tag=""):
+        """
+        Spawn a prop. Spheres are added as obstacles for the range finders, other props are ignored.
+
+        Parameters:
+        - prop_type: Type of the prop.
+        - location: Location of the prop.
+        - rotation: Rotation of the prop.
+        - scale: Scale of the prop, the diameter of a sphere in meters.
+        - sim_physics: Unused.
+        - material: Unused.
+        - tag: Tag used to remove the prop, props without a tag cannot be removed.
+        """
+        if prop_type != "sphere":
+            return
+        self.props[tag or object()] = (location, scale / 2)
+        self.obstacles = None
+
+    def remove_prop(self, tag):
+        """
+        Remove a spawned prop.
+
+        Parameters:
+        - tag: Tag the prop was spawned with.
+        """
+        if self.props.pop(tag, None) is not None:
+            self.obstacles = None
+
+    def draw_box(self, center, extent, color=None, thickness=10.0, lifetime=1.0):
+        """Debug drawing is not rendered by the NumPy backend."""
+
+    def draw_point(self, loc, color=None, thickness=10.0, lifetime=1.0):
+        """Debug drawing is not rendered by the NumPy backend."""
@@ -0,0 +1,156 @@
+import numpy as np
+
+# Orders the targets can be visited in.
+TARGET_ORDERS = ["random", "nearest", "two_opt"]
+
+
+def path_length(points, order, start=None):
+    """
+    Calculate the length of the path visiting points in order.
+
+    Parameters:
+    - points: Points with shape [n_points, 3].
+    - order: Indices of the points in visiting order.
+    - start: Optional location the path starts from.
+
+    Returns:
+    - length: Length of the path.
+    """
+    path = points[order]
+    if start is not None:
+        path = np.vstack([start, path])
+    return float(np.sum(np.linalg.norm(np.diff(path, axis=0), axis=1)))
+
+
+def nearest_neighbor_order(points, start=None):
+    """
+    Order points by always visiting the nearest point not visited yet.
+
+    Parameters:
+    - points: Points with shape [n_points, 3].
+    - start: Optional location the path starts from (None to start from the first point).
+
+    Returns:
+    - order: Indices of the points in visiting order.
+    """
+    n_points = len(points)
+    visited = np.zeros(n_points, dtype=bool)
+    order = np.empty(n_points, dtype=int)
+    location = points[0] if start is None else np.asarray(start, dtype=float)
+    for i in range(n_points):
+        distances = np.linalg.norm(points - location, axis=1)
+        distances[visited] = np.inf
+        order[i] = np.argmin(distances)
+        visited[order[i]] = True
+        location = points[order[i]]
+    return order
+
+
+def two_opt_order(points, start=None, order=None, max_passes=100):
+    """
+    Shorten an open path through points by reversing segments until no reversal shortens it (2-opt).
+
+    Parameters:
+    - points: Points with shape [n_points, 3].
+    - start: Optional location the path starts from, which stays first.
+    - order: Initial visiting order (None for the nearest neighbor order).
+    - max_passes: Maximum number of passes over all segments.
+
+    Returns:
+    - order: Indices of the points in visiting order.
+    """
+    if order is None:
+        order = nearest_neighbor_order(points, start)
+    # Prepend the start as node -1, so it is never moved
+    nodes = np.vstack([points, np.zeros((1, 3)) if start is None else np.asarray(start, dtype=float)])
+    path = np.concatenate([[-1], order]) if start is not None else np.array(order)
+    first = 1 if start is not None else 0
+    distances = np.linalg.norm(nodes[:, None] - nodes[None], axis=2)
+
+    for _ in range(max_passes):
+        improved = False
+        for i in range(first, len(path) - 1):
+            # Gain of reversing path[i:j + 1] for every j > i, the last edge is absent for the path's end
+            j = np.arange(i + 1, len(path))
+            before = distances[path[i - 1], path[i]] if i > 0 else 0.0
+            after = distances[path[i - 1], path[j]] if i > 0 else np.zeros(len(j))
+            following = np.append(path[j[:-1] + 1], path[-1])
+            removed = before + np.where(j < len(path) - 1, distances[path[j], following], 0.0)
+            added = after + np.where(j < len(path) - 1, distances[path[i], following], 0.0)
+            gains = removed - added
+            best = np.argmax(gains)
+            if gains[best] > 1e-9:
+                path[i:j[best] + 1] = path[i:j[best] + 1][::-1].copy()
+                improved = True
+        if not improved:
+            break
+    return path[first:]
+
+
+class target_scheduler:
+    def __init__(self, order="random", rng=None):
+        """
+        Initialize the target scheduler.
+
+        The visiting order of an episode's targets is computed once on reset, after which every next target
+        is taken from it in constant time.
+
+        Parameters:
+        - order: Visiting order, "random" for a random permutation, "nearest" for nearest neighbor or
+          "two_opt" for a nearest neighbor path shortened with 2-opt.
+        - rng: NumPy random generator used by the random order.
+        """
+        if order not in TARGET_ORDERS:
+            raise ValueError(f"Unknown target order {order!r}, expected one of {TARGET_ORDERS}")
+        self.order = order
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.targets = []
+        self.visiting_order = np.empty(0, dtype=int)
+        self.position = 0
+
+    def reset(self, targets, start=None):
+        """
+        Compute the visiting order of a new episode's targets.
+
+        Parameters:
+        - targets: Target positions.
+        - start: Location the episode starts from, used by the nearest and two_opt orders.
+        """
+        self.targets = targets
+        self.position = 0
+        points = np.asarray(targets, dtype=float).reshape(-1, 3)
+        if self.order == "random":
+            self.visiting_order = self.rng.permutation(len(points))
+        elif self.order == "nearest":
+            self.visiting_order = nearest_neighbor_order(points, start)
+        else:
+            self.visiting_order = two_opt_order(points, start)
+
+    def next(self):
+        """
+        Take the next target.
+
+        Returns:
+        - target: The next target position.
+        """
+        if self.position >= len(self.visiting_order):
+            raise IndexError("All targets of the episode have been chosen")
+        target = self.targets[self.visiting_order[self.position]]
+        self.position += 1
+        return target
+
+    def __len__(self):
+        """Number of targets not chosen yet."""
+        return len(self.visiting_order) - self.position
+
+    def path_length(self, start=None):
+        """
+        Calculate the length of the path through all targets in visiting order.
+
+        Parameters:
+        - start: Optional location the path starts from.
+
+        Returns:
+        - length: Length of the path.
+        """
+        return path_length(np.asarray(self.targets, dtype=float).reshape(-1, 3), self.visiting_order, start)
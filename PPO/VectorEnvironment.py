@@ -0,0 +1,175 @@
+import multiprocessing as mp
+import numpy as np
+from CustomEnvironment import custom_environment
+from ObservationEncoder import observation_size, FULL_SCHEMA
+
+
+def worker(remote, parent_remote, env_args, env_kwargs, shared_observations, index):
+    """
+    Run a custom environment in a worker process and serve commands from the main process.
+
+    The environment writes its observations straight into its row of the shared observation array, so only
+    rewards and dones are sent through the pipe.
+
+    Parameters:
+    - remote: Worker end of the pipe.
+    - parent_remote: Main process end of the pipe, closed in the worker.
+    - env_args: Arguments used to build the custom environment.
+    - env_kwargs: Keyword arguments used to build the custom environment.
+    - shared_observations: Shared memory holding the observations of all environments.
+    - index: Index of the environment, also its seed.
+    """
+    parent_remote.close()
+    size = observation_size(env_args[0], env_kwargs["observation_schema"])
+    observations = np.frombuffer(shared_observations, dtype=np.float32).reshape(-1, size)
+    env = custom_environment(*env_args, observation_buffer=observations[index], seed=index, **env_kwargs)
+    try:
+        while True:
+            command, data = remote.recv()
+            if command == "step":
+                _, reward, done = env.step(data)
+                remote.send((reward, done))
+            elif command == "reset":
+                env.reset()
+                remote.send(None)
+            elif command == "get_attr":
+                remote.send(getattr(env, data))
+            elif command == "env_method":
+                name, args = data
+                remote.send(getattr(env, name)(*args))
+            elif command == "close":
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        remote.close()
+
+
+class vector_environment:
+    def __init__(self, n_envs, scenario, n_targets, n_obstacles, reward_threshold=None, backend="holoocean",
+                 action_repeat=1, start_method="spawn", profile=False, layouts=None,
+                 target_order="random", headless=False, observation_schema=FULL_SCHEMA):
+        """
+        Initialize the vector environment.
+
+        Runs n_envs copies of the custom environment in worker processes and steps them in lockstep.
+        The observations of all environments live in one shared float32 array.
+
+        Parameters:
+        - n_envs: Number of environments.
+        - scenario: Configuration for the environments.
+        - n_targets: Number of targets in each environment.
+        - n_obstacles: Number of obstacles in each environment.
+        - reward_threshold: Total reward below which an episode is finished (None to disable).
+        - backend: Simulator backend of the environments.
+        - action_repeat: Number of simulator ticks each action is applied for.
+        - start_method: Multiprocessing start method for the workers.
+        - profile: Whether the environments time their phases, see custom_environment.
+        - layouts: Optional name of a layout library file. Every worker memory-maps the same file and samples
+          its own layouts.
+        - target_order: Order the targets are visited in, see target_scheduler.
+        - headless: Whether the environments skip all rendering, see custom_environment.
+        - observation_schema: Fields of the observations, see observation_encoder.
+        """
+        self.n_envs = n_envs
+        self.observation_size = observation_size(scenario, observation_schema)
+        ctx = mp.get_context(start_method)
+        shared_observations = ctx.RawArray("f", n_envs * self.observation_size)
+        self.observations = np.frombuffer(shared_observations, dtype=np.float32).reshape(n_envs, -1)
+
+        self.remotes, self.work_remotes = zip(*[ctx.Pipe() for _ in range(n_envs)])
+        self.processes = []
+        env_args = (scenario, n_targets, n_obstacles, reward_threshold, backend, action_repeat)
+        env_kwargs = {"profile": profile, "layouts": layouts, "target_order": target_order, "headless": headless,
+                      "observation_schema": observation_schema}
+        for index, (work_remote, remote) in enumerate(zip(self.work_remotes, self.remotes)):
+            process = ctx.Process(target=worker, args=(work_remote, remote, env_args, env_kwargs, shared_observations,
+                                                       index), daemon=True)
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+        # Environments that finished their episode idle until the next reset.
+        self.dones = np.zeros(n_envs, dtype=bool)
+        self.closed = False
+
+    def reset(self, copy=True):
+        """
+        Reset all environments.
+
+        Parameters:
+        - copy: Whether to return a copy of the observations, or a view of the shared observation array
+          that is overwritten on every step.
+
+        Returns:
+        - observations: Stacked observations with shape [n_envs, observation_size].
+        """
+        for remote in self.remotes:
+            remote.send(("reset", None))
+        for remote in self.remotes:
+            remote.recv()
+        self.dones[:] = False
+        return self.observations.copy() if copy else self.observations
+
+    def step(self, actions, copy=True):
+        """
+        Perform a simulation step in every environment that is still running.
+
+        Parameters:
+        - actions: Actions with shape [n_envs, action_size].
+        - copy: Whether to return a copy of the observations, or a view of the shared observation array
+          that is overwritten on every step.
+
+        Returns:
+        - observations: Stacked observations with shape [n_envs, observation_size].
+        - rewards: Rewards with shape [n_envs]. Finished environments get 0.
+        - dones: Whether each episode is finished, with shape [n_envs].
+        """
+        running = np.flatnonzero(~self.dones)
+        for i in running:
+            self.remotes[i].send(("step", actions[i]))
+
+        rewards = np.zeros(self.n_envs)
+        for i in running:
+            rewards[i], self.dones[i] = self.remotes[i].recv()
+        observations = self.observations.copy() if copy else self.observations
+        return observations, rewards, self.dones.copy()
+
+    def get_attr(self, name):
+        """
+        Get an attribute from every environment.
+
+        Parameters:
+        - name: Attribute name, e.g. "achieved_targets".
+
+        Returns:
+        - values: List of attribute values, one per environment.
+        """
+        for remote in self.remotes:
+            remote.send(("get_attr", name))
+        return [remote.recv() for remote in self.remotes]
+
+    def env_method(self, name, *args):
+        """
+        Call a method of every environment.
+
+        Parameters:
+        - name: Method name, e.g. "reset".
+        - args: Arguments of the method.
+
+        Returns:
+        - values: List of return values, one per environment.
+        """
+        for remote in self.remotes:
+            remote.send(("env_method", (name, args)))
+        return [remote.recv() for remote in self.remotes]
+
+    def close(self):
+        """Close all environments and terminate the worker processes."""
+        if self.closed:
+            return
+        for remote in self.remotes:
+            remote.send(("close", None))
+        for process in self.processes:
+            process.join()
+        self.closed = True
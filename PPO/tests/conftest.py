@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The PPO modules are flat scripts, so the tests import them from the PPO directory.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
@@ -0,0 +1,110 @@
+import json
+import os
+import random
+import numpy as np
+import pytest
+from Checkpoint import checkpoint_manager, read_checkpoint, MANIFEST_FILENAME
+
+
+class fake_agent:
+    def __init__(self, seed=0):
+        """Agent with the get_state and set_state of PPO_agent, holding plain arrays instead of networks."""
+        rng = np.random.default_rng(seed)
+        self.rng = np.random.default_rng(seed + 100)
+        self.state = {
+            "policy": [rng.normal(size=(29, 64)).astype(np.float32), rng.normal(size=64).astype(np.float32)],
+            "optimizer": [np.array(seed), rng.normal(size=(29, 64))],
+            "observation_normalizer": [np.array(10.0), rng.normal(size=29), rng.random(29)],
+        }
+        self.restored = None
+
+    def get_state(self):
+        """Copy of the arrays, plus the state of the agent's random generator."""
+        state = {name: [value.copy() for value in values] for name, values in self.state.items()}
+        state["rng"] = self.rng.bit_generator.state
+        return state
+
+    def set_state(self, state):
+        """Record the restored state."""
+        self.restored = state
+
+
+def save_all(directory, episodes, rewards, keep_last=3, keep_best=3):
+    """Save one checkpoint per episode and wait for the writes."""
+    checkpoints = checkpoint_manager(str(directory), keep_last, keep_best)
+    for episode, reward in zip(episodes, rewards):
+        checkpoints.save(fake_agent(episode), episode, reward)
+    checkpoints.close()
+    return checkpoints
+
+
+def assert_restored(agent, expected):
+    """Check that the agent was restored with exactly the arrays and generator state of another agent."""
+    for name, values in expected.get_state().items():
+        if name == "rng":
+            assert agent.restored["rng"] == values
+            continue
+        assert len(agent.restored[name]) == len(values)
+        for restored, value in zip(agent.restored[name], values):
+            assert restored.dtype == value.dtype
+            np.testing.assert_array_equal(restored, value)
+
+
+def test_round_trip_is_exact(tmp_path):
+    np.random.seed(3)
+    random.seed(3)
+    checkpoints = checkpoint_manager(str(tmp_path))
+    checkpoints.save(fake_agent(7), 7, 12.5)
+    checkpoints.close()
+    expected_numpy, expected_python = np.random.rand(5), [random.random() for _ in range(5)]
+
+    agent = fake_agent(99)
+    np.random.seed(4)
+    random.seed(4)
+    resumed = checkpoint_manager(str(tmp_path))
+    metadata = resumed.load(agent)
+    resumed.close()
+    assert metadata["episode"] == 7 and metadata["reward"] == 12.5
+    assert_restored(agent, fake_agent(7))
+    # The global random generators continue where they were when the checkpoint was taken
+    np.testing.assert_array_equal(np.random.rand(5), expected_numpy)
+    assert [random.random() for _ in range(5)] == expected_python
+
+
+def test_keeps_last_and_best(tmp_path):
+    rewards = [5.0, 1.0, 2.0, 9.0, 0.0, 3.0, float("nan")]
+    checkpoints = save_all(tmp_path, range(len(rewards)), rewards, keep_last=2, keep_best=2)
+    # The last two are episodes 5 and 6, the best two by reward are episodes 3 and 0
+    expected = [0, 3, 5, 6]
+    assert [checkpoint["episode"] for checkpoint in checkpoints.checkpoints] == expected
+    with open(tmp_path / MANIFEST_FILENAME) as manifest_file:
+        assert [checkpoint["episode"] for checkpoint in json.load(manifest_file)] == expected
+    assert sorted(name for name in os.listdir(tmp_path) if name != MANIFEST_FILENAME) == sorted(
+        f"checkpoint_episode_{episode}.npz" for episode in expected)
+    assert read_checkpoint(str(tmp_path), "best")["metadata"]["episode"] == 3
+    assert read_checkpoint(str(tmp_path), 0)["metadata"]["episode"] == 0
+
+
+@pytest.mark.parametrize("damage", ["corrupt", "delete"])
+def test_falls_back_past_damaged_checkpoints(tmp_path, damage):
+    save_all(tmp_path, [1, 2, 3], [0.0, 0.0, 0.0])
+    filename = tmp_path / "checkpoint_episode_3.npz"
+    if damage == "corrupt":
+        data = bytearray(filename.read_bytes())
+        data[len(data) // 2] ^= 0xFF
+        filename.write_bytes(bytes(data))
+    else:
+        os.remove(filename)
+
+    agent = fake_agent(99)
+    checkpoints = checkpoint_manager(str(tmp_path))
+    metadata = checkpoints.load(agent)
+    checkpoints.close()
+    assert metadata["episode"] == 2
+    assert_restored(agent, fake_agent(2))
+
+
+def test_no_checkpoint(tmp_path):
+    checkpoints = checkpoint_manager(str(tmp_path))
+    assert checkpoints.load(fake_agent()) is None
+    checkpoints.close()
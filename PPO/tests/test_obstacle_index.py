@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+from ObstacleIndex import obstacle_index
+
+# Cell sizes smaller than, around and larger than the obstacle spacing.
+CELL_SIZES = [2.0, 10.0, 50.0]
+
+
+def random_obstacles(n_obstacles, seed=0):
+    """Random sphere centers in a 120 m box around the default box center, with varying radii."""
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform([140, 140, -310], [260, 260, -190], size=(n_obstacles, 3))
+    radii = rng.uniform(1.0, 4.0, size=n_obstacles)
+    return centers, radii
+
+
+def random_points(n_points, centers, seed=1):
+    """Points inside the box, inside obstacles and far outside the occupied cells."""
+    rng = np.random.default_rng(seed)
+    inside_box = rng.uniform([140, 140, -310], [260, 260, -190], size=(n_points, 3))
+    inside_obstacles = centers[:5] + rng.normal(scale=0.5, size=(min(5, len(centers)), 3))
+    far = np.array([[0.0, 0.0, 0.0], [1000.0, -500.0, 20.0], [200.0, 200.0, -900.0]])
+    return np.concatenate([inside_box, inside_obstacles, far])
+
+
+def reference_nearest(points, centers, radii):
+    """Brute force nearest obstacle surface for every point."""
+    indices, clearances = [], []
+    for point in points:
+        distances = [np.linalg.norm(point - center) - radius for center, radius in zip(centers, radii)]
+        indices.append(int(np.argmin(distances)))
+        clearances.append(min(distances))
+    return np.array(indices), np.array(clearances)
+
+
+def reference_ray(origin, direction, centers, radii, max_distance):
+    """Brute force distance along a ray to the nearest sphere surface, 0 when starting inside one."""
+    best = max_distance
+    for center, radius in zip(centers, radii):
+        offset = center - origin
+        if offset @ offset < radius ** 2:
+            return 0.0
+        b = direction @ offset
+        discriminant = b ** 2 - (offset @ offset - radius ** 2)
+        if discriminant >= 0 and b - np.sqrt(discriminant) >= 0:
+            best = min(best, b - np.sqrt(discriminant))
+    return best
+
+
+@pytest.mark.parametrize("cell_size", CELL_SIZES)
+@pytest.mark.parametrize("n_obstacles", [1, 7, 50])
+def test_nearest_matches_brute_force(cell_size, n_obstacles):
+    centers, radii = random_obstacles(n_obstacles)
+    points = random_points(40, centers)
+    indices, clearances = obstacle_index(centers, radii, cell_size).nearest(points)
+    expected_indices, expected_clearances = reference_nearest(points, centers, radii)
+    np.testing.assert_allclose(clearances, expected_clearances, rtol=1e-9, atol=1e-9)
+    # Ties may pick another obstacle, but never a farther one
+    np.testing.assert_allclose(np.linalg.norm(points - centers[indices], axis=1) - radii[indices],
+                               expected_clearances, rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("cell_size", CELL_SIZES)
+@pytest.mark.parametrize("radius", [0.0, 5.0, 30.0])
+def test_query_radius_matches_brute_force(cell_size, radius):
+    centers, radii = random_obstacles(50)
+    points = random_points(40, centers)
+    neighbours = obstacle_index(centers, radii, cell_size).query_radius(points, radius)
+    assert len(neighbours) == len(points)
+    for point, found in zip(points, neighbours):
+        expected = np.flatnonzero(np.linalg.norm(centers - point, axis=1) - radii <= radius)
+        np.testing.assert_array_equal(np.sort(found), expected)
+
+
+@pytest.mark.parametrize("cell_size", CELL_SIZES)
+def test_raycast_matches_brute_force(cell_size):
+    centers, radii = random_obstacles(50)
+    rng = np.random.default_rng(2)
+    directions = rng.normal(size=(64, 3))
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    index = obstacle_index(centers, radii, cell_size)
+    for origin in random_points(10, centers, seed=3):
+        distances = index.raycast(origin, directions, 40.0)
+        expected = [reference_ray(origin, direction, centers, radii, 40.0) for direction in directions]
+        np.testing.assert_allclose(distances, expected, rtol=1e-9, atol=1e-9)
+
+
+def test_empty_index():
+    index = obstacle_index(np.zeros((0, 3)), 5.0)
+    points = np.array([[200.0, 200.0, -250.0], [0.0, 0.0, 0.0]])
+    indices, clearances = index.nearest(points)
+    np.testing.assert_array_equal(indices, [-1, -1])
+    assert np.all(np.isinf(clearances))
+    assert all(len(found) == 0 for found in index.query_radius(points, 10.0))
+    np.testing.assert_array_equal(index.raycast(points[0], np.eye(3), 40.0), [40.0, 40.0, 40.0])
@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+from PPOAgent import SCAN_BLOCK_SIZE, discounted_scan, generalized_advantage_estimation
+
+GAMMA = 0.95
+GAE_LAMBDA = 0.9
+
+# Lengths around the block size of the scan: shorter, equal, one past, several blocks and a remainder.
+LENGTHS = [1, 5, SCAN_BLOCK_SIZE - 1, SCAN_BLOCK_SIZE, SCAN_BLOCK_SIZE + 1, 3 * SCAN_BLOCK_SIZE, 200]
+
+
+def reference_scan(deltas, discount, breaks, carry=0.0):
+    """Plain loop over steps and environments computing out[t] = deltas[t] + discount * (1 - breaks[t]) * out[t + 1]."""
+    n_steps, n_envs = deltas.shape
+    out = np.zeros((n_steps, n_envs))
+    for env in range(n_envs):
+        following = np.broadcast_to(carry, (n_envs,))[env]
+        for t in reversed(range(n_steps)):
+            following = deltas[t, env] + discount * (0.0 if breaks[t, env] else following)
+            out[t, env] = following
+    return out
+
+
+def reference_gae(rewards, values, dones, next_values, gamma, gae_lambda, truncated=None, truncated_values=None):
+    """Plain loop over steps and environments computing GAE advantages and returns."""
+    n_steps, n_envs = rewards.shape
+    truncated = np.zeros_like(dones) if truncated is None else truncated
+    advantages = np.zeros((n_steps, n_envs))
+    for env in range(n_envs):
+        advantage = 0.0
+        for t in reversed(range(n_steps)):
+            next_value = values[t + 1, env] if t + 1 < n_steps else next_values[env]
+            if truncated[t, env]:
+                next_value = truncated_values[t, env]
+            if dones[t, env]:
+                next_value = 0.0
+            delta = rewards[t, env] + gamma * next_value - values[t, env]
+            if dones[t, env] or truncated[t, env]:
+                advantage = 0.0
+            advantage = delta + gamma * gae_lambda * advantage
+            advantages[t, env] = advantage
+    return advantages, advantages + values
+
+
+def random_rollout(n_steps, n_envs=3, break_probability=0.05, seed=0):
+    """Random rewards, values, dones and next values of a rollout."""
+    rng = np.random.default_rng(seed)
+    return (rng.normal(size=(n_steps, n_envs)), rng.normal(size=(n_steps, n_envs)),
+            rng.random((n_steps, n_envs)) < break_probability, rng.normal(size=n_envs))
+
+
+@pytest.mark.parametrize("n_steps", LENGTHS)
+def test_discounted_scan_matches_loop(n_steps):
+    deltas, _, breaks, carry = random_rollout(n_steps, break_probability=0.1)
+    np.testing.assert_allclose(discounted_scan(deltas, GAMMA, breaks, carry),
+                               reference_scan(deltas, GAMMA, breaks, carry), rtol=1e-10, atol=1e-10)
+
+
+@pytest.mark.parametrize("n_steps", LENGTHS)
+def test_discounted_scan_without_breaks(n_steps):
+    deltas, _, _, _ = random_rollout(n_steps)
+    breaks = np.zeros_like(deltas, dtype=bool)
+    np.testing.assert_allclose(discounted_scan(deltas, GAMMA, breaks, 2.0),
+                               reference_scan(deltas, GAMMA, breaks, 2.0), rtol=1e-10, atol=1e-10)
+
+
+@pytest.mark.parametrize("break_step", [SCAN_BLOCK_SIZE - 2, SCAN_BLOCK_SIZE - 1, SCAN_BLOCK_SIZE,
+                                        2 * SCAN_BLOCK_SIZE - 1, 2 * SCAN_BLOCK_SIZE])
+def test_discounted_scan_break_at_block_boundary(break_step):
+    n_steps = 2 * SCAN_BLOCK_SIZE + 7
+    deltas, _, _, carry = random_rollout(n_steps)
+    breaks = np.zeros_like(deltas, dtype=bool)
+    breaks[break_step] = True
+    np.testing.assert_allclose(discounted_scan(deltas, GAMMA, breaks, carry),
+                               reference_scan(deltas, GAMMA, breaks, carry), rtol=1e-10, atol=1e-10)
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 7, 64])
+def test_discounted_scan_block_sizes(block_size):
+    deltas, _, breaks, carry = random_rollout(100, break_probability=0.1)
+    np.testing.assert_allclose(discounted_scan(deltas, GAMMA, breaks, carry, block_size),
+                               reference_scan(deltas, GAMMA, breaks, carry), rtol=1e-10, atol=1e-10)
+
+
+@pytest.mark.parametrize("n_steps", LENGTHS)
+def test_gae_with_dones_matches_loop(n_steps):
+    rewards, values, dones, next_values = random_rollout(n_steps, break_probability=0.1)
+    advantages, returns = generalized_advantage_estimation(rewards, values, dones, next_values, GAMMA, GAE_LAMBDA)
+    expected_advantages, expected_returns = reference_gae(rewards, values, dones, next_values, GAMMA, GAE_LAMBDA)
+    np.testing.assert_allclose(advantages, expected_advantages, rtol=1e-4, atol=1e-4)
+    np.testing.assert_allclose(returns, expected_returns, rtol=1e-4, atol=1e-4)
+
+
+@pytest.mark.parametrize("n_steps", LENGTHS)
+def test_gae_with_truncation_matches_loop(n_steps):
+    rewards, values, dones, next_values = random_rollout(n_steps, break_probability=0.05, seed=1)
+    rng = np.random.default_rng(2)
+    truncated = rng.random(dones.shape) < 0.05
+    truncated_values = rng.normal(size=dones.shape)
+    advantages, returns = generalized_advantage_estimation(rewards, values, dones, next_values, GAMMA, GAE_LAMBDA,
+                                                           truncated, truncated_values)
+    expected_advantages, expected_returns = reference_gae(rewards, values, dones, next_values, GAMMA, GAE_LAMBDA,
+                                                          truncated, truncated_values)
+    np.testing.assert_allclose(advantages, expected_advantages, rtol=1e-4, atol=1e-4)
+    np.testing.assert_allclose(returns, expected_returns, rtol=1e-4, atol=1e-4)
+
+
+def test_gae_truncated_step_bootstraps_from_final_state():
+    rewards = np.array([[1.0], [1.0], [1.0]])
+    values = np.array([[0.0], [5.0], [100.0]])
+    truncated = np.array([[False], [True], [False]])
+    truncated_values = np.array([[0.0], [7.0], [0.0]])
+    advantages, _ = generalized_advantage_estimation(rewards, values, np.zeros_like(truncated), np.array([2.0]),
+                                                     1.0, 1.0, truncated, truncated_values)
+    # The truncated step bootstraps from its episode's final state, not from values[2] of the next episode
+    assert advantages[1, 0] == pytest.approx(1.0 + 7.0 - 5.0)
+    assert advantages[0, 0] == pytest.approx(1.0 + 5.0 - 0.0 + advantages[1, 0])
+    assert advantages[2, 0] == pytest.approx(1.0 + 2.0 - 100.0)
+
+
+def test_gae_truncated_needs_final_values():
+    rewards, values, dones, next_values = random_rollout(5)
+    with pytest.raises(ValueError):
+        generalized_advantage_estimation(rewards, values, dones, next_values, GAMMA, GAE_LAMBDA, dones)
+
+
+def test_gae_done_step_does_not_bootstrap():
+    rewards = np.array([[1.0], [2.0]])
+    values = np.array([[0.5], [4.0]])
+    dones = np.array([[True], [True]])
+    advantages, returns = generalized_advantage_estimation(rewards, values, dones, np.array([10.0]), GAMMA,
+                                                           GAE_LAMBDA)
+    np.testing.assert_allclose(advantages[:, 0], [0.5, -2.0])
+    np.testing.assert_allclose(returns[:, 0], [1.0, 2.0])
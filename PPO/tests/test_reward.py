@@ -0,0 +1,70 @@
+import numpy as np
+from RewardFunction import reward_engine
+
+START = [200.0, 200.0, -250.0]
+TARGET = [230.0, 200.0, -250.0]
+ROTATION = [180.0, 180.0, 180.0]
+LASERS = [10.0] * 4
+
+
+def test_stale_pose_keeps_static_counter():
+    """Ticks without a new pose neither count as static nor score progress."""
+    engine = reward_engine(static_steps=3)
+    for _ in range(10):
+        _, components = engine.calculate_reward(START, START, TARGET, ROTATION, LASERS, new_pose=False)
+        assert components["static"] == 0
+        assert components["distance_to_target"] == 0
+    assert engine.static_counter[0] == 0
+
+
+def test_new_pose_scores_motion_since_last_new_pose():
+    """A new pose is compared with the previous new pose, both for progress and the static counter."""
+    engine = reward_engine(static_steps=3)
+    moved = [205.0, 200.0, -250.0]
+    _, components = engine.calculate_reward(START, moved, TARGET, ROTATION, LASERS)
+    assert components["distance_to_target"] == engine.weights["distance_to_target"]
+    for _ in range(3):
+        _, components = engine.calculate_reward(moved, moved, TARGET, ROTATION, LASERS)
+    assert engine.static_counter[0] == 3
+    assert components["static"] == engine.weights["static"]
+
+
+def test_scalar_matches_batched():
+    """calculate_reward with a new pose agrees with the batched calculate_rewards."""
+    scalar, batched = reward_engine(), reward_engine()
+    rng = np.random.default_rng(0)
+    location = np.array(START)
+    for _ in range(20):
+        step = rng.normal(scale=0.5, size=3) * (rng.random() < 0.7)
+        prev, location = location, location + step
+        lasers = rng.uniform(0.5, 20, size=4)
+        total, _ = scalar.calculate_reward(prev, location, TARGET, ROTATION, lasers)
+        totals, _ = batched.calculate_rewards(prev[None], location[None], np.array(TARGET)[None],
+                                              np.array(ROTATION)[None], lasers[None])
+        assert np.isclose(total, totals[0])
+
+
+def test_batched_trajectory_matches_scalar_loop():
+    """Re-scoring a [T, n_agents] trajectory in one call matches scoring each agent tick by tick."""
+    rng = np.random.default_rng(1)
+    n_steps, n_agents = 120, 3
+    moving = rng.random((n_steps, n_agents, 1)) < 0.4
+    steps = rng.normal(scale=1.0, size=(n_steps, n_agents, 3)) * moving
+    locations = np.array(START) + np.cumsum(steps, axis=0) * 8
+    prev_locations = np.concatenate([np.broadcast_to(START, (1, n_agents, 3)), locations[:-1]])
+    targets = np.where(rng.random((n_steps, n_agents, 1)) < 0.1, locations + 1, TARGET)
+    rotations = rng.uniform(0, 360, size=(n_steps, n_agents, 3))
+    lasers = rng.uniform(-0.5, 15, size=(n_steps, n_agents, 4))
+
+    batched = reward_engine(n_agents=n_agents, static_steps=5)
+    totals, components = batched.calculate_rewards(prev_locations, locations, targets, rotations, lasers)
+
+    scalar = reward_engine(n_agents=n_agents, static_steps=5)
+    for t in range(n_steps):
+        for agent in range(n_agents):
+            total, expected = scalar.calculate_reward(prev_locations[t, agent], locations[t, agent], targets[t, agent],
+                                                      rotations[t, agent], lasers[t, agent], agent)
+            assert np.isclose(totals[t, agent], total)
+            for name, value in expected.items():
+                assert np.isclose(components[name][t, agent], value), name
+    np.testing.assert_array_equal(batched.static_counter, scalar.static_counter)
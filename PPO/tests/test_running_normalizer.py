@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from RunningNormalizer import running_normalizer
+
+# Batch sizes merged one after the other, including single samples and an empty batch.
+BATCH_SIZES = [1, 7, 64, 0, 3, 200]
+
+
+def random_batches(shape, seed=0):
+    """Batches of observations around 200 with different scales per feature."""
+    rng = np.random.default_rng(seed)
+    return [200 + rng.normal(scale=np.arange(1, shape[0] + 1), size=(size,) + shape) for size in BATCH_SIZES]
+
+
+def test_merged_statistics_match_numpy():
+    batches = random_batches((3,))
+    normalizer = running_normalizer((3,))
+    for batch in batches:
+        normalizer.update(batch)
+    samples = np.concatenate(batches)
+    assert normalizer.count == len(samples)
+    np.testing.assert_allclose(normalizer.mean, np.mean(samples, axis=0), rtol=1e-10)
+    np.testing.assert_allclose(normalizer.var, np.var(samples, axis=0), rtol=1e-8)
+
+
+def test_scalar_statistics_match_numpy():
+    batches = [batch[:, 0] for batch in random_batches((1,), seed=1)]
+    normalizer = running_normalizer(center=False)
+    for batch in batches:
+        normalizer.update(batch)
+    samples = np.concatenate(batches)
+    assert normalizer.mean == pytest.approx(np.mean(samples))
+    assert normalizer.var == pytest.approx(np.var(samples))
+    # Rewards are only scaled, keeping their sign
+    assert normalizer.normalize(np.array(-5.0)) == pytest.approx(-5.0 / np.sqrt(np.var(samples) + 1e-8), rel=1e-6)
+
+
+def test_normalize_uses_statistics_and_clips():
+    batches = random_batches((3,), seed=2)
+    normalizer = running_normalizer((3,), clip=2.0)
+    normalizer.update(np.concatenate(batches))
+    samples = np.concatenate(batches)
+    expected = np.clip((samples - samples.mean(axis=0)) / np.sqrt(samples.var(axis=0) + 1e-8), -2.0, 2.0)
+    np.testing.assert_allclose(normalizer.normalize(samples), expected, rtol=1e-5, atol=1e-5)
+
+
+def test_samples_pass_through_without_statistics():
+    normalizer = running_normalizer((3,))
+    samples = np.array([[200.0, 200.0, -250.0]])
+    np.testing.assert_array_equal(normalizer.normalize(samples), samples.astype(np.float32))
+
+
+def test_frozen_and_state_round_trip():
+    batches = random_batches((3,), seed=3)
+    normalizer = running_normalizer((3,))
+    normalizer.update(batches[2])
+    frozen = running_normalizer((3,), frozen=True)
+    frozen.set_state(normalizer.get_state())
+    frozen.update(batches[5])
+    assert frozen.count == normalizer.count
+    np.testing.assert_array_equal(frozen.mean, normalizer.mean)
+    np.testing.assert_array_equal(frozen.var, normalizer.var)
@@ -1,5 +1,11 @@
 import csv
-import matplotlib.pyplot as plt
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import numpy as np
 
 def log_to_csv(filename):
     # Read the log file
@@ -20,7 +26,7 @@ def log_to_csv(filename):
             episode_number = int(lines[i].split(',')[0].split(' ')[1])
             policy_loss = float(lines[i].split(',')[1].split(': ')[1])
             value_loss = float(lines[i + 1].split(',')[1].split(': ')[1])
-            achieved_targets = int(lines[i + 2].split(',')[1].split(': ')[1])
+            achieved_targets = float(lines[i + 2].split(',')[1].split(': ')[1])
             total_reward = float(lines[i + 3].split(',')[1].split(': ')[1])
 
             # Write the data to the CSV file
@@ -31,6 +37,9 @@ def log_to_csv(filename):
                             'Achieved Targets': achieved_targets})
             
 def graph(filename):
+    # Import pyplot on first use, runs that never plot do not pay for it
+    import matplotlib.pyplot as plt
+
     # Read data from the CSV file
     with open(f'{filename}.csv', 'r') as csvfile:
         reader = csv.DictReader(csvfile)
@@ -41,7 +50,7 @@ def graph(filename):
     policy_loss = [float(row['Policy Loss']) for row in data]
     value_loss = [float(row['Value Loss']) for row in data]
     total_reward = [float(row['Total Reward']) for row in data]
-    achieved_targets = [int(row['Achieved Targets']) for row in data]
+    achieved_targets = [float(row['Achieved Targets']) for row in data]
 
     # Create three subplots
     fig, (ax1, ax2, ax3, ax4) = plt.subplots(4, 1, sharex=True, figsize=(10, 10))
@@ -69,4 +78,195 @@ def graph(filename):
 
     # Adjust layout and save the plots    
     plt.tight_layout()
-    plt.savefig('results.png')
\ No newline at end of file
+    plt.savefig('results.png')
+
+# Fields of the per-episode training metrics.
+EPISODE_FIELDS = [("episode", "<i8"), ("policy_loss", "<f8"), ("value_loss", "<f8"), ("total_reward", "<f8"),
+                  ("achieved_targets", "<f8"), ("clip_fraction", "<f8"), ("update_samples_per_sec", "<f8")]
+
+
+class metrics_store:
+    def __init__(self, filename, fields=EPISODE_FIELDS):
+        """
+        Initialize the metrics store.
+
+        An append-only binary file of fixed size typed records, one per episode. The fields are saved in a
+        JSON header next to it, so the file can be read back without knowing them.
+
+        Parameters:
+        - filename: Name of the metrics file, without extension.
+        - fields: List of (name, dtype) pairs of the records.
+        """
+        self.filename = f"{filename}.metrics"
+        header_filename = f"{filename}.json"
+        if os.path.exists(header_filename):
+            with open(header_filename, "r") as header_file:
+                stored_fields = [tuple(field) for field in json.load(header_file)["fields"]]
+            if stored_fields != [tuple(field) for field in fields]:
+                raise ValueError(f"{self.filename} was written with fields {stored_fields}")
+        else:
+            with open(header_filename, "w") as header_file:
+                json.dump({"fields": fields}, header_file)
+        self.dtype = np.dtype(fields)
+        self.file = open(self.filename, "ab")
+
+    def append(self, **values):
+        """
+        Append one record.
+
+        Parameters:
+        - values: Value of each field. Missing fields are stored as 0.
+        """
+        record = np.zeros(1, dtype=self.dtype)
+        for name, value in values.items():
+            record[name] = value
+        self.file.write(record.tobytes())
+        self.file.flush()
+
+    def __len__(self):
+        return os.path.getsize(self.filename) // self.dtype.itemsize
+
+    def read(self, start_episode=None, end_episode=None):
+        """
+        Read the records of an episode range without loading the rest of the file.
+
+        Parameters:
+        - start_episode: First episode to read, from the start if None.
+        - end_episode: Episode to stop before, to the end if None.
+
+        Returns:
+        - records: Structured array of the records.
+        """
+        return read_metrics(self.filename, self.dtype, start_episode, end_episode)
+
+    def export_csv(self, csv_filename):
+        """
+        Export all records to a CSV file.
+
+        Parameters:
+        - csv_filename: Name of the CSV file.
+        """
+        records = self.read()
+        with open(csv_filename, "w", newline="") as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(records.dtype.names)
+            writer.writerows(records.tolist())
+
+    def close(self):
+        """Close the metrics file."""
+        self.file.close()
+
+
+def read_metrics(filename, dtype, start_episode=None, end_episode=None):
+    """
+    Read the records of an episode range from a metrics file.
+
+    Parameters:
+    - filename: Name of the metrics file.
+    - dtype: Record dtype.
+    - start_episode: First episode to read, from the start if None.
+    - end_episode: Episode to stop before, to the end if None.
+
+    Returns:
+    - records: Structured array of the complete records in the range.
+    """
+    n_records = os.path.getsize(filename) // dtype.itemsize
+    if n_records == 0:
+        return np.zeros(0, dtype=dtype)
+    records = np.memmap(filename, dtype=dtype, mode="r", shape=(n_records,))
+    episodes = records["episode"]
+    mask = np.ones(n_records, dtype=bool)
+    if start_episode is not None:
+        mask &= episodes >= start_episode
+    if end_episode is not None:
+        mask &= episodes < end_episode
+    return np.array(records[mask])
+
+
+def plot_metrics(records, image_filename):
+    """
+    Plot the training metrics against the episode number.
+
+    Uses a standalone figure instead of pyplot, so it is safe to call from a background thread.
+
+    Parameters:
+    - records: Structured array of episode records.
+    - image_filename: Name of the image file.
+    """
+    from matplotlib.figure import Figure
+
+    plots = [("policy_loss", "Policy Loss", "blue"), ("value_loss", "Value Loss", "orange"),
+             ("total_reward", "Total Reward", "green"), ("achieved_targets", "Achieved Targets", "yellow")]
+    fig = Figure(figsize=(10, 10))
+    axes = fig.subplots(len(plots), 1, sharex=True)
+    for ax, (field, label, color) in zip(axes, plots):
+        ax.plot(records["episode"], records[field], label=label, color=color)
+        ax.set_ylabel(label)
+        ax.legend()
+    axes[-1].set_xlabel('Episode Number')
+    fig.tight_layout()
+    fig.savefig(image_filename)
+
+
+class background_plotter:
+    def __init__(self, store, image_filename="results.png", every_n_episodes=50, close_timeout=60.0):
+        """
+        Initialize the background plotter.
+
+        Regenerates the plot of a metrics store in a worker thread every N episodes, so plotting does not
+        slow down training. Requests made while a plot is being drawn are skipped, and a failed plot is
+        logged without stopping the worker.
+
+        Parameters:
+        - store: Metrics store to plot.
+        - image_filename: Name of the image file.
+        - every_n_episodes: Plotting cadence in episodes.
+        - close_timeout: Maximum number of seconds close waits for the final plot.
+        """
+        self.filename = store.filename
+        self.dtype = store.dtype
+        self.image_filename = image_filename
+        self.every_n_episodes = every_n_episodes
+        self.close_timeout = close_timeout
+        self.logger = logging.getLogger("plotter")
+        self.requests = queue.Queue(maxsize=1)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        """Draw the requested plots until None is requested."""
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            try:
+                plot_metrics(read_metrics(self.filename, self.dtype), self.image_filename)
+            except Exception:
+                self.logger.exception("Failed to plot the metrics of episode %d", request)
+
+    def request(self, episode_num, force=False):
+        """
+        Request a plot if one is due.
+
+        Parameters:
+        - episode_num: Episode number.
+        - force: Whether to plot regardless of the cadence.
+        """
+        if force or episode_num % self.every_n_episodes == 0:
+            try:
+                self.requests.put_nowait(episode_num)
+            except queue.Full:
+                pass
+
+    def close(self):
+        """Draw a final plot and stop the worker thread, waiting at most close_timeout seconds."""
+        deadline = time.monotonic() + self.close_timeout
+        for request in (-1, None):
+            try:
+                self.requests.put(request, timeout=max(deadline - time.monotonic(), 0))
+            except queue.Full:
+                self.logger.warning("Plot worker is busy, skipping the final plot")
+                return
+        self.thread.join(max(deadline - time.monotonic(), 0))
+        if self.thread.is_alive():
+            self.logger.warning("Plot worker did not finish within %.0f seconds", self.close_timeout)
@@ -2,6 +2,7 @@ import holoocean
 import numpy as np
 from itertools import chain
 import random
+from TargetScheduler import target_scheduler
 
 class custom_environment:
     def __init__(self, scenario, n_targets, n_obstacles):
@@ -30,10 +31,11 @@ class custom_environment:
 
         # Generate random targets and obstacles.
         self.targets = [self.generate_random_target() for _ in range(n_targets)]
-        self.choosen_targets = []
         self.obstacles = [self.generate_random_obstacle() for _ in range(n_obstacles)]
         
         # Choose the initial target.
+        self.target_scheduler = target_scheduler("random", np.random.default_rng(random.getrandbits(64)))
+        self.target_scheduler.reset(self.targets)
         self.current_target = self.choose_next_target()
 
     def generate_random_target(self):
@@ -46,16 +48,12 @@ class custom_environment:
 
     def choose_next_target(self):
         """
-        Choose the next target randomly, ensuring it has not been chosen before.
+        Choose the next target in the scheduled random order.
 
         Returns:
         - target: The chosen target position.
         """
-        while True:
-            target = random.choice(self.targets)
-            if target not in self.choosen_targets:
-                self.choosen_targets.append(target)
-                return target
+        return self.target_scheduler.next()
 
     def draw_targets(self):
         """Draw targets in the environment."""
@@ -71,8 +69,10 @@ class custom_environment:
             self.env.spawn_prop(prop_type="sphere", location=i, scale=5, material="black")
 
     def reset(self):
-        """Reset the environment."""
+        """Reset the environment and restart the targets."""
         self.env.reset()
+        self.target_scheduler.reset(self.targets)
+        self.current_target = self.choose_next_target()
         self.env.draw_box(center=[200, 200, -250], extent=[50, 50, 50], thickness=50, lifetime=0)
         self.draw_targets()
         self.draw_obstacles()
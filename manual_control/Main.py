@@ -1,5 +1,7 @@
+import logging
 import numpy as np
-from RewardFunction import reward_function
+from Logger import configure_logging, step_logger
+from RewardFunction import reward_engine
 from CustomEnvironment import custom_environment
 from KeyboardController import KeyboardController
 from scenario import scenario
@@ -8,10 +10,15 @@ from scenario import scenario
 SCENARIO = scenario
 N_TARGETS = 10
 N_OBSTACLES = 50
+LOG_LEVEL = logging.INFO
+LOG_EVERY_N_STEPS = None
+LOG_EVERY_SECONDS = 1.0
 
 if __name__ == "__main__":
 
-    # Initialize the environment
+    # Initialize logging and the environment
+    configure_logging(LOG_LEVEL)
+    log = step_logger(name="manual_control", every_n_steps=LOG_EVERY_N_STEPS, every_seconds=LOG_EVERY_SECONDS)
     env = custom_environment(SCENARIO, N_TARGETS, N_OBSTACLES)
     
     # Initialize variables
@@ -22,49 +29,52 @@ if __name__ == "__main__":
     # Reset the environment
     env.reset()
 
-    # Initialize keyboard controller
+    # Initialize keyboard controller and reward engine
     controller = KeyboardController()
+    rewards = reward_engine(n_agents=1)
 
-    while True:
-        # Exit the loop if 'q' is pressed
-        if 'q' in controller.pressed_keys:
-            break
+    with log.dump_on_crash():
+        while True:
+            # Exit the loop if 'q' is pressed
+            if 'q' in controller.pressed_keys:
+                break
         
-        # Get control command from pressed keys
-        command = controller.parse_keys()
+            # Get control command from pressed keys
+            command = controller.parse_keys()
 
-        # Perform a simulation step
-        states = env.tick(command)
-        env.update_state(states)
+            # Perform a simulation step
+            states = env.tick(command)
+            env.update_state(states)
 
-        # Update state and calculate rewards
-        next_state = env.observation_space
-        done = False
-        print("Target:", env.get_current_target())
-        print("Reward:", total_reward)
-        
-        reward_f = reward_function(env.prev_location, env.location, env.get_current_target(), 
-                                    env.rotation, env.lasers)
-        reward = reward_f.calculate_reward()
+            # Update state and calculate rewards
+            next_state = env.observation_space
+            done = False
 
-        # Update previous location
-        env.prev_location = env.location
+            target = np.asarray(env.get_current_target(), dtype=float)
+            reward, components = rewards.calculate_reward(env.prev_location, env.location, target, env.rotation,
+                                                          env.lasers)
 
-        # Check if the target is reached
-        if reward_f.reach_target():              
-            achieved_targets += 1
+            # Update previous location
+            env.prev_location = env.location
 
-            # Finish the game if all targets are reached
-            if achieved_targets == N_TARGETS:
-                print("Game Completed")
-                done = True
-                reward += 1000
-                total_reward += reward
-                state = next_state
-                break
+            # Check if the target is reached
+            if rewards.reach_target(env.location, target):              
+                achieved_targets += 1
+
+                # Finish the game if all targets are reached
+                if achieved_targets == N_TARGETS:
+                    log.info("Game Completed")
+                    done = True
+                    reward += 1000
+                    total_reward += reward
+                    state = next_state
+                    break
             
-            env.set_current_target(env.choose_next_target())
-            env.draw_targets()  
+                env.set_current_target(env.choose_next_target())
+                env.draw_targets()  
         
-        total_reward += reward
-        state = next_state
+            total_reward += reward
+            state = next_state
+            log.step(target=env.get_current_target(), reward=reward, total_reward=total_reward)
+
+    log.episode_end(achieved_targets=achieved_targets, total_reward=total_reward)